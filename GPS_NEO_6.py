@@ -21,17 +21,127 @@
 #/* ------------------------------------------------------------------------ */
 #/* Library for NEO-6 GPS module communication on the Raspberry Pi using     */
 #/* Python.                                                                  */
+#/*                                                                          */
+#/* UART data is framed into NMEA sentences by an NmeaFramer for each port,  */
+#/* which carries partial sentences over to the next read. An NmeaDecoder    */
+#/* converts the RMC, GGA, GSA, VTG, GLL and GSV sentences into GpsFix       */
+#/* records with numeric fields.                                             */
+#/*                                                                          */
+#/* Opened with GPS_PROTOCOL_UBX the module is switched to u-blox UBX binary */
+#/* output, NAV-POSLLH, NAV-VELNED, NAV-SOL and NAV-TIMEUTC, framed by a     */
+#/* UbxFramer and decoded into the same GpsFix records by a UbxDecoder.      */
+#/*                                                                          */
+#/* ConfigureGps() raises the UART baud rate and navigation rate and prunes  */
+#/* the NMEA sentences, with each UBX CFG command checked for its ACK.       */
+#/*                                                                          */
+#/* A GpsReader reads and decodes the UART on its own thread, consumers take */
+#/* the latest fix or recent fixes from it without touching the port.        */
 #/****************************************************************************/
 
 
 
 import time
-import serial
+import struct
+import datetime
+import threading
+import collections
+
+# pyserial is optional, the framers and decoders work on data from any source.
+try:
+   import serial
+except ImportError:
+   serial = None
+
+# UART errors counted by a GpsReader, which continues reading.
+if serial is not None:
+   GPS_READ_ERRORS = (serial.SerialException, OSError)
+else:
+   GPS_READ_ERRORS = (OSError,)
 
 
 
 # UART Read buffer size.
 BUFF_SIZE = 65535
+# Size of the NMEA framer ring buffer, bytes.
+NMEA_RING_SIZE = 4096
+# Longest NMEA sentence accepted, the standard allows 82 characters with CR LF.
+NMEA_MAX_SENTENCE = 96
+
+# Output protocol of the GPS module.
+GPS_PROTOCOL_NMEA = 0
+GPS_PROTOCOL_UBX = 1
+# UART baud rate of the NEO-6 from power on.
+GPS_DEFAULT_BAUD = 9600
+# Highest navigation rate of the NEO-6, solutions per second.
+GPS_MAX_RATE_HZ = 5
+
+# UBX message sync characters, header of sync, class, ID and length, and checksum size.
+UBX_SYNC = b"\xB5\x62"
+UBX_HEADER_SIZE = 6
+UBX_CHECKSUM_SIZE = 2
+# Longest UBX payload accepted.
+UBX_MAX_PAYLOAD = 1024
+
+# UBX messages, (Class, ID).
+UBX_ACK_NAK = (0x05, 0x00)
+UBX_ACK_ACK = (0x05, 0x01)
+UBX_CFG_PRT = (0x06, 0x00)
+UBX_CFG_MSG = (0x06, 0x01)
+UBX_CFG_RATE = (0x06, 0x08)
+UBX_CFG_CFG = (0x06, 0x09)
+UBX_NAV_POSLLH = (0x01, 0x02)
+UBX_NAV_SOL = (0x01, 0x06)
+UBX_NAV_VELNED = (0x01, 0x12)
+UBX_NAV_TIMEUTC = (0x01, 0x21)
+# UBX class of the standard NMEA messages, configured with CFG-MSG.
+UBX_CLASS_NMEA = 0xF0
+# UBX message IDs of the standard NMEA sentences.
+UBX_NMEA_IDS = { "GGA" : 0x00, "GLL" : 0x01, "GSA" : 0x02, "GSV" : 0x03, "RMC" : 0x04, "VTG" : 0x05 }
+# UBX navigation messages output in UBX mode, once each navigation solution.
+UBX_NAV_MESSAGES = [UBX_NAV_POSLLH, UBX_NAV_VELNED, UBX_NAV_SOL, UBX_NAV_TIMEUTC]
+
+# Time to wait for the ACK of a UBX CFG command, seconds.
+UBX_ACK_SECONDS = 1.0
+# Time for the module to switch baud rate after CFG-PRT, seconds.
+UBX_BAUD_SWITCH_SECONDS = 0.1
+# CFG-PRT UART port ID, 8 data bits no parity 1 stop bit mode, and protocol mask bits.
+UBX_PORT_UART1 = 1
+UBX_PRT_MODE_8N1 = 0x000008D0
+UBX_PROTO_UBX = 0x0001
+UBX_PROTO_NMEA = 0x0002
+# CFG-RATE time reference, GPS time.
+UBX_RATE_TIME_GPS = 1
+# CFG-CFG sections saved, ioPort, msgConf, infMsg, navConf, rxmConf, rinvConf, antConf,
+# and devices saved to, battery backed RAM, flash, EEPROM and SPI flash.
+UBX_CFG_SAVE_MASK = 0x0000061F
+UBX_CFG_DEVICES = 0x17
+# CFG-PRT, CFG-RATE and CFG-CFG payloads.
+UbxPrtStruct = struct.Struct("<BBHIIHHHH")
+UbxRateStruct = struct.Struct("<HHH")
+UbxCfgStruct = struct.Struct("<IIIB")
+
+# Fixes held in the GpsReader history.
+GPS_HISTORY_SIZE = 64
+# Time the GpsReader waits when no data is waiting on the UART, seconds.
+GPS_READ_SECONDS = 0.01
+
+# NMEA sentences output by ConfigureGps, once every Rate solutions, the others are disabled.
+# RMC and GGA carry the fix, GSA the DOP, GSV the satellites shown while there is no fix.
+GPS_NMEA_RATES = { "RMC" : 1, "GGA" : 1, "GSA" : 1, "GSV" : GPS_MAX_RATE_HZ }
+
+# NAV-SOL gpsFix values, and the flags bit set when the fix is within limits.
+UBX_GPSFIX_NONE = 0
+UBX_GPSFIX_DEAD_RECKONING = 1
+UBX_GPSFIX_2D = 2
+UBX_GPSFIX_3D = 3
+UBX_GPSFIX_GPS_DEAD_RECKONING = 4
+UBX_GPSFIX_TIME = 5
+UBX_SOL_FLAGS_GPSFIXOK = 0x01
+# NAV-TIMEUTC valid flag set when the UTC time is known.
+UBX_TIMEUTC_VALID_UTC = 0x04
+
+# Metres per second in a knot.
+KNOTS_TO_MS = 0.514444
 
 # Satellite data structure.
 SATELLITE_ELEMENT_COUNT = 4
@@ -58,6 +168,13 @@ GPS_STRUCT_LONG = 7
 
 
 
+# NMEA framer for each open GPS UART connection.
+GpsFramers = {}
+# UBX framer for each open GPS UART connection.
+GpsUbxFramers = {}
+
+
+
 # GPS Module GPS data protocol element position data types.
 GpsDataProtocol = {
    "$GPRMC" : [ GPS_STRUCT_DISCARD,
@@ -68,31 +185,449 @@ GpsDataProtocol = {
 
 
 
-#/*********************************************/
-#/* Open a UART connection to the GPS module. */
-#/*********************************************/
-def OpenGPS(SerialPort):
-   ThisGps = serial.Serial(SerialPort, timeout = 0)
+#/***************************************************************************/
+#/* Frames a stream of UART bytes into NMEA sentences. Bytes are written    */
+#/* into a fixed size ring buffer, complete sentences are taken out of it   */
+#/* and checked against their checksum, and a partial sentence stays in the */
+#/* ring until the rest of it has been read. Bytes before a '$', sentences  */
+#/* cut short by a new '$', and over long sentences are skipped and counted */
+#/* as resyncs, so a good sentence is never lost to read alignment.         */
+#/***************************************************************************/
+class NmeaFramer(object):
+   # Names for DisplayStats.
+   FramerName = "NMEA"
+   ItemName = "Sentences"
+
+   def __init__(self, RingSize = NMEA_RING_SIZE):
+      self.RingSize = RingSize
+      self.Ring = bytearray(RingSize)
+      # Stream positions of the oldest byte held and the next byte written.
+      self.Tail = 0
+      self.Head = 0
+      # Stream position up to which no line end was found in the sentence at Tail.
+      self.Scanned = 0
+      self.ByteCount = 0
+      self.SentenceCount = 0
+      self.ChecksumErrors = 0
+      self.ResyncCount = 0
+      self.OverflowCount = 0
+
+
+   #/*********************************************/
+   #/* Return the number of bytes the ring can   */
+   #/* take before unread bytes are overwritten. */
+   #/*********************************************/
+   def GetFree(self):
+      return self.RingSize - (self.Head - self.Tail)
+
+
+   #/****************************************************************/
+   #/* Add bytes read from the UART. When the ring is full the      */
+   #/* oldest bytes are overwritten, and the framer resyncs on '$'. */
+   #/****************************************************************/
+   def Feed(self, Data):
+      if not isinstance(Data, (bytes, bytearray)):
+         Data = Data.encode("ascii", "replace")
+      self.ByteCount += len(Data)
+      if len(Data) > self.RingSize:
+         Data = Data[-self.RingSize:]
+      Length = len(Data)
+      if Length > self.GetFree():
+         self.OverflowCount += 1
+         self.Tail = self.Head + Length - self.RingSize
+         self.Scanned = self.Tail
+      Start = self.Head % self.RingSize
+      First = min(Length, self.RingSize - Start)
+      self.Ring[Start:Start + First] = Data[:First]
+      self.Ring[:Length - First] = Data[First:]
+      self.Head += Length
+
+
+   #/*****************************************************************/
+   #/* Return the stream position of the first Byte from Start up to */
+   #/* the newest byte held, or -1 when not found.                   */
+   #/*****************************************************************/
+   def Find(self, Byte, Start):
+      Result = -1
+      if Start < self.Head:
+         RingStart = Start % self.RingSize
+         RingEnd = RingStart + (self.Head - Start)
+         if RingEnd <= self.RingSize:
+            Index = self.Ring.find(Byte, RingStart, RingEnd)
+            if Index >= 0:
+               Result = Start + Index - RingStart
+         else:
+            Index = self.Ring.find(Byte, RingStart)
+            if Index >= 0:
+               Result = Start + Index - RingStart
+            else:
+               Index = self.Ring.find(Byte, 0, RingEnd - self.RingSize)
+               if Index >= 0:
+                  Result = Start + self.RingSize - RingStart + Index
+      return Result
+
+
+   #/*********************************************************/
+   #/* Return a copy of the bytes held from Start up to End. */
+   #/*********************************************************/
+   def Copy(self, Start, End):
+      RingStart = Start % self.RingSize
+      RingEnd = RingStart + (End - Start)
+      if RingEnd <= self.RingSize:
+         Result = self.Ring[RingStart:RingEnd]
+      else:
+         Result = self.Ring[RingStart:] + self.Ring[:RingEnd - self.RingSize]
+      return Result
+
+
+   #/***************************************************************/
+   #/* Yield each complete sentence held with a valid checksum,    */
+   #/* without the line end. A partial sentence stays in the ring. */
+   #/***************************************************************/
+   def Sentences(self):
+      while self.Tail < self.Head:
+         # Skip to the start of a sentence.
+         if self.Ring[self.Tail % self.RingSize] != 0x24:
+            Start = self.Find(b"$", self.Tail)
+            self.ResyncCount += 1
+            if Start < 0:
+               self.Tail = self.Head
+               break
+            self.Tail = Start
+         End = self.Find(b"\n", max(self.Scanned, self.Tail + 1))
+         if End < 0:
+            self.Scanned = self.Head
+            if self.Head - self.Tail > NMEA_MAX_SENTENCE:
+               # No line end, skip this '$' and resync on the next.
+               self.Tail += 1
+               continue
+            break
+         Sentence = self.Copy(self.Tail, End)
+         self.Tail = End + 1
+         self.Scanned = self.Tail
+         # A sentence cut short by the start of the next, keep the last.
+         Start = Sentence.rfind(b"$")
+         if Start > 0:
+            self.ResyncCount += 1
+            Sentence = Sentence[Start:]
+         Sentence = Sentence.rstrip(b"\r")
+         if len(Sentence) > NMEA_MAX_SENTENCE:
+            self.ResyncCount += 1
+         elif not NmeaChecksumValid(Sentence):
+            self.ChecksumErrors += 1
+         else:
+            self.SentenceCount += 1
+            yield Sentence.decode("ascii")
+
+
+   #/******************************************/
+   #/* Convert the framer statistics to text. */
+   #/******************************************/
+   def DisplayStats(self):
+      Result = self.FramerName + " FRAMER:\n"
+      Result += "Bytes: " + str(self.ByteCount) + "\n"
+      Result += self.ItemName + ": " + str(self.SentenceCount) + "\n"
+      Result += "Checksum Errors: " + str(self.ChecksumErrors) + "\n"
+      Result += "Resyncs: " + str(self.ResyncCount) + "\n"
+      Result += "Overflows: " + str(self.OverflowCount) + "\n"
+      Result += "Buffered: " + str(self.Head - self.Tail) + "\n"
+      return Result
+
+
+
+#/****************************************************************/
+#/* Return True when a sentence, "$...*hh" without the line end, */
+#/* ends in the hex XOR of the characters between '$' and '*'.   */
+#/****************************************************************/
+def NmeaChecksumValid(Sentence):
+   Result = False
+   if len(Sentence) >= 4 and Sentence[-3:-2] == b"*":
+      Checksum = 0
+      for Char in bytearray(Sentence[1:-3]):
+         Checksum ^= Char
+      try:
+         Result = (Checksum == int(Sentence[-2:], 16))
+      except ValueError:
+         Result = False
+   return Result
+
+
+
+#/***************************************************************************/
+#/* Frames a stream of UART bytes into UBX messages, in the same ring       */
+#/* buffer as NmeaFramer. Each message is sync characters, class, ID, a     */
+#/* little endian payload length, the payload and an 8 bit Fletcher         */
+#/* checksum over class to payload. Bytes before the sync characters, and   */
+#/* messages with a bad length or checksum, are skipped one byte at a time, */
+#/* so a message starting inside a damaged one is still found.              */
+#/***************************************************************************/
+class UbxFramer(NmeaFramer):
+   FramerName = "UBX"
+   ItemName = "Messages"
+
+
+   #/**********************************************/
+   #/* Return the byte held at a stream position. */
+   #/**********************************************/
+   def Byte(self, Position):
+      return self.Ring[Position % self.RingSize]
+
+
+   #/*****************************************************************/
+   #/* Yield [Class, ID, Payload] of each complete message held with */
+   #/* a valid checksum. A partial message stays in the ring.        */
+   #/*****************************************************************/
+   def Messages(self):
+      while self.Head - self.Tail >= len(UBX_SYNC):
+         # Skip to the sync characters.
+         if self.Byte(self.Tail) != 0xB5 or self.Byte(self.Tail + 1) != 0x62:
+            Start = self.Find(UBX_SYNC[:1], self.Tail + 1)
+            self.ResyncCount += 1
+            if Start < 0:
+               self.Tail = self.Head
+               break
+            self.Tail = Start
+            continue
+         if self.Head - self.Tail < UBX_HEADER_SIZE:
+            break
+         Length = self.Byte(self.Tail + 4) | (self.Byte(self.Tail + 5) << 8)
+         if Length > UBX_MAX_PAYLOAD:
+            self.ResyncCount += 1
+            self.Tail += 1
+            continue
+         End = self.Tail + UBX_HEADER_SIZE + Length + UBX_CHECKSUM_SIZE
+         if self.Head < End:
+            break
+         Message = self.Copy(self.Tail + 2, End)
+         if UbxChecksum(Message[:-UBX_CHECKSUM_SIZE]) != Message[-UBX_CHECKSUM_SIZE:]:
+            self.ChecksumErrors += 1
+            self.Tail += 1
+            continue
+         self.Tail = End
+         self.SentenceCount += 1
+         yield [Message[0], Message[1], bytes(Message[4:-UBX_CHECKSUM_SIZE])]
+
+
+
+#/**************************************************************/
+#/* Return the two byte 8 bit Fletcher checksum of UBX message */
+#/* data, from the class to the end of the payload.            */
+#/**************************************************************/
+def UbxChecksum(Data):
+   CheckA = 0
+   CheckB = 0
+   for Byte in bytearray(Data):
+      CheckA = (CheckA + Byte) & 0xFF
+      CheckB = (CheckB + CheckA) & 0xFF
+   return bytearray([CheckA, CheckB])
+
+
+
+#/************************************************************/
+#/* Return a complete UBX message for a (Class, ID) message. */
+#/************************************************************/
+def UbxMessage(Message, Payload = b""):
+   Data = bytearray([Message[0], Message[1], len(Payload) & 0xFF, len(Payload) >> 8]) + bytearray(Payload)
+   return bytes(bytearray(UBX_SYNC) + Data + UbxChecksum(Data))
+
+
+
+#/***********************************************************/
+#/* Open a UART connection to the GPS module. With Protocol */
+#/* GPS_PROTOCOL_UBX the module is switched to UBX output.  */
+#/***********************************************************/
+def OpenGPS(SerialPort, Protocol = GPS_PROTOCOL_NMEA, BaudRate = GPS_DEFAULT_BAUD):
+   if serial is None:
+      raise RuntimeError("serial module not installed, GPS UART unavailable.")
+   ThisGps = serial.Serial(SerialPort, baudrate = BaudRate, timeout = 0)
+   GpsFramers[ThisGps] = NmeaFramer()
+   GpsUbxFramers[ThisGps] = UbxFramer()
+   if Protocol == GPS_PROTOCOL_UBX:
+      SetUbxOutput(ThisGps)
    return ThisGps
 
 
 
-#/******************************************/
-#/* Retreive raw data from the GPS module. */
-#/******************************************/
-def GetGpsData(ThisGPS):
-   # Read GPS data.
-   GpsData = ""
-   ThisGpsData = "."
-   while ThisGpsData != "":
-      ThisGpsData = ThisGPS.read(BUFF_SIZE)
-      # Not using interupt pin to syncronise data, so manually syncronise.
-      if len(ThisGpsData) > 0 and ThisGpsData[0] != "$":
-         time.sleep(0.1)
-         GpsData = ""
+#/************************************************************/
+#/* Return the NMEA framer of a GPS UART connection, created */
+#/* for connections not opened with OpenGPS.                 */
+#/************************************************************/
+def GetFramer(ThisGPS):
+   if ThisGPS not in GpsFramers:
+      GpsFramers[ThisGPS] = NmeaFramer()
+   return GpsFramers[ThisGPS]
+
+
+
+#/****************************************************************/
+#/* Yield each valid NMEA sentence from the data waiting on the  */
+#/* GPS UART, reading no more than the framer ring has room for. */
+#/****************************************************************/
+def ReadSentences(ThisGPS):
+   Framer = GetFramer(ThisGPS)
+   while True:
+      ThisGpsData = ThisGPS.read(min(BUFF_SIZE, Framer.GetFree()))
+      if len(ThisGpsData) == 0:
          break
-      elif len(ThisGpsData) > 0 and ThisGpsData[0] != ".":
-         GpsData += ThisGpsData
+      Framer.Feed(ThisGpsData)
+      for Sentence in Framer.Sentences():
+         yield Sentence
+
+
+
+#/*****************************************************************/
+#/* Yield [Class, ID, Payload] of each valid UBX message from the */
+#/* data waiting on the GPS UART.                                 */
+#/*****************************************************************/
+def ReadUbxMessages(ThisGPS):
+   if ThisGPS not in GpsUbxFramers:
+      GpsUbxFramers[ThisGPS] = UbxFramer()
+   Framer = GpsUbxFramers[ThisGPS]
+   while True:
+      ThisGpsData = ThisGPS.read(min(BUFF_SIZE, Framer.GetFree()))
+      if len(ThisGpsData) == 0:
+         break
+      Framer.Feed(ThisGpsData)
+      for Message in Framer.Messages():
+         yield Message
+
+
+
+#/****************************************************************/
+#/* Send a UBX CFG command and wait for its ACK. Returns True on */
+#/* ACK-ACK, False on ACK-NAK or no ACK within Timeout seconds.  */
+#/* Other messages read while waiting are discarded.             */
+#/****************************************************************/
+def UbxCommand(ThisGPS, Message, Payload = b"", Timeout = UBX_ACK_SECONDS):
+   ThisGPS.write(UbxMessage(Message, Payload))
+   EndTime = time.time() + Timeout
+   while time.time() < EndTime:
+      for Reply in ReadUbxMessages(ThisGPS):
+         if (Reply[0], Reply[1]) in (UBX_ACK_ACK, UBX_ACK_NAK) and bytearray(Reply[2][:2]) == bytearray(Message):
+            return (Reply[0], Reply[1]) == UBX_ACK_ACK
+      time.sleep(0.01)
+   return False
+
+
+
+#/********************************************************************/
+#/* Set the output rate of a (Class, ID) message on the port         */
+#/* receiving the command, once every Rate solutions, 0 disables it. */
+#/* Returns True when the module acknowledged it.                    */
+#/********************************************************************/
+def UbxSetMessageRate(ThisGPS, Message, Rate):
+   return UbxCommand(ThisGPS, UBX_CFG_MSG, bytearray([Message[0], Message[1], Rate]))
+
+
+
+#/*****************************************************************/
+#/* Switch the module from NMEA to UBX output, the NMEA sentences */
+#/* are disabled and the UBX navigation messages enabled.         */
+#/*****************************************************************/
+def SetUbxOutput(ThisGPS):
+   Result = True
+   for Id in UBX_NMEA_IDS.values():
+      Result = UbxSetMessageRate(ThisGPS, (UBX_CLASS_NMEA, Id), 0) and Result
+   for Message in UBX_NAV_MESSAGES:
+      Result = UbxSetMessageRate(ThisGPS, Message, 1) and Result
+   return Result
+
+
+
+#/****************************************************************/
+#/* Set the rate of each NMEA sentence, a dictionary of sentence */
+#/* type and output every Rate solutions. Sentences not listed   */
+#/* are disabled. Returns True when all were acknowledged.       */
+#/****************************************************************/
+def SetNmeaSentences(ThisGPS, Rates = GPS_NMEA_RATES):
+   Result = True
+   for Type in UBX_NMEA_IDS:
+      Result = UbxSetMessageRate(ThisGPS, (UBX_CLASS_NMEA, UBX_NMEA_IDS[Type]), Rates.get(Type, 0)) and Result
+   return Result
+
+
+
+#/****************************************************************/
+#/* Set the navigation rate, up to GPS_MAX_RATE_HZ solutions per */
+#/* second. Returns True when the module acknowledged it.        */
+#/****************************************************************/
+def SetNavigationRate(ThisGPS, RateHz):
+   if RateHz <= 0 or RateHz > GPS_MAX_RATE_HZ:
+      raise ValueError("Navigation rate {:} Hz outside 0 to {:d} Hz.".format(RateHz, GPS_MAX_RATE_HZ))
+   return UbxCommand(ThisGPS, UBX_CFG_RATE, UbxRateStruct.pack(int(round(1000.0 / RateHz)), 1, UBX_RATE_TIME_GPS))
+
+
+
+#/*****************************************************************/
+#/* Switch the module UART and then the port to BaudRate, UBX     */
+#/* and NMEA in and out. The ACK of CFG-PRT is sent as the module */
+#/* switches, so it is not waited for. The port is reopened at    */
+#/* the new rate and the module polled for its port settings,     */
+#/* returns True when the poll is acknowledged at the new rate.   */
+#/*****************************************************************/
+def SetBaudRate(ThisGPS, BaudRate):
+   ThisGPS.write(UbxMessage(UBX_CFG_PRT, UbxPrtStruct.pack(UBX_PORT_UART1, 0, 0, UBX_PRT_MODE_8N1, BaudRate, UBX_PROTO_UBX | UBX_PROTO_NMEA, UBX_PROTO_UBX | UBX_PROTO_NMEA, 0, 0)))
+   ThisGPS.flush()
+   time.sleep(UBX_BAUD_SWITCH_SECONDS)
+   ReopenGPS(ThisGPS, BaudRate)
+   return UbxCommand(ThisGPS, UBX_CFG_PRT, bytearray([UBX_PORT_UART1]))
+
+
+
+#/*****************************************************************/
+#/* Reopen the UART at BaudRate, bytes held by the framers at the */
+#/* old rate are discarded.                                       */
+#/*****************************************************************/
+def ReopenGPS(ThisGPS, BaudRate):
+   ThisGPS.close()
+   ThisGPS.baudrate = BaudRate
+   ThisGPS.open()
+   GpsFramers[ThisGPS] = NmeaFramer()
+   GpsUbxFramers[ThisGPS] = UbxFramer()
+
+
+
+#/*****************************************************************/
+#/* Save the current configuration to the module battery backed   */
+#/* RAM and flash, so it is kept over a power cycle. Returns True */
+#/* when the module acknowledged it.                              */
+#/*****************************************************************/
+def SaveConfiguration(ThisGPS):
+   return UbxCommand(ThisGPS, UBX_CFG_CFG, UbxCfgStruct.pack(0, UBX_CFG_SAVE_MASK, 0, UBX_CFG_DEVICES))
+
+
+
+#/****************************************************************/
+#/* Configure the module for low fix latency: BaudRate, RateHz   */
+#/* navigation solutions per second, and only the NMEA sentences */
+#/* in Rates. A module saved at BaudRate does not answer at the  */
+#/* current rate, the port is then switched to BaudRate first.   */
+#/* With Save the settings are kept over a power cycle. Returns  */
+#/* True when every command was acknowledged.                    */
+#/****************************************************************/
+def ConfigureGps(ThisGPS, BaudRate = 115200, RateHz = GPS_MAX_RATE_HZ, Rates = GPS_NMEA_RATES, Save = False):
+   Result = True
+   if ThisGPS.baudrate != BaudRate:
+      if UbxCommand(ThisGPS, UBX_CFG_PRT, bytearray([UBX_PORT_UART1])):
+         Result = SetBaudRate(ThisGPS, BaudRate)
+      else:
+         ReopenGPS(ThisGPS, BaudRate)
+         Result = UbxCommand(ThisGPS, UBX_CFG_PRT, bytearray([UBX_PORT_UART1]))
+   Result = SetNavigationRate(ThisGPS, RateHz) and Result
+   Result = SetNmeaSentences(ThisGPS, Rates) and Result
+   if Save:
+      Result = SaveConfiguration(ThisGPS) and Result
+   return Result
+
+
+
+#/***************************************************************/
+#/* Retreive the complete NMEA sentences waiting from the GPS   */
+#/* module, one per line. A sentence split across reads is kept */
+#/* for the next call.                                          */
+#/***************************************************************/
+def GetGpsData(ThisGPS):
+   GpsData = "".join(Sentence + "\r\n" for Sentence in ReadSentences(ThisGPS))
    return GpsData
 
 
@@ -156,6 +691,8 @@ def GetGpsDecode(GpsData):
          # Place the element types defined by the protocol into this applications data structure.
          ThisGpsDataProtocol = GpsDataProtocol[DataElements[0]]
          for Count in range(len(DataElements)):
+            if Count >= len(ThisGpsDataProtocol):
+               break
             ProtocolElement = ThisGpsDataProtocol[Count]
             # If the protocol element indicates the data is valid, flag the data as valid.
             if ProtocolElement == GPS_STRUCT_STATUS and DataElements[Count] == "A":
@@ -167,3 +704,499 @@ def GetGpsDecode(GpsData):
       GpsStruct = [0] * GPS_STRUCT_ELEMENT_COUNT
    return GpsStruct
 
+
+
+#/*********************************************************/
+#/* NMEA field converters, passed the fields of a         */
+#/* sentence and the index of the field to convert. Each  */
+#/* raises ValueError for a field which does not convert. */
+#/*********************************************************/
+def NmeaFloat(Fields, Index):
+   return float(Fields[Index])
+
+
+def NmeaInt(Fields, Index):
+   return int(Fields[Index])
+
+
+def NmeaStatus(Fields, Index):
+   return Fields[Index] == "A"
+
+
+# ddmm.mmmm or dddmm.mmmm and the hemisphere in the next field, to signed decimal degrees.
+def NmeaDegrees(Fields, Index):
+   Value = float(Fields[Index])
+   Degrees = int(Value / 100)
+   Result = Degrees + (Value - 100 * Degrees) / 60
+   if Index + 1 < len(Fields) and (Fields[Index + 1] == "S" or Fields[Index + 1] == "W"):
+      Result = -Result
+   return Result
+
+
+# hhmmss.ss to a time of day.
+def NmeaTime(Fields, Index):
+   Value = Fields[Index]
+   Seconds = float(Value[4:])
+   return datetime.time(int(Value[0:2]), int(Value[2:4]), int(Seconds), int(round((Seconds - int(Seconds)) * 100)) * 10000)
+
+
+# ddmmyy to a date.
+def NmeaDate(Fields, Index):
+   Value = Fields[Index]
+   return datetime.date(2000 + int(Value[4:6]), int(Value[2:4]), int(Value[0:2]))
+
+
+# GSA satellite ID fields, up to 12, to a list of the IDs used.
+def NmeaSatelliteIds(Fields, Index):
+   return [int(Value) for Value in Fields[Index:Index + 12] if Value != ""]
+
+
+# GSV satellite fields, groups of ID, elevation, azimuth and C/N0, to a list of GpsSatellite.
+def NmeaSatellites(Fields, Index):
+   Satellites = []
+   for Count in range(Index, len(Fields) - 3, SATELLITE_ELEMENT_COUNT):
+      if Fields[Count] != "":
+         Satellites.append(GpsSatellite(int(Fields[Count]), NmeaOptionalInt(Fields[Count + 1]), NmeaOptionalInt(Fields[Count + 2]), NmeaOptionalInt(Fields[Count + 3])))
+   return Satellites
+
+
+def NmeaOptionalInt(Value):
+   if Value == "":
+      Result = None
+   else:
+      Result = int(Value)
+   return Result
+
+
+
+#/*******************************************************/
+#/* One satellite in view, reported by GSV sentences.   */
+#/* Elevation and azimuth in degrees, C/N0 in dBHz, any */
+#/* not reported are None.                              */
+#/*******************************************************/
+class GpsSatellite(object):
+   __slots__ = ("Id", "Elevation", "Azimuth", "Cno")
+
+   def __init__(self, Id, Elevation, Azimuth, Cno):
+      self.Id = Id
+      self.Elevation = Elevation
+      self.Azimuth = Azimuth
+      self.Cno = Cno
+
+
+   def __repr__(self):
+      return "[{:}, {:}, {:}, {:}]".format(self.Id, self.Elevation, self.Azimuth, self.Cno)
+
+
+
+#/***************************************************************************/
+#/* One navigation epoch decoded from NMEA sentences, all fields numeric.   */
+#/* Fields not reported by the sentences received are None.                 */
+#/*                                                                         */
+#/* DateTime  - UTC datetime, from UtcDate and UtcTime.                     */
+#/* Valid     - Fix reported valid by RMC or GLL.                           */
+#/* Latitude, Longitude - Decimal degrees, positive North and East.         */
+#/* Altitude  - Metres above mean sea level.                                */
+#/* Speed     - Speed over ground, knots. Course - True course, degrees.    */
+#/* Quality   - GGA fix quality, 0 none, 1 GPS, 2 DGPS, 6 dead reckoning.   */
+#/* FixType   - GSA navigation mode, 1 none, 2 2D, 3 3D.                    */
+#/* SatellitesUsed - Satellites used in the fix, SatelliteIds their IDs.    */
+#/* Pdop, Hdop, Vdop - Dilution of precision.                               */
+#/* HorizontalAccuracy, VerticalAccuracy - Estimated accuracy, metres, UBX. */
+#/* SatellitesInView - Satellites in view, Satellites a GpsSatellite each.  */
+#/***************************************************************************/
+class GpsFix(object):
+   __slots__ = ("UtcDate", "UtcTime", "DateTime", "Valid", "Latitude", "Longitude", "Altitude",
+                "Speed", "Course", "Quality", "FixType", "SatellitesUsed", "SatelliteIds",
+                "Pdop", "Hdop", "Vdop", "HorizontalAccuracy", "VerticalAccuracy", "SatellitesInView", "Satellites")
+
+   def __init__(self):
+      for Name in GpsFix.__slots__:
+         setattr(self, Name, None)
+      self.Valid = False
+
+
+   #/*****************************/
+   #/* Return a copy of the fix. */
+   #/*****************************/
+   def Copy(self):
+      Result = GpsFix()
+      for Name in GpsFix.__slots__:
+         setattr(Result, Name, getattr(self, Name))
+      return Result
+
+
+   #/****************************/
+   #/* Convert the fix to text. */
+   #/****************************/
+   def DisplayFix(self):
+      Result = "GPS FIX: " + str(self.DateTime) + " VALID: " + str(self.Valid) + "\n"
+      if self.Latitude is not None and self.Longitude is not None:
+         Result += "Position: {:.6f}, {:.6f}\n".format(self.Latitude, self.Longitude)
+      if self.Altitude is not None:
+         Result += "Altitude: {:.1f}m\n".format(self.Altitude)
+      if self.Speed is not None:
+         Result += "Speed: {:.2f}kn Course: {:}\n".format(self.Speed, self.Course)
+      Result += "Quality: {:} Fix Type: {:} Satellites: {:}/{:}\n".format(self.Quality, self.FixType, self.SatellitesUsed, self.SatellitesInView)
+      Result += "DOP: P {:} H {:} V {:}\n".format(self.Pdop, self.Hdop, self.Vdop)
+      if self.HorizontalAccuracy is not None:
+         Result += "Accuracy: H {:.2f}m V {:.2f}m\n".format(self.HorizontalAccuracy, self.VerticalAccuracy)
+      return Result
+
+
+
+# Fields of each NMEA sentence decoded, [Field Index, GpsFix Attribute, Converter].
+NmeaSentenceFields = {
+   "RMC" : [ [1, "UtcTime", NmeaTime], [2, "Valid", NmeaStatus], [3, "Latitude", NmeaDegrees], [5, "Longitude", NmeaDegrees],
+             [7, "Speed", NmeaFloat], [8, "Course", NmeaFloat], [9, "UtcDate", NmeaDate] ],
+   "GGA" : [ [1, "UtcTime", NmeaTime], [2, "Latitude", NmeaDegrees], [4, "Longitude", NmeaDegrees], [6, "Quality", NmeaInt],
+             [7, "SatellitesUsed", NmeaInt], [8, "Hdop", NmeaFloat], [9, "Altitude", NmeaFloat] ],
+   "GSA" : [ [2, "FixType", NmeaInt], [3, "SatelliteIds", NmeaSatelliteIds], [15, "Pdop", NmeaFloat], [16, "Hdop", NmeaFloat],
+             [17, "Vdop", NmeaFloat] ],
+   "VTG" : [ [1, "Course", NmeaFloat], [5, "Speed", NmeaFloat] ],
+   "GLL" : [ [1, "Latitude", NmeaDegrees], [3, "Longitude", NmeaDegrees], [5, "UtcTime", NmeaTime], [6, "Valid", NmeaStatus] ],
+   "GSV" : [ [3, "SatellitesInView", NmeaInt] ]
+}
+
+# Field of the UTC time in the NMEA sentences which carry it, a new time starts a new epoch.
+NmeaTimeFields = { "RMC" : 1, "GGA" : 1, "GLL" : 5 }
+
+
+
+#/**************************************************************************/
+#/* Decodes NMEA sentences into GpsFix records. The type of each sentence, */
+#/* whatever the talker ID, selects its field table, and each field in the */
+#/* table is converted once as the sentence is decoded. A sentence with a  */
+#/* new UTC time starts a new record, the record of the previous epoch is  */
+#/* not changed again. The satellites in view are collected over the GSV   */
+#/* sentences of an epoch.                                                 */
+#/**************************************************************************/
+class NmeaDecoder(object):
+   def __init__(self):
+      self.Fix = GpsFix()
+      # Satellites of the GSV sentences received so far in the current GSV sequence.
+      self.GsvSatellites = []
+      self.SentenceCounts = {}
+      self.UnknownCount = 0
+      self.FieldErrors = 0
+
+
+   #/****************************************************************/
+   #/* Decode one sentence, "$...*hh" with or without the line end. */
+   #/* Returns the GpsFix updated, None for sentences not decoded.  */
+   #/****************************************************************/
+   def Decode(self, Sentence):
+      Sentence = Sentence.rstrip("\r\n")
+      Checksum = Sentence.rfind("*")
+      if Checksum >= 0:
+         Sentence = Sentence[:Checksum]
+      Fields = Sentence.split(",")
+      Type = Fields[0][3:]
+      Table = NmeaSentenceFields.get(Type)
+      if Table is None or not Fields[0].startswith("$"):
+         self.UnknownCount += 1
+         return None
+      self.SentenceCounts[Type] = self.SentenceCounts.get(Type, 0) + 1
+
+      Fix = self.Fix
+      TimeField = NmeaTimeFields.get(Type)
+      if TimeField is not None and TimeField < len(Fields) and Fields[TimeField] != "" and Fix.UtcTime is not None:
+         try:
+            if NmeaTime(Fields, TimeField) != Fix.UtcTime:
+               # The date carries over, GGA and GLL have none of their own.
+               Fix = GpsFix()
+               Fix.UtcDate = self.Fix.UtcDate
+               self.Fix = Fix
+         except ValueError:
+            pass
+
+      for Index, Attribute, Converter in Table:
+         if Index < len(Fields) and Fields[Index] != "":
+            try:
+               setattr(Fix, Attribute, Converter(Fields, Index))
+            except ValueError:
+               self.FieldErrors += 1
+      if Type == "GSV":
+         self.AddSatellites(Fields, Fix)
+      if Fix.UtcDate is not None and Fix.UtcTime is not None:
+         Fix.DateTime = datetime.datetime.combine(Fix.UtcDate, Fix.UtcTime)
+      return Fix
+
+
+   #/****************************************************************/
+   #/* Collect the satellites of a GSV sentence, the fix takes them */
+   #/* all on the last sentence of the sequence.                    */
+   #/****************************************************************/
+   def AddSatellites(self, Fields, Fix):
+      try:
+         MessageCount = int(Fields[1])
+         MessageNumber = int(Fields[2])
+         if MessageNumber == 1:
+            self.GsvSatellites = []
+         self.GsvSatellites += NmeaSatellites(Fields, 4)
+         if MessageNumber == MessageCount:
+            Fix.Satellites = self.GsvSatellites
+            self.GsvSatellites = []
+      except (ValueError, IndexError):
+         self.FieldErrors += 1
+
+
+   #/****************************************************************/
+   #/* Decode the sentences of GetGpsData(), one per line. Returns  */
+   #/* the GpsFix of the last sentence decoded, None when none was. */
+   #/****************************************************************/
+   def DecodeData(self, GpsData):
+      Result = None
+      for DataLine in GpsData.split("\n"):
+         if len(DataLine) > 0:
+            Fix = self.Decode(DataLine)
+            if Fix is not None:
+               Result = Fix
+      return Result
+
+
+   #/*******************************************/
+   #/* Convert the decoder statistics to text. */
+   #/*******************************************/
+   def DisplayStats(self):
+      Result = "NMEA DECODER:\n"
+      for Type in sorted(self.SentenceCounts):
+         Result += Type + ": " + str(self.SentenceCounts[Type]) + "\n"
+      Result += "Unknown: " + str(self.UnknownCount) + "\n"
+      Result += "Field Errors: " + str(self.FieldErrors) + "\n"
+      return Result
+
+
+
+# UBX navigation messages decoded, (Class, ID) : [Payload Struct, [[Value Index, GpsFix Attribute, Scale]]].
+# The first value of each is the GPS time of week of the solution, iTOW.
+UbxMessageFields = {
+   UBX_NAV_POSLLH : [ struct.Struct("<IiiiiII"),
+                      [ [1, "Longitude", 1e-7], [2, "Latitude", 1e-7], [4, "Altitude", 0.001],
+                        [5, "HorizontalAccuracy", 0.001], [6, "VerticalAccuracy", 0.001] ] ],
+   UBX_NAV_VELNED : [ struct.Struct("<IiiiIIiII"),
+                      [ [5, "Speed", 0.01 / KNOTS_TO_MS], [6, "Course", 1e-5] ] ],
+   UBX_NAV_SOL : [ struct.Struct("<IihBBiiiIiiiIHBBI"),
+                   [ [13, "Pdop", 0.01], [15, "SatellitesUsed", None] ] ],
+   UBX_NAV_TIMEUTC : [ struct.Struct("<IIiHBBBBBB"), [] ]
+}
+
+# NAV-SOL gpsFix to the NMEA GSA fix type, 1 none, 2 2D, 3 3D.
+UbxFixTypes = { UBX_GPSFIX_2D : 2, UBX_GPSFIX_3D : 3, UBX_GPSFIX_GPS_DEAD_RECKONING : 3 }
+
+
+
+#/**************************************************************************/
+#/* Decodes UBX navigation messages into GpsFix records, as NmeaDecoder    */
+#/* does NMEA sentences. Each message payload is unpacked with one struct  */
+#/* call and the values in its table scaled into the fix. A message with a */
+#/* new time of week starts a new record.                                  */
+#/**************************************************************************/
+class UbxDecoder(object):
+   def __init__(self):
+      self.Fix = GpsFix()
+      # Time of week of the solution in the current record.
+      self.Itow = None
+      self.MessageCounts = {}
+      self.UnknownCount = 0
+      self.LengthErrors = 0
+
+
+   #/*************************************************************/
+   #/* Decode one message from UbxFramer.Messages(). Returns the */
+   #/* GpsFix updated, None for messages not decoded.            */
+   #/*************************************************************/
+   def Decode(self, Message):
+      Key = (Message[0], Message[1])
+      Entry = UbxMessageFields.get(Key)
+      if Entry is None:
+         self.UnknownCount += 1
+         return None
+      if len(Message[2]) != Entry[0].size:
+         self.LengthErrors += 1
+         return None
+      self.MessageCounts[Key] = self.MessageCounts.get(Key, 0) + 1
+      Values = Entry[0].unpack(Message[2])
+
+      if Values[0] != self.Itow:
+         if self.Itow is not None:
+            self.Fix = GpsFix()
+         self.Itow = Values[0]
+      Fix = self.Fix
+      for Index, Attribute, Scale in Entry[1]:
+         if Scale is None:
+            setattr(Fix, Attribute, Values[Index])
+         else:
+            setattr(Fix, Attribute, Values[Index] * Scale)
+      if Key == UBX_NAV_SOL:
+         Fix.FixType = UbxFixTypes.get(Values[3], 1)
+         Fix.Valid = (Values[4] & UBX_SOL_FLAGS_GPSFIXOK) != 0 and Fix.FixType > 1
+         Fix.Quality = int(Fix.Valid)
+      elif Key == UBX_NAV_TIMEUTC and Values[9] & UBX_TIMEUTC_VALID_UTC:
+         Fix.UtcDate = datetime.date(Values[3], Values[4], Values[5])
+         # UBX gives nanoseconds, rounded to hundredths of a second as NMEA.
+         Centiseconds = min(99, max(0, int(round(Values[2] / 1e7))))
+         Fix.UtcTime = datetime.time(Values[6], Values[7], min(Values[8], 59), Centiseconds * 10000)
+         Fix.DateTime = datetime.datetime.combine(Fix.UtcDate, Fix.UtcTime)
+      return Fix
+
+
+   #/*******************************************/
+   #/* Convert the decoder statistics to text. */
+   #/*******************************************/
+   def DisplayStats(self):
+      Result = "UBX DECODER:\n"
+      for Key in sorted(self.MessageCounts):
+         Result += "{:02X}-{:02X}: {:d}\n".format(Key[0], Key[1], self.MessageCounts[Key])
+      Result += "Unknown: " + str(self.UnknownCount) + "\n"
+      Result += "Length Errors: " + str(self.LengthErrors) + "\n"
+      return Result
+
+
+
+#/***************************************************************************/
+#/* Reads and decodes the GPS UART on its own thread. After each read the   */
+#/* newest fix is published as a new [Receive Time, GpsFix] list replacing  */
+#/* the last in a single assignment, so GetLatest() and GetFix() return a   */
+#/* complete fix in constant time without a lock. The published fix is a    */
+#/* copy the reader no longer changes. Each navigation solution, once the   */
+#/* next has started, is added to a bounded history with the time its first */
+#/* data was received, and passed to the optional Callback.                 */
+#/***************************************************************************/
+class GpsReader(object):
+   def __init__(self, ThisGPS, Protocol = GPS_PROTOCOL_NMEA, HistorySize = GPS_HISTORY_SIZE, Callback = None):
+      self.ThisGPS = ThisGPS
+      self.Protocol = Protocol
+      if Protocol == GPS_PROTOCOL_UBX:
+         self.Decoder = UbxDecoder()
+      else:
+         self.Decoder = NmeaDecoder()
+      # Optional function called with [Receive Time, GpsFix] of each solution completed.
+      self.Callback = Callback
+      # Newest fix published, [Receive Time, GpsFix].
+      self.Latest = None
+      # Completed solutions, [Receive Time, GpsFix], oldest first.
+      self.History = collections.deque(maxlen = HistorySize)
+      # Most recent satellites in view, GSV is output less often than the fix.
+      self.Satellites = []
+      # Fix being decoded and the time its first data was received.
+      self.Current = None
+      self.CurrentTime = None
+      self.Thread = None
+      self.Running = False
+      self.FixCount = 0
+      self.ErrorCount = 0
+
+
+   #/***********************************************/
+   #/* Start reading the GPS UART on a new thread. */
+   #/***********************************************/
+   def Start(self):
+      self.Running = True
+      self.Thread = threading.Thread(target = self.ReaderThread)
+      self.Thread.daemon = True
+      self.Thread.start()
+
+
+   #/*******************************/
+   #/* Stop the GPS reader thread. */
+   #/*******************************/
+   def Stop(self):
+      self.Running = False
+      if self.Thread is not None:
+         self.Thread.join()
+         self.Thread = None
+
+
+   #/***********************************************************/
+   #/* Read until stopped, waiting when no data has arrived. A */
+   #/* UART error is counted and reading continues.            */
+   #/***********************************************************/
+   def ReaderThread(self):
+      while self.Running:
+         try:
+            Decoded = self.Poll()
+         except GPS_READ_ERRORS:
+            self.ErrorCount += 1
+            Decoded = 0
+         if Decoded == 0:
+            time.sleep(GPS_READ_SECONDS)
+
+
+   #/****************************************************************/
+   #/* Read and decode the data waiting on the UART and publish the */
+   #/* newest fix. Returns the number of sentences or messages      */
+   #/* decoded.                                                     */
+   #/****************************************************************/
+   def Poll(self):
+      Decoded = 0
+      if self.Protocol == GPS_PROTOCOL_UBX:
+         Items = ReadUbxMessages(self.ThisGPS)
+      else:
+         Items = ReadSentences(self.ThisGPS)
+      for Item in Items:
+         Fix = self.Decoder.Decode(Item)
+         if Fix is not None:
+            Decoded += 1
+            if Fix is not self.Current:
+               if self.Current is not None:
+                  self.Complete([self.CurrentTime, self.Current])
+               self.Current = Fix
+               self.CurrentTime = time.time()
+            if Fix.Satellites is not None:
+               self.Satellites = Fix.Satellites
+      if Decoded > 0:
+         self.Latest = [self.CurrentTime, self.Current.Copy()]
+      return Decoded
+
+
+   #/***********************************************************/
+   #/* Add a completed solution to the history, and report it. */
+   #/***********************************************************/
+   def Complete(self, Entry):
+      self.FixCount += 1
+      self.History.append(Entry)
+      if self.Callback is not None:
+         self.Callback(Entry)
+
+
+   #/*********************************************************/
+   #/* Return the newest [Receive Time, GpsFix], None before */
+   #/* any data has been decoded.                            */
+   #/*********************************************************/
+   def GetLatest(self):
+      return self.Latest
+
+
+   #/***************************************************/
+   #/* Return the newest GpsFix, None before any data. */
+   #/***************************************************/
+   def GetFix(self):
+      Latest = self.Latest
+      if Latest is None:
+         Result = None
+      else:
+         Result = Latest[1]
+      return Result
+
+
+   #/************************************************************/
+   #/* Return a list of the completed solutions, [Receive Time, */
+   #/* GpsFix], oldest first, received after Since when given.  */
+   #/************************************************************/
+   def GetHistory(self, Since = None):
+      History = list(self.History)
+      if Since is not None:
+         History = [Entry for Entry in History if Entry[0] > Since]
+      return History
+
+
+   #/******************************************/
+   #/* Convert the reader statistics to text. */
+   #/******************************************/
+   def DisplayStats(self):
+      Result = "GPS READER:\n"
+      Result += "Fixes: " + str(self.FixCount) + "\n"
+      Result += "History: " + str(len(self.History)) + "\n"
+      Result += "UART Errors: " + str(self.ErrorCount) + "\n"
+      return Result
@@ -0,0 +1,307 @@
+# GpsPacket - Binary GPS Fix Packet Encoding for RF24L01 in Python
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* GpsPacket - Binary GPS Fix Packet Encoding for RF24L01 in Python.        */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Compact binary packet carrying a GPS fix between the transmitting and    */
+#/* receiving Raspberry Pi. All values are fixed point integers, little      */
+#/* endian, packed and unpacked with a single precompiled struct call.       */
+#/*                                                                          */
+#/* Version 1 packet, 19 bytes:                                              */
+#/* Byte  0     - Packet format version.                                     */
+#/* Bytes 1-2   - Sequence number, wraps at 65536.                           */
+#/* Byte  3     - Fix quality, GPS_FIX_*.                                    */
+#/* Bytes 4-7   - UTC time, seconds since 1970-01-01.                        */
+#/* Byte  8     - UTC time, hundredths of a second.                          */
+#/* Bytes 9-12  - Latitude, 1e-7 degrees, positive North.                    */
+#/* Bytes 13-16 - Longitude, 1e-7 degrees, positive East.                    */
+#/* Bytes 17-18 - Speed over ground, cm/s.                                   */
+#/*                                                                          */
+#/* Version 2 track packet, a batch of fixes, up to 32 bytes:                */
+#/* Byte  0     - Packet format version.                                     */
+#/* Bytes 1-2   - Sequence number of the first fix, following fixes count on */
+#/* Byte  3     - Bits 0-3 fix quality, the same for all fixes in the        */
+#/*               packet. Bits 4-7 number of fixes in the packet.            */
+#/* Byte  4     - Session, chosen at random as the transmitter starts, so a  */
+#/*               restart is recognised though the sequence starts again.    */
+#/* Bytes 5-19  - First fix, absolute values as version 1 bytes 4-18.        */
+#/* Then for each following fix, 6 bytes of differences to the previous fix: */
+#/*   Byte  0   - Time difference, hundredths of a second.                   */
+#/*   Bytes 1-2 - Latitude difference, 1e-7 degrees.                         */
+#/*   Bytes 3-4 - Longitude difference, 1e-7 degrees.                        */
+#/*   Byte  5   - Speed difference, units of TRACK_SPEED_STEP cm/s.          */
+#/****************************************************************************/
+
+
+
+import struct
+import random
+import calendar
+
+
+
+# Packet format versions.
+GPS_PACKET_VERSION_FIX = 1
+GPS_PACKET_VERSION_TRACK = 2
+
+# Largest RF24L01 payload.
+MAX_PACKET_SIZE = 32
+
+# Fix quality values.
+GPS_FIX_NONE = 0
+GPS_FIX_GPS = 1
+GPS_FIX_DGPS = 2
+
+# Fixed point scaling.
+DEGREES_SCALE = 10000000
+KNOTS_TO_CMS = 51.4444
+CMS_TO_MPH = 0.0223694
+
+# Largest value of the 16 bit sequence number plus one.
+SEQUENCE_MODULO = 65536
+# Number of track packet sessions.
+SESSION_MODULO = 256
+# Version 2 fix quality and fix count byte, quality in the low bits.
+TRACK_QUALITY_MASK = 0x0F
+TRACK_COUNT_SHIFT = 4
+
+# Unpacked fix packet element positions.
+GPS_PACKET_VERSION = 0
+GPS_PACKET_SEQUENCE = 1
+GPS_PACKET_FIX = 2
+GPS_PACKET_TIME = 3
+GPS_PACKET_TIME_CS = 4
+GPS_PACKET_LAT = 5
+GPS_PACKET_LONG = 6
+GPS_PACKET_SPEED = 7
+
+# Precompiled version 1 fix packet layout.
+GpsFixStruct = struct.Struct("<BHBIBiiH")
+GPS_PACKET_FIX_SIZE = GpsFixStruct.size
+
+# Precompiled version 2 track packet layouts, header with first fix, and deltas.
+GpsTrackStruct = struct.Struct("<BHBBIBiiH")
+GpsDeltaStruct = struct.Struct("<Bhhb")
+GPS_PACKET_TRACK_SIZE = GpsTrackStruct.size
+GPS_PACKET_DELTA_SIZE = GpsDeltaStruct.size
+# Most fixes in one track packet.
+TRACK_MAX_FIXES = 1 + (MAX_PACKET_SIZE - GPS_PACKET_TRACK_SIZE) // GPS_PACKET_DELTA_SIZE
+# Speed difference resolution in cm/s.
+TRACK_SPEED_STEP = 10
+
+# Delta value ranges.
+DELTA_TIME_MAX = 255
+DELTA_POSITION_MIN = -32768
+DELTA_POSITION_MAX = 32767
+DELTA_SPEED_MIN = -128
+DELTA_SPEED_MAX = 127
+
+
+
+#/*****************************************************************/
+#/* Pack a GPS fix of fixed point values into a version 1 packet. */
+#/*****************************************************************/
+def PackFix(Sequence, FixQuality, UtcTime, UtcCentiseconds, Latitude, Longitude, Speed):
+   return GpsFixStruct.pack(GPS_PACKET_VERSION_FIX, Sequence % SEQUENCE_MODULO, FixQuality, UtcTime, UtcCentiseconds, Latitude, Longitude, Speed)
+
+
+
+#/******************************************************************/
+#/* Unpack a version 1 packet, received as bytes or a list of byte */
+#/* values, into a tuple indexed by GPS_PACKET_*. Returns None for */
+#/* a packet of a different version or size.                       */
+#/******************************************************************/
+def UnpackFix(Data):
+   Data = bytearray(Data)
+   if len(Data) != GPS_PACKET_FIX_SIZE or Data[0] != GPS_PACKET_VERSION_FIX:
+      Fix = None
+   else:
+      Fix = GpsFixStruct.unpack_from(Data)
+   return Fix
+
+
+
+#/********************************************************************/
+#/* Unpack a version 1 or version 2 packet into a list of fix tuples */
+#/* indexed by GPS_PACKET_*, one per fix in the packet. Returns an   */
+#/* empty list for an unknown or corrupt packet.                     */
+#/********************************************************************/
+def UnpackPacket(Data):
+   Data = bytearray(Data)
+   Fixes = []
+   if len(Data) == GPS_PACKET_FIX_SIZE and Data[0] == GPS_PACKET_VERSION_FIX:
+      Fixes.append(GpsFixStruct.unpack_from(Data))
+   elif len(Data) >= GPS_PACKET_TRACK_SIZE and Data[0] == GPS_PACKET_VERSION_TRACK:
+      Fix = GpsTrackStruct.unpack_from(Data)
+      FixCount = Fix[2] >> TRACK_COUNT_SHIFT
+      if len(Data) == GPS_PACKET_TRACK_SIZE + (FixCount - 1) * GPS_PACKET_DELTA_SIZE:
+         Sequence = Fix[1]
+         FixQuality = Fix[2] & TRACK_QUALITY_MASK
+         Time = Fix[4] * 100 + Fix[5]
+         Latitude = Fix[6]
+         Longitude = Fix[7]
+         Speed = Fix[8]
+         Fixes.append((GPS_PACKET_VERSION_TRACK, Sequence, FixQuality, Fix[4], Fix[5], Latitude, Longitude, Speed))
+         for Offset in range(GPS_PACKET_TRACK_SIZE, len(Data), GPS_PACKET_DELTA_SIZE):
+            Delta = GpsDeltaStruct.unpack_from(Data, Offset)
+            Sequence = (Sequence + 1) % SEQUENCE_MODULO
+            Time += Delta[0]
+            Latitude += Delta[1]
+            Longitude += Delta[2]
+            Speed += Delta[3] * TRACK_SPEED_STEP
+            Fixes.append((GPS_PACKET_VERSION_TRACK, Sequence, FixQuality, Time // 100, Time % 100, Latitude, Longitude, Speed))
+   return Fixes
+
+
+
+#/******************************************************************/
+#/* Return [First Sequence, Fix Count, Session] of the fixes in a  */
+#/* version 1 or version 2 packet, without unpacking them. Version */
+#/* 1 packets have no session, None. Returns None for an unknown   */
+#/* or corrupt packet.                                             */
+#/******************************************************************/
+def GetSequenceRange(Data):
+   Data = bytearray(Data)
+   Result = None
+   if len(Data) == GPS_PACKET_FIX_SIZE and Data[0] == GPS_PACKET_VERSION_FIX:
+      Result = [GpsFixStruct.unpack_from(Data)[GPS_PACKET_SEQUENCE], 1, None]
+   elif len(Data) >= GPS_PACKET_TRACK_SIZE and Data[0] == GPS_PACKET_VERSION_TRACK:
+      Fix = GpsTrackStruct.unpack_from(Data)
+      FixCount = Fix[2] >> TRACK_COUNT_SHIFT
+      if len(Data) == GPS_PACKET_TRACK_SIZE + (FixCount - 1) * GPS_PACKET_DELTA_SIZE:
+         Result = [Fix[1], FixCount, Fix[3]]
+   return Result
+
+
+
+#/***************************************************************************/
+#/* Batch fixes into version 2 track packets. The first fix of each packet  */
+#/* is absolute, following fixes are differences to the previous fix as the */
+#/* receiver will rebuild it, so rounding of the speed does not accumulate. */
+#/* A new packet is started when a difference does not fit, the fix quality */
+#/* changes or the packet is full.                                          */
+#/***************************************************************************/
+class TrackEncoder(object):
+   def __init__(self, MaxFixes = TRACK_MAX_FIXES, Sequence = 0, Session = None):
+      self.MaxFixes = min(MaxFixes, TRACK_MAX_FIXES)
+      # Sequence number of the next fix.
+      self.Sequence = Sequence % SEQUENCE_MODULO
+      # Distinguishes the fixes of this encoder from those sent before a restart.
+      if Session is None:
+         Session = random.randrange(SESSION_MODULO)
+      self.Session = Session
+      # Packet being built, header values and delta data.
+      self.Header = None
+      self.Deltas = []
+      # Previous fix as rebuilt by the receiver, [Time, Latitude, Longitude, Speed].
+      self.Previous = None
+
+
+   #/******************************************************************/
+   #/* Add a fix of fixed point values, returns a list of the packets */
+   #/* completed, sent when full or when this fix can not be added.   */
+   #/******************************************************************/
+   def Add(self, FixQuality, UtcTime, UtcCentiseconds, Latitude, Longitude, Speed):
+      Packets = []
+      Time = UtcTime * 100 + UtcCentiseconds
+      if self.Header is not None:
+         DeltaTime = Time - self.Previous[0]
+         DeltaLatitude = Latitude - self.Previous[1]
+         DeltaLongitude = Longitude - self.Previous[2]
+         DeltaSpeed = int(round(float(Speed - self.Previous[3]) / TRACK_SPEED_STEP))
+         if FixQuality != self.Header[1] or DeltaTime < 0 or DeltaTime > DELTA_TIME_MAX \
+            or DeltaLatitude < DELTA_POSITION_MIN or DeltaLatitude > DELTA_POSITION_MAX \
+            or DeltaLongitude < DELTA_POSITION_MIN or DeltaLongitude > DELTA_POSITION_MAX:
+            Packets += self.Flush()
+         else:
+            DeltaSpeed = max(DELTA_SPEED_MIN, min(DELTA_SPEED_MAX, DeltaSpeed))
+            self.Deltas.append(GpsDeltaStruct.pack(DeltaTime, DeltaLatitude, DeltaLongitude, DeltaSpeed))
+            self.Previous = [Time, Latitude, Longitude, self.Previous[3] + DeltaSpeed * TRACK_SPEED_STEP]
+      if self.Header is None:
+         self.Header = [self.Sequence, FixQuality, UtcTime, UtcCentiseconds, Latitude, Longitude, Speed]
+         self.Deltas = []
+         self.Previous = [Time, Latitude, Longitude, Speed]
+      self.Sequence = (self.Sequence + 1) % SEQUENCE_MODULO
+      if 1 + len(self.Deltas) >= self.MaxFixes:
+         Packets += self.Flush()
+      return Packets
+
+
+   #/****************************************************/
+   #/* Return a list of the packet being built, if any. */
+   #/****************************************************/
+   def Flush(self):
+      Packets = []
+      if self.Header is not None:
+         Header = self.Header
+         Packet = GpsTrackStruct.pack(GPS_PACKET_VERSION_TRACK, Header[0], Header[1] | ((1 + len(self.Deltas)) << TRACK_COUNT_SHIFT), self.Session, Header[2], Header[3], Header[4], Header[5], Header[6])
+         Packets.append(Packet + b"".join(self.Deltas))
+         self.Header = None
+      return Packets
+
+
+
+#/*******************************************************************/
+#/* Convert an NMEA ddmm.mmmm or dddmm.mmmm value and hemisphere to */
+#/* fixed point 1e-7 degrees.                                       */
+#/*******************************************************************/
+def NmeaToFixedDegrees(Value, Hemisphere):
+   Value = float(Value)
+   Degrees = int(Value / 100)
+   Result = int(round((Degrees + (Value - 100 * Degrees) / 60) * DEGREES_SCALE))
+   if Hemisphere == "S" or Hemisphere == "W":
+      Result = -Result
+   return Result
+
+
+
+#/***************************************************************/
+#/* Convert an NMEA speed in knots to cm/s, limited to 16 bits. */
+#/***************************************************************/
+def KnotsToFixedSpeed(Knots):
+   return min(int(round(float(Knots) * KNOTS_TO_CMS)), 0xFFFF)
+
+
+
+#/**************************************************************/
+#/* Convert NMEA hhmmss.ss time and ddmmyy date to UTC seconds */
+#/* since 1970-01-01 and hundredths of a second.               */
+#/**************************************************************/
+def NmeaToUtcTime(Time, Date):
+   Seconds = float(Time[4:])
+   UtcTime = calendar.timegm((2000 + int(Date[4:6]), int(Date[2:4]), int(Date[0:2]), int(Time[0:2]), int(Time[2:4]), int(Seconds), 0, 0, 0))
+   UtcCentiseconds = int(round((Seconds - int(Seconds)) * 100)) % 100
+   return [UtcTime, UtcCentiseconds]
+
+
+
+#/***************************************************************/
+#/* Convert signed decimal degrees to fixed point 1e-7 degrees. */
+#/***************************************************************/
+def DegreesToFixed(Degrees):
+   return int(round(Degrees * DEGREES_SCALE))
+
+
+
+#/**************************************************************/
+#/* Convert a UTC datetime to UTC seconds since 1970-01-01 and */
+#/* hundredths of a second.                                    */
+#/**************************************************************/
+def DateTimeToUtcTime(DateTime):
+   return [calendar.timegm(DateTime.utctimetuple()), DateTime.microsecond // 10000]
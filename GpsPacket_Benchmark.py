@@ -0,0 +1,158 @@
+#!/usr/bin/python
+
+# GpsPacket_Benchmark - Compare GPS Packet Format Throughput
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* GpsPacket_Benchmark - Compare GPS Packet Format Throughput.              */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Encode a simulated vehicle track with the one fix per packet version 1   */
+#/* format and the batched delta encoded version 2 format. Reports fixes     */
+#/* per packet, bytes per fix, encode and decode rates, and the fixes per    */
+#/* second the RF link can carry from the Enhanced ShockBurst airtime of     */
+#/* each packet and its acknowledge.                                         */
+#/*                                                                          */
+#/* Usage: GpsPacket_Benchmark.py [FIX_RATE_HZ]                              */
+#/****************************************************************************/
+
+
+
+import sys
+import time
+import math
+import GpsPacket
+
+
+
+# Number of fixes in the simulated track.
+TRACK_FIXES = 20000
+# Simulated vehicle speed, cm/s.
+TRACK_SPEED = 1500
+# Simulated start position, 1e-7 degrees.
+TRACK_LATITUDE = 515000000
+TRACK_LONGITUDE = -1200000
+
+# Enhanced ShockBurst packet overhead bits, preamble, 5 byte address, packet control field, 1 byte CRC.
+ESB_OVERHEAD_BITS = 8 + 40 + 9 + 8
+# Radio TX/RX settling time before each packet and acknowledge, seconds.
+ESB_SETTLING_TIME = 0.000130
+# Data rates to report, bits per second.
+DATA_RATES = [250000, 1000000, 2000000]
+
+
+
+#/******************************************************************/
+#/* Generate a track of fixes, a vehicle on a slowly turning path. */
+#/******************************************************************/
+def GenerateTrack(FixRate):
+   Track = []
+   Latitude = float(TRACK_LATITUDE)
+   Longitude = float(TRACK_LONGITUDE)
+   Time = 1560000000 * 100
+   Step = int(100 / FixRate)
+   for Count in range(TRACK_FIXES):
+      Heading = Count * 0.01
+      Speed = TRACK_SPEED + int(200 * math.sin(Count * 0.05))
+      # Roughly 1e-7 degrees per 1.1cm.
+      Distance = Speed / FixRate / 1.1
+      Latitude += Distance * math.cos(Heading)
+      Longitude += Distance * math.sin(Heading) * 1.6
+      Time += Step
+      Track.append([Time // 100, Time % 100, int(Latitude), int(Longitude), Speed])
+   return Track
+
+
+
+#/********************************************************/
+#/* Airtime of one packet with its acknowledge, seconds. */
+#/********************************************************/
+def PacketAirtime(PayloadBytes, DataRate):
+   PacketTime = float(ESB_OVERHEAD_BITS + 8 * PayloadBytes) / DataRate
+   AckTime = float(ESB_OVERHEAD_BITS) / DataRate
+   return 2 * ESB_SETTLING_TIME + PacketTime + AckTime
+
+
+
+#/**************************************************/
+#/* Encode the track one fix per version 1 packet. */
+#/**************************************************/
+def EncodeFix(Track):
+   Packets = []
+   Sequence = 0
+   for Fix in Track:
+      Packets.append(GpsPacket.PackFix(Sequence, GpsPacket.GPS_FIX_GPS, Fix[0], Fix[1], Fix[2], Fix[3], Fix[4]))
+      Sequence += 1
+   return Packets
+
+
+
+#/************************************************/
+#/* Encode the track in version 2 track packets. */
+#/************************************************/
+def EncodeTrack(Track):
+   Packets = []
+   Encoder = GpsPacket.TrackEncoder()
+   for Fix in Track:
+      Packets += Encoder.Add(GpsPacket.GPS_FIX_GPS, Fix[0], Fix[1], Fix[2], Fix[3], Fix[4])
+   Packets += Encoder.Flush()
+   return Packets
+
+
+
+#/***************************************************/
+#/* Time encoding and decoding, and report results. */
+#/***************************************************/
+def Benchmark(Name, Encode, Track):
+   StartTime = time.time()
+   Packets = Encode(Track)
+   EncodeTime = time.time() - StartTime
+
+   StartTime = time.time()
+   FixCount = 0
+   for Packet in Packets:
+      FixCount += len(GpsPacket.UnpackPacket(Packet))
+   DecodeTime = time.time() - StartTime
+
+   TotalBytes = 0
+   for Packet in Packets:
+      TotalBytes += len(Packet)
+   FixesPerPacket = float(FixCount) / len(Packets)
+   AverageSize = float(TotalBytes) / len(Packets)
+
+   print("{:s}:".format(Name))
+   print("   Fixes per packet:     {:.2f}".format(FixesPerPacket))
+   print("   Bytes per fix:        {:.2f}".format(float(TotalBytes) / FixCount))
+   print("   Encode fixes/sec:     {:.0f}".format(FixCount / EncodeTime))
+   print("   Decode fixes/sec:     {:.0f}".format(FixCount / DecodeTime))
+   for DataRate in DATA_RATES:
+      PacketRate = 1.0 / PacketAirtime(AverageSize, DataRate)
+      print("   Link fixes/sec @{:4d}kbps: {:.0f} ({:.0f} packets/sec)".format(DataRate // 1000, PacketRate * FixesPerPacket, PacketRate))
+   return FixesPerPacket
+
+
+
+if len(sys.argv) > 1:
+   FixRate = float(sys.argv[1])
+else:
+   FixRate = 1.0
+
+print("Simulated track: {:d} fixes at {:.1f}Hz\n".format(TRACK_FIXES, FixRate))
+Track = GenerateTrack(FixRate)
+FixResult = Benchmark("Version 1, one fix per packet", EncodeFix, Track)
+TrackResult = Benchmark("Version 2, batched delta encoded fixes", EncodeTrack, Track)
+print("\nFixes per packet gain: {:.2f}x".format(TrackResult / FixResult))
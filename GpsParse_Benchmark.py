@@ -0,0 +1,153 @@
+#!/usr/bin/python
+
+# GpsParse_Benchmark - Compare NMEA and UBX GPS Parsing Throughput
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* GpsParse_Benchmark - Compare NMEA and UBX GPS Parsing Throughput.        */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Frames and decodes a recorded NEO-6 byte stream of NMEA sentences and    */
+#/* one of UBX navigation messages, fed in UART sized reads, and reports     */
+#/* the bytes per navigation solution, solutions decoded per second and the  */
+#/* UART load at 9600 baud. Without recordings, streams of the default NMEA  */
+#/* sentences and of the UBX messages are generated for the same solutions.  */
+#/* A recording can be made with: cat /dev/ttyS0 > FILE                      */
+#/*                                                                          */
+#/* Usage: GpsParse_Benchmark.py [NMEA_FILE UBX_FILE]                        */
+#/****************************************************************************/
+
+
+
+import sys
+import time
+import struct
+import GPS_NEO_6
+
+
+
+# Navigation solutions generated when no recordings are given.
+SOLUTION_COUNT = 2000
+# Bytes passed to the framer in each read, as the UART returns them.
+READ_SIZE = 64
+# UART bytes per second at 9600 baud, 10 bits per byte.
+UART_BYTES_PER_SECOND = 960
+
+
+
+#/***************************************************************/
+#/* Return an NMEA sentence with its checksum and line end, for */
+#/* the fields between '$' and '*'.                             */
+#/***************************************************************/
+def NmeaSentence(Body):
+   Checksum = 0
+   for Char in bytearray(Body.encode("ascii")):
+      Checksum ^= Char
+   return "${:s}*{:02X}\r\n".format(Body, Checksum).encode("ascii")
+
+
+
+#/*********************************************************************/
+#/* Generate the NMEA and UBX streams for a track of Count solutions. */
+#/*********************************************************************/
+def GenerateStreams(Count):
+   NmeaData = []
+   UbxData = []
+   for Solution in range(Count):
+      Seconds = 30000 + Solution
+      Time = "{:02d}{:02d}{:02d}.00".format(Seconds // 3600, (Seconds // 60) % 60, Seconds % 60)
+      Latitude = 51.5 + Solution * 1e-5
+      Longitude = -0.12 - Solution * 1e-5
+      Nmea = "{:02d}{:08.5f},N,{:03d}{:08.5f},W".format(int(Latitude), (Latitude % 1) * 60, int(-Longitude), (-Longitude % 1) * 60)
+      NmeaData.append(NmeaSentence("GPRMC,{:s},A,{:s},0.512,77.52,091219,,,A".format(Time, Nmea)))
+      NmeaData.append(NmeaSentence("GPVTG,77.52,T,,M,0.512,N,0.948,K,A"))
+      NmeaData.append(NmeaSentence("GPGGA,{:s},{:s},1,08,1.01,45.6,M,47.0,M,,".format(Time, Nmea)))
+      NmeaData.append(NmeaSentence("GPGSA,A,3,23,29,07,08,09,18,26,28,,,,,1.94,1.18,1.54"))
+      NmeaData.append(NmeaSentence("GPGSV,3,1,10,23,38,230,44,29,71,156,47,07,29,116,41,08,09,081,36"))
+      NmeaData.append(NmeaSentence("GPGSV,3,2,10,09,40,283,42,18,51,059,45,26,32,192,39,28,17,310,37"))
+      NmeaData.append(NmeaSentence("GPGSV,3,3,10,10,05,021,,31,02,145,"))
+      NmeaData.append(NmeaSentence("GPGLL,{:s},{:s},A,A".format(Nmea, Time)))
+
+      Itow = 345600000 + Seconds * 1000
+      UbxData.append(GPS_NEO_6.UbxMessage(GPS_NEO_6.UBX_NAV_POSLLH, struct.pack("<IiiiiII", Itow, int(Longitude * 1e7), int(Latitude * 1e7), 92600, 45600, 2500, 3800)))
+      UbxData.append(GPS_NEO_6.UbxMessage(GPS_NEO_6.UBX_NAV_VELNED, struct.pack("<IiiiIIiII", Itow, 6, 26, -1, 27, 26, 7752000, 40, 500000)))
+      UbxData.append(GPS_NEO_6.UbxMessage(GPS_NEO_6.UBX_NAV_SOL, struct.pack("<IihBBiiiIiiiIHBBI", Itow, 0, 2084, 3, 0x0D, 0, 0, 0, 350, 0, 0, 0, 40, 194, 0, 8, 0)))
+      UbxData.append(GPS_NEO_6.UbxMessage(GPS_NEO_6.UBX_NAV_TIMEUTC, struct.pack("<IIiHBBBBBB", Itow, 20, 0, 2019, 12, 9, Seconds // 3600, (Seconds // 60) % 60, Seconds % 60, 0x07)))
+   return [b"".join(NmeaData), b"".join(UbxData)]
+
+
+
+#/*****************************************************************/
+#/* Frame and decode an NMEA stream, returns the valid fix count. */
+#/*****************************************************************/
+def ParseNmea(Data):
+   Framer = GPS_NEO_6.NmeaFramer()
+   Decoder = GPS_NEO_6.NmeaDecoder()
+   Fixes = set()
+   for Start in range(0, len(Data), READ_SIZE):
+      Framer.Feed(Data[Start:Start + READ_SIZE])
+      for Sentence in Framer.Sentences():
+         Fix = Decoder.Decode(Sentence)
+         if Fix is not None and Fix.Valid:
+            Fixes.add(Fix.DateTime)
+   return [len(Fixes), Framer.ChecksumErrors]
+
+
+
+#/***************************************************************/
+#/* Frame and decode a UBX stream, returns the valid fix count. */
+#/***************************************************************/
+def ParseUbx(Data):
+   Framer = GPS_NEO_6.UbxFramer()
+   Decoder = GPS_NEO_6.UbxDecoder()
+   Fixes = set()
+   for Start in range(0, len(Data), READ_SIZE):
+      Framer.Feed(Data[Start:Start + READ_SIZE])
+      for Message in Framer.Messages():
+         Fix = Decoder.Decode(Message)
+         if Fix is not None and Fix.Valid:
+            Fixes.add(Decoder.Itow)
+   return [len(Fixes), Framer.ChecksumErrors]
+
+
+
+#/**************************************************/
+#/* Time one parser over a stream, report results. */
+#/**************************************************/
+def Benchmark(Name, Parser, Data):
+   StartTime = time.time()
+   Result = Parser(Data)
+   Elapsed = time.time() - StartTime
+   Solutions = max(1, Result[0])
+   BytesPerSolution = float(len(Data)) / Solutions
+   print("{:>6s} {:9d} {:9d} {:7.1f} {:9.0f} {:10.1f} {:8.1f}% {:6d}".format(Name, len(Data), Result[0], BytesPerSolution, Result[0] / Elapsed, 1e6 * Elapsed / Solutions, 100 * BytesPerSolution / UART_BYTES_PER_SECOND, Result[1]))
+
+
+
+if len(sys.argv) > 2:
+   with open(sys.argv[1], "rb") as File:
+      NmeaData = File.read()
+   with open(sys.argv[2], "rb") as File:
+      UbxData = File.read()
+   print("Recorded streams, {:d} byte reads.\n".format(READ_SIZE))
+else:
+   NmeaData, UbxData = GenerateStreams(SOLUTION_COUNT)
+   print("{:d} generated solutions, {:d} byte reads.\n".format(SOLUTION_COUNT, READ_SIZE))
+
+print("{:>6s} {:>9s} {:>9s} {:>7s} {:>9s} {:>10s} {:>9s} {:>6s}".format("FORMAT", "BYTES", "FIXES", "B/FIX", "FIXES/SEC", "uS/FIX", "UART@1HZ", "ERRORS"))
+Benchmark("NMEA", ParseNmea, NmeaData)
+Benchmark("UBX", ParseUbx, UbxData)
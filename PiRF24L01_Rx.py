@@ -38,8 +38,15 @@
 import os
 import time
 import datetime
-import RPi.GPIO
+import threading
+import collections
+# RPi.GPIO is only available on a Raspberry Pi, elsewhere GPIO is simulated.
+try:
+   import RPi.GPIO
+except ImportError:
+   import SimGPIO as RPi
 import RPiRF24L01
+import GpsPacket
 
 
 
@@ -49,10 +56,19 @@ GPIO_LED_GREEN = 17
 
 # RF24L01 RF Channel.
 RF_CHANNEL = 100
-# Must receive data packets of exactly this byte size.
-DATA_PACKET_SIZE = 30
-# Conversion from Knots to MPH.
-KNOTS_TO_MPH = 1.15078
+# Hop between channels, the seed must match the transmitter.
+CHANNEL_HOPPING = True
+CHANNEL_HOP_SEED = 0x2401
+# Payload width of each receive pipeline, one transmitter per pipeline.
+RX_PIPE_WIDTHS = [RPiRF24L01.RX_PIPE_DYNAMIC] * RPiRF24L01.RF24L01_PIPE_COUNT
+# Data rate shared by all the transmitters, which adapt only their PA level and retransmits.
+# With None the data rate follows the transmitter on LINK_MASTER_PIPELINE, for a single transmitter.
+LINK_DATA_RATE = RPiRF24L01.RF24L01_RF_SETUP_250KBPS
+LINK_MASTER_PIPELINE = 1
+# Period between checks of the device registers against the configuration.
+CONFIG_CHECK_SECONDS = 60
+# Interupt flags held for the status thread, the oldest are dropped when it falls behind.
+STATUS_QUEUE_SIZE = 64
 
 
 
@@ -60,97 +76,133 @@ KNOTS_TO_MPH = 1.15078
 RF24L01_ErrorFlag = False
 # Remember the time of the last received data.
 RF24L01_ReceiveTime = datetime.datetime.now()
+# Holds the data rate shared by the transmitters, or follows the changes requested by the master.
+RF24L01_Link = RPiRF24L01.LinkController(DataRate = LINK_DATA_RATE, MasterPipeline = LINK_MASTER_PIPELINE)
+# Queues the data packets of each transmitter separately, link control payloads are not queued.
+RF24L01_Receiver = RPiRF24L01.PipeReceiver(SequenceRange = GpsPacket.GetSequenceRange, Filter = lambda Pipeline, Data: RF24L01_Link.Received(Data, Pipeline))
+# Interupt flags for the status thread, [Time, IntFlags].
+RF24L01_StatusQueue = collections.deque(maxlen = STATUS_QUEUE_SIZE)
+RF24L01_StatusEvent = threading.Event()
+# Time the acknowledge payload waiting for each pipeline was written, None when it has been sent.
+RF24L01_AckWriteTimes = [None] * RPiRF24L01.RF24L01_PIPE_COUNT
+RF24L01_AckLock = threading.Lock()
 
 
 
-#/*****************************/
-#/* RF24L01 interupt routine. */
-#/*****************************/
+#/****************************************************************/
+#/* RF24L01 interupt routine. Only drains the RX FIFO, link      */
+#/* control, logging and display are done on the worker threads. */
+#/****************************************************************/
 def RF24L01_Interupt_Callback(GpioPin):
+   IntFlags = RPiRF24L01.GetIntFlags()
+   if IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
+      # Retreive all RX data waiting into the incoming queue, the device stays in receive mode.
+      RF24L01_Receiver.Service()
+   RF24L01_StatusQueue.append([time.time(), IntFlags])
+   RF24L01_StatusEvent.set()
+
+
+
+#/******************************************************************/
+#/* Display the RF24L01 status and LEDs for each interupt, on its  */
+#/* own thread so the interupt routine never waits on the console. */
+#/******************************************************************/
+def RF24L01_Status_Thread():
    global RF24L01_ErrorFlag
    global RF24L01_ReceiveTime
 
-   print("\n!RF24L01 INTERUPT!")
-   IntFlags = RPiRF24L01.GetIntFlags()
-   # Display current RF24L01 status.
-   if IntFlags & RPiRF24L01.RF24L01_STATUS_MAX_RT:
-      print("RF24L01_STATUS_MAX_RT")
-      RF24L01_ErrorFlag = True
-      # Clear data failed to send.
-      RPiRF24L01.FlushTxBuffer()
-      # Flash display LEDs on RPiRF24L01 error.
-      if RPi.GPIO.input(GPIO_LED_GREEN) == 0:
-         RPi.GPIO.output(GPIO_LED_GREEN, 1)
-         RPi.GPIO.output(GPIO_LED_RED, 0)
-      else:
-         RPi.GPIO.output(GPIO_LED_GREEN, 0)
-         RPi.GPIO.output(GPIO_LED_RED, 1)
-   if IntFlags & RPiRF24L01.RF24L01_STATUS_TX_DS:
-      print("RF24L01_STATUS_TX_DS")
-      RF24L01_ErrorFlag = False
-      # Display Green LED.
-      RPi.GPIO.output(GPIO_LED_RED, 0)
-      RPi.GPIO.output(GPIO_LED_GREEN, 1)
-   if IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
-      print("RF24L01_STATUS_RX_DR")
-      RF24L01_ErrorFlag = False
-      RF24L01_ReceiveTime = datetime.datetime.now()
-      # Display Green LED.
-      RPi.GPIO.output(GPIO_LED_RED, 0)
-      RPi.GPIO.output(GPIO_LED_GREEN, 1)
-      # Retreive the RX data.
-      Response = RPiRF24L01.GetData()
-      LogEntry = "".join(chr(Char) for Char in Response) + "\n"
-      WriteLogLine(LogEntry)
-      # Configure the RF24L01 device for receiving and power on.
-      RPiRF24L01.ConfigureRx(RF_CHANNEL, 1, DATA_PACKET_SIZE)
-   print("\n")
-
-
-
-#/*********************************/
-#/* Write a line to the log file. */
-#/*********************************/
-def WriteLogLine(LogLine):
-   ValidData = True
-   # Convert data recevied to Google Maps compatible format.
-   ThisDataValue = float(LogLine[:7]) * KNOTS_TO_MPH
-   LogData = "{:3.2f}MPH,".format(ThisDataValue)
-   if LogLine[7:8] == "S":
-      LogData += "-"
-   elif LogLine[7:8] != "N":
-      ValidData = False
-   if LogLine[8:10].strip() == "":
-      ValidData = False
-   else:
-      LogData += LogLine[8:10]
-   if LogLine[10:18].strip() == "":
-      ValidData = False
-   else:
-      ThisDataValue = float(LogLine[10:18]) / 60
-      LogData += "{:5.5f},".format(ThisDataValue).lstrip('0')
-   if LogLine[18:19] == "W":
-      LogData += "-"
-   elif LogLine[18:19] != "E":
-      ValidData = False
-   if LogLine[19:22].strip() == "":
-      ValidData = False
-   else:
-      LogData += LogLine[19:22]
-   if LogLine[22:30].strip() == "":
-      ValidData = False
-   else:
-      ThisDataValue = float(LogLine[22:30]) / 60
-      LogData += "{:5.5f}\n".format(ThisDataValue).lstrip('0')
-   # Open a daily log file.
-   if ValidData == True:
+   while True:
+      RF24L01_StatusEvent.wait()
+      RF24L01_StatusEvent.clear()
+      while len(RF24L01_StatusQueue) > 0:
+         InteruptTime, IntFlags = RF24L01_StatusQueue.popleft()
+         print("\n!RF24L01 INTERUPT!")
+         # Display current RF24L01 status.
+         if IntFlags & RPiRF24L01.RF24L01_STATUS_MAX_RT:
+            print("RF24L01_STATUS_MAX_RT")
+            RF24L01_ErrorFlag = True
+            # Clear data failed to send.
+            RPiRF24L01.FlushTxBuffer()
+            # Flash display LEDs on RPiRF24L01 error.
+            if RPi.GPIO.input(GPIO_LED_GREEN) == 0:
+               RPi.GPIO.output(GPIO_LED_GREEN, 1)
+               RPi.GPIO.output(GPIO_LED_RED, 0)
+            else:
+               RPi.GPIO.output(GPIO_LED_GREEN, 0)
+               RPi.GPIO.output(GPIO_LED_RED, 1)
+         if IntFlags & RPiRF24L01.RF24L01_STATUS_TX_DS:
+            print("RF24L01_STATUS_TX_DS")
+            RF24L01_ErrorFlag = False
+            # Display Green LED.
+            RPi.GPIO.output(GPIO_LED_RED, 0)
+            RPi.GPIO.output(GPIO_LED_GREEN, 1)
+         if IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
+            print("RF24L01_STATUS_RX_DR")
+            RF24L01_ErrorFlag = False
+            RF24L01_ReceiveTime = datetime.datetime.fromtimestamp(InteruptTime)
+            # Display Green LED.
+            RPi.GPIO.output(GPIO_LED_RED, 0)
+            RPi.GPIO.output(GPIO_LED_GREEN, 1)
+         print("\n")
+
+
+
+#/************************************************************/
+#/* Log the data packets of one transmitter, called from the */
+#/* worker thread of its pipeline.                           */
+#/************************************************************/
+def RF24L01_Pipe_Handler(Pipeline, ReceiveTime, Data):
+   # Return the receive count to the transmitter with its next acknowledge, once the backlog is handled.
+   if len(RF24L01_Receiver.Queues[Pipeline]) == 0:
+      RF24L01_Write_Ack(Pipeline, ReceiveTime, "RX {:d}".format(RF24L01_Receiver.ReceivedCount[Pipeline]))
+   # A packet may carry a batch of fixes, log each.
+   for Fix in GpsPacket.UnpackPacket(Data):
+      WriteLogLine(Pipeline, Fix)
+
+
+
+#/********************************************************************/
+#/* Write an acknowledge payload for a pipeline. The six pipelines   */
+#/* share the 3 deep TX FIFO, and a payload only leaves it with the  */
+#/* acknowledge of the next packet on its pipeline. So each pipeline */
+#/* has one payload waiting at most, the next is written once a      */
+#/* packet received after it shows it was sent. When payloads for    */
+#/* transmitters which have gone quiet fill the FIFO, all are        */
+#/* flushed.                                                         */
+#/********************************************************************/
+def RF24L01_Write_Ack(Pipeline, ReceiveTime, Data):
+   with RF24L01_AckLock:
+      WriteTime = RF24L01_AckWriteTimes[Pipeline]
+      if WriteTime is None or ReceiveTime > WriteTime:
+         # Read STATUS from the device, the last command may have been on another thread.
+         if RPiRF24L01.GetStatus(True) & RPiRF24L01.RF24L01_STATUS_TX_FULL:
+            RPiRF24L01.FlushTxBuffer()
+            for Count in range(RPiRF24L01.RF24L01_PIPE_COUNT):
+               RF24L01_AckWriteTimes[Count] = None
+         RPiRF24L01.WriteAckPayload(Pipeline, Data)
+         RF24L01_AckWriteTimes[Pipeline] = time.time()
+
+
+
+#/**************************************************************/
+#/* Write a line to the log file from an unpacked data packet. */
+#/* Each pipeline, one per transmitter, has its own log file.  */
+#/**************************************************************/
+def WriteLogLine(Pipeline, Fix):
+   # Only log packets with a valid GPS fix.
+   if Fix[GpsPacket.GPS_PACKET_FIX] != GpsPacket.GPS_FIX_NONE:
+      # Convert data recevied to Google Maps compatible format.
+      LogData = "{:3.2f}MPH,".format(Fix[GpsPacket.GPS_PACKET_SPEED] * GpsPacket.CMS_TO_MPH)
+      LogData += "{:.5f},".format(float(Fix[GpsPacket.GPS_PACKET_LAT]) / GpsPacket.DEGREES_SCALE)
+      LogData += "{:.5f}\n".format(float(Fix[GpsPacket.GPS_PACKET_LONG]) / GpsPacket.DEGREES_SCALE)
+      # Open a daily log file.
       Now = datetime.datetime.now()
-      Filename = "LOG/{:s}_RF24L01_NEO6.csv".format(Now.strftime("%Y-%m-%d"))
+      Filename = "LOG/{:s}_RF24L01_NEO6_P{:d}.csv".format(Now.strftime("%Y-%m-%d"), Pipeline)
       if os.path.exists(Filename):
          WriteHeader = False
       else:
          WriteHeader = True
-      LogFile = open(Filename, 'a', 0)
+      LogFile = open(Filename, 'a')
       if WriteHeader == True:
          LogFile.write("Label,Latitude,Longitude\n")
       LogFile.write(LogData)
@@ -172,16 +224,33 @@ RPi.GPIO.add_event_detect(RPiRF24L01.GPIO_RF24L01_INT, RPi.GPIO.FALLING, callbac
 
 # Configure the RF24L01 device.
 RPiRF24L01.Configure()
-# Configure the RF24L01 device for receiving and power on.
-RPiRF24L01.ConfigureRx(RF_CHANNEL, 1, DATA_PACKET_SIZE)
+# Receive variable length packets, and return data to the transmitter in acknowledge packets.
+RPiRF24L01.EnableDynamicPayloads(AckPayload = True)
+# Configure the RF24L01 device for receiving on all pipelines and power on.
+RPiRF24L01.ConfigureRxPipes(RF_CHANNEL, RX_PIPE_WIDTHS)
+# Start on the most robust link settings, the transmitter starts on the same.
+RF24L01_Link.Apply(RF24L01_Link.Level)
+# Read the configuration back from the device, for display and to check for drift.
+ConfigSnapshot = RPiRF24L01.RegisterSnapshot(UseCache = False)
+ConfigCheckTime = time.time()
 # Display configured addresses.
-Response = RPiRF24L01.DisplayAddresses()
+Response = RPiRF24L01.DisplayAddresses(ConfigSnapshot)
 print(Response)
 # Display configured RF channel.
-Response = RPiRF24L01.DisplayRfChannel()
+Response = RPiRF24L01.DisplayRfChannel(ConfigSnapshot)
 print(Response)
 # Clear the TX and RX buffers of the RF24L01 and reset interupt status.
 RPiRF24L01.Reset()
+# Log the data from each transmitter in its own thread.
+RF24L01_Receiver.StartWorkers(dict((Pipeline, RF24L01_Pipe_Handler) for Pipeline in range(RPiRF24L01.RF24L01_PIPE_COUNT)))
+# Display interupt status in its own thread.
+RF24L01_StatusThread = threading.Thread(target = RF24L01_Status_Thread)
+RF24L01_StatusThread.daemon = True
+RF24L01_StatusThread.start()
+# Hop channels on the receiver clock, the transmitter follows.
+if CHANNEL_HOPPING:
+   RF24L01_Hopper = RPiRF24L01.ChannelHopper(CHANNEL_HOP_SEED)
+   RF24L01_Hopper.StartReceiver()
 
 # Switch LED to Red as default.
 RPi.GPIO.output(GPIO_LED_RED, 1)
@@ -192,6 +261,21 @@ while True:
    if RF24L01_ReceiveTime + datetime.timedelta(seconds = 10) < datetime.datetime.now():
       RPi.GPIO.output(GPIO_LED_RED, 1)
       RPi.GPIO.output(GPIO_LED_GREEN, 0)
+   # Return to the most robust link settings if the master transmitter has been lost.
+   RF24L01_Link.CheckFallback()
+
+   # Periodically report any device registers which no longer match the configuration.
+   if ConfigCheckTime + CONFIG_CHECK_SECONDS < time.time():
+      ConfigCheckTime = time.time()
+      Snapshot = RPiRF24L01.RegisterSnapshot(UseCache = False)
+      # Link adaptation changes the link settings, and hopping the RF channel.
+      Ignore = RPiRF24L01.RegisterSnapshot.LINK_FIELDS
+      if CHANNEL_HOPPING:
+         Ignore = Ignore + ["RF_CH"]
+      Response = Snapshot.DisplayDiff(ConfigSnapshot, Ignore = Ignore)
+      if Response != "":
+         print("{:s} RF24L01 CONFIGURATION DRIFT:\n{:s}".format(str(datetime.datetime.now()), Response))
+      print(RF24L01_Receiver.DisplayStats())
 
    # Display current RF24L01 status.
    # Response = RPiRF24L01.DisplayStatus()
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+
+# PiRF24L01_Sweep - Survey RF24L01 Channel Occupancy
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* PiRF24L01_Sweep - Survey RF24L01 Channel Occupancy.                      */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Repeatedly sweep all 126 RF channels with the carrier detect register,   */
+#/* to choose a clean channel for range tests. Each sweep is printed as one  */
+#/* character per channel, and the occupancy of every channel is logged as   */
+#/* comma separated counts for plotting.                                     */
+#/*                                                                          */
+#/* Usage: PiRF24L01_Sweep.py [SWEEP_COUNT]                                  */
+#/****************************************************************************/
+
+
+
+import sys
+import time
+import datetime
+import RPi.GPIO
+import RPiRF24L01
+
+
+
+# Number of sweeps when not specified, 0 to sweep until interrupted.
+SWEEP_COUNT = 0
+# Time between sweeps.
+SWEEP_PERIOD = 2.0
+
+
+
+#/*******************************************************/
+#/* Append a sweep to the log file, for later plotting. */
+#/*******************************************************/
+def WriteLogLine(Now, Occupancy):
+   LogFile = open("LOG/" + Now.strftime("%Y-%m-%d") + "_RF24L01_SWEEP.csv", 'a')
+   LogFile.write(Now.strftime("%H:%M:%S") + "," + ",".join(str(Count) for Count in Occupancy) + "\n")
+   LogFile.close()
+
+
+
+if len(sys.argv) > 1:
+   SweepCount = int(sys.argv[1])
+else:
+   SweepCount = SWEEP_COUNT
+
+#  /*******************************************/
+# /* Configure Raspberry Pi GPIO interfaces. */
+#/*******************************************/
+RPi.GPIO.setwarnings(False)
+RPi.GPIO.setmode(RPi.GPIO.BCM)
+
+# Initialise the RF24L01 device.
+RPiRF24L01.Init()
+RPiRF24L01.Configure()
+RPiRF24L01.Reset()
+
+Totals = [0] * RPiRF24L01.RF24L01_CHANNEL_COUNT
+Sweeps = 0
+print("CHANNEL  " + "".join(str(Channel // 10 % 10) if Channel % 10 == 0 else " " for Channel in range(RPiRF24L01.RF24L01_CHANNEL_COUNT)))
+while SweepCount == 0 or Sweeps < SweepCount:
+   StartTime = time.time()
+   Occupancy = RPiRF24L01.SpectrumSweep()
+   SweepTime = time.time() - StartTime
+   Sweeps += 1
+   for Channel in range(len(Occupancy)):
+      Totals[Channel] += Occupancy[Channel]
+
+   Now = datetime.datetime.now()
+   WriteLogLine(Now, Occupancy)
+   print(Now.strftime("%H:%M:%S") + " " + RPiRF24L01.DisplaySweep(Occupancy) + " {:.2f}s QUIETEST: {:d}".format(SweepTime, RPiRF24L01.QuietestChannel(Totals)))
+   time.sleep(max(0.0, SWEEP_PERIOD - SweepTime))
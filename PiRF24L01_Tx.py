@@ -37,9 +37,14 @@
 
 import time
 import datetime
-import RPi.GPIO
+# RPi.GPIO is only available on a Raspberry Pi, elsewhere GPIO is simulated.
+try:
+   import RPi.GPIO
+except ImportError:
+   import SimGPIO as RPi
 import RPiRF24L01
 import GPS_NEO_6
+import GpsPacket
 
 
 
@@ -49,13 +54,28 @@ GPIO_LED_GREEN = 17
 
 # RF24L01 RF Channel.
 RF_CHANNEL = 100
-# Must receive data packets of exactly this byte size.
-DATA_PACKET_SIZE = 30
+# RF24L01 pipeline, each transmitter sending to one receiver uses its own, 0 - 5.
+TX_PIPELINE = 1
+# Hop between channels, the seed must match the receiver.
+CHANNEL_HOPPING = True
+CHANNEL_HOP_SEED = 0x2401
+# Static data packet size, packets are sent with dynamic payload length.
+DATA_PACKET_SIZE = GpsPacket.MAX_PACKET_SIZE
+# Data rate, must match the receiver. With None the data rate is also adapted,
+# only when this is the one transmitter, on the receiver's LINK_MASTER_PIPELINE.
+LINK_DATA_RATE = RPiRF24L01.RF24L01_RF_SETUP_250KBPS
+# GPS UART baud rate and navigation solutions per second.
+GPS_BAUD_RATE = 115200
+GPS_RATE_HZ = 5
 
 
 
 # Track when RF24L01 is experiancing errors.
 RF24L01_ErrorFlag = False
+# Batches GPS fixes into data packets.
+RF24L01_TrackEncoder = GpsPacket.TrackEncoder()
+# Reads and decodes the GPS module on its own thread, started once the GPS is configured.
+GpsReader = None
 
 
 
@@ -72,8 +92,6 @@ def RF24L01_Interupt_Callback(GpioPin):
    if IntFlags & RPiRF24L01.RF24L01_STATUS_MAX_RT:
       print("RF24L01_STATUS_MAX_RT")
       RF24L01_ErrorFlag = True
-      # Clear data failed to send.
-      RPiRF24L01.FlushTxBuffer()
       # Flash display LEDs on RPiRF24L01 error.
       if RPi.GPIO.input(GPIO_LED_GREEN) == 0:
          RPi.GPIO.output(GPIO_LED_GREEN, 1)
@@ -87,6 +105,8 @@ def RF24L01_Interupt_Callback(GpioPin):
       # Display Green LED.
       RPi.GPIO.output(GPIO_LED_RED, 0)
       RPi.GPIO.output(GPIO_LED_GREEN, 1)
+   # Retire sent or failed packets and reload the TX FIFO.
+   RF24L01_Transmitter.Service(IntFlags)
    if IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
       print("RF24L01_STATUS_RX_DR")
       RF24L01_ErrorFlag = False
@@ -94,16 +114,36 @@ def RF24L01_Interupt_Callback(GpioPin):
       # Display Green LED.
       RPi.GPIO.output(GPIO_LED_RED, 0)
       RPi.GPIO.output(GPIO_LED_GREEN, 1)
-      # Retreive the RX data.
-      Response = RPiRF24L01.GetData()
-      LogEntry = "".join(chr(Char) for Char in Response) + "\n"
-      WriteLogLine(LogEntry)
-      # Configure the RF24L01 device for receiving and power on.
-      RPiRF24L01.ConfigureRx(RF_CHANNEL, 1, DATA_PACKET_SIZE)
    print("\n")
 
 
 
+#/************************************************************/
+#/* Display link information returned by the receiver in the */
+#/* automatic acknowledge packets.                           */
+#/************************************************************/
+def RF24L01_Ack_Callback(Data):
+   print("RECEIVER: " + "".join(chr(Char) for Char in Data))
+
+
+
+#/***************************************************************/
+#/* Add a GPS_NEO_6.GpsFix to the current batch, returns a list */
+#/* of the data packets completed.                              */
+#/***************************************************************/
+def AddTrackFix(GpsFix):
+   UtcTime = GpsPacket.DateTimeToUtcTime(GpsFix.DateTime)
+   Latitude = GpsPacket.DegreesToFixed(GpsFix.Latitude)
+   Longitude = GpsPacket.DegreesToFixed(GpsFix.Longitude)
+   Speed = GpsPacket.KnotsToFixedSpeed(GpsFix.Speed or 0)
+   if GpsFix.Quality == 2:
+      FixQuality = GpsPacket.GPS_FIX_DGPS
+   else:
+      FixQuality = GpsPacket.GPS_FIX_GPS
+   return RF24L01_TrackEncoder.Add(FixQuality, UtcTime[0], UtcTime[1], Latitude, Longitude, Speed)
+
+
+
 #/*********************************/
 #/* Write a line to the log file. */
 #/*********************************/
@@ -123,63 +163,86 @@ RPi.GPIO.setup(GPIO_LED_GREEN, RPi.GPIO.OUT, initial=0)
 
 # Initialise the RF24L01 device.
 RPiRF24L01.Init()
+# Channel hopping schedule, shared with the receiver.
+if CHANNEL_HOPPING:
+   RF24L01_Hopper = RPiRF24L01.ChannelHopper(CHANNEL_HOP_SEED)
+else:
+   RF24L01_Hopper = None
+# Adapts the PA level and auto retransmit, and any data rate not pinned, to the link quality.
+RF24L01_Link = RPiRF24L01.LinkController(DataRate = LINK_DATA_RATE)
+# Queued transmitter keeping the RF24L01 TX FIFO loaded.
+RF24L01_Transmitter = RPiRF24L01.Transmitter(RF_CHANNEL, TX_PIPELINE, AckCallback = RF24L01_Ack_Callback, Hopper = RF24L01_Hopper, Controller = RF24L01_Link)
 RPi.GPIO.add_event_detect(RPiRF24L01.GPIO_RF24L01_INT, RPi.GPIO.FALLING, callback=RF24L01_Interupt_Callback)
 
 # Configure the RF24L01 device.
 RPiRF24L01.Configure()
+# Send variable length packets, and accept data from the receiver in acknowledge packets.
+RPiRF24L01.EnableDynamicPayloads(AckPayload = True)
 # Configure the RF24L01 device for transmitting and power on.
 RPiRF24L01.ConfigureTx(RF_CHANNEL)
-# Display configured addresses.
-Response = RPiRF24L01.DisplayAddresses()
+# Display configured addresses and RF channel, from a single read of the registers.
+ConfigSnapshot = RPiRF24L01.RegisterSnapshot()
+Response = RPiRF24L01.DisplayAddresses(ConfigSnapshot)
 print(Response)
-# Display configured RF channel.
-Response = RPiRF24L01.DisplayRfChannel()
+Response = RPiRF24L01.DisplayRfChannel(ConfigSnapshot)
 print(Response)
 # Clear the TX and RX buffers of the RF24L01 and reset interupt status.
 RPiRF24L01.Reset()
+# Hold CE high, packets are sent as soon as they are queued.
+RF24L01_Transmitter.Start()
 
 # Open GPS UART connection.
 ThisGPS = GPS_NEO_6.OpenGPS("/dev/ttyS0")
+# Raise the baud rate and navigation rate, and output only the NMEA sentences used.
+if not GPS_NEO_6.ConfigureGps(ThisGPS, GPS_BAUD_RATE, GPS_RATE_HZ):
+   print("GPS CONFIGURATION NOT ACKNOWLEDGED")
+# Decode the NMEA sentences as they arrive, each solution is kept for the next send.
+GpsReader = GPS_NEO_6.GpsReader(ThisGPS)
+GpsReader.Start()
 
 # Switch LED to Red as default.
 RPi.GPIO.output(GPIO_LED_RED, 1)
 RPi.GPIO.output(GPIO_LED_GREEN, 0)
-ValidGpsStruct = []
+LastFixTime = None
+LinkLevel = None
 while True:
-   time.sleep(1)
-   # Send GPS position every five seconds.
-   if len(ValidGpsStruct) == 0 or RF24L01_ErrorFlag == False:
-      ValidGpsStruct = []
-      for Count in range(4):
-         # Read the GPS position every second.
-         time.sleep(1)
-
-         GpsData = GPS_NEO_6.GetGpsData(ThisGPS)
-         GpsStruct = GPS_NEO_6.GetGpsDecode(GpsData)
-         if GpsStruct[0] != 0:
-            ValidGpsStruct = GpsStruct
+   # Send GPS positions every five seconds.
+   for Count in range(5):
+      time.sleep(1)
+      # Send any packets held back during a blacklisted hop.
+      RF24L01_Transmitter.Poll()
+
+   # Solutions completed by the GPS reader since the last send.
+   ValidGpsFix = None
+   DataPackets = []
+   for ReceiveTime, GpsFix in GpsReader.GetHistory(LastFixTime):
+      LastFixTime = ReceiveTime
+      if GpsFix.Valid and GpsFix.DateTime is not None and GpsFix.Latitude is not None:
+         # Batch every valid fix, several fixes are sent in each data packet.
+         DataPackets += AddTrackFix(GpsFix)
+         ValidGpsFix = GpsFix
+   DataPackets += RF24L01_TrackEncoder.Flush()
 
    # Display current RF24L01 status.
    # Response = RPiRF24L01.DisplayStatus()
    # print(Response)
 
-   if len(ValidGpsStruct) == 0:
+   if ValidGpsFix is None:
       # Display satellite information if no valid GPS data is available.
       RPi.GPIO.output(GPIO_LED_RED, 1)
       RPi.GPIO.output(GPIO_LED_GREEN, 0)
-      SatelliteData = GPS_NEO_6.GetSatelliteData(GpsData)
+      SatelliteData = GpsReader.Satellites
       Response = GPS_NEO_6.DisplaySatelliteData(SatelliteData)
       print(Response)
    else:
       # If valid GPS data is available, transmit to receiver.
       if RF24L01_ErrorFlag == False:
          RPi.GPIO.output(GPIO_LED_GREEN, 1)
-      # DataPacket = "{:6.6s},".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_TIME])
-      # DataPacket += "{:6.6s},".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_DATE])
-      DataPacket = "{:>7s}".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_SPEED])
-      DataPacket += "{:1.1s}".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_N_S])
-      DataPacket += "{:>10s}".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_LAT])
-      DataPacket += "{:1.1s}".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_E_W])
-      DataPacket += "{:>11s}".format(ValidGpsStruct[GPS_NEO_6.GPS_STRUCT_LONG])
-      RPiRF24L01.SendData(RF_CHANNEL, 1, DataPacket)
+      # Each batch is queued once, the transmitter retries packets which fail.
+      RF24L01_Transmitter.SendMany(DataPackets)
+
+   # Display the link settings when link adaptation changes them.
+   if RF24L01_Link.Level != LinkLevel:
+      LinkLevel = RF24L01_Link.Level
+      print(RF24L01_Link.DisplaySettings())
 
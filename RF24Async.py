@@ -0,0 +1,226 @@
+# RF24Async - asyncio Interface to the RF24L01 for Raspberry Pi in Python
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* RF24Async - asyncio Interface to the RF24L01 for Raspberry Pi in Python. */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Front end to an RPiRF24L01.Transmitter or PipeReceiver for asyncio       */
+#/* applications, so GPS reading, logging and radio I/O can run as tasks in  */
+#/* one event loop. Requires Python 3.6 or later.                            */
+#/*                                                                          */
+#/*    Sent = await Radio.Send(Data)                                         */
+#/*    async for Pipeline, ReceiveTime, Data in Radio.Receive():             */
+#/*                                                                          */
+#/* The IRQ edge callback runs on the RPi.GPIO thread, where the interupt    */
+#/* flags are serviced as the applications do. Only the results are passed   */
+#/* into the event loop, with call_soon_threadsafe, so the loop never waits  */
+#/* on the GPIO thread and no task sleeps waiting for the radio. Payloads    */
+#/* queued by a PipeReceiver dispatch thread wake the loop through the       */
+#/* PipeReceiver callback in the same way.                                   */
+#/****************************************************************************/
+
+
+
+import asyncio
+import RPiSPI
+import RPiRF24L01
+
+
+
+#/**************************************************************************/
+#/* asyncio front end to one RF24L01 device, used as a transmitter or a    */
+#/* receiver. Send() resolves True on TX_DS or False on MAX_RT for its own */
+#/* payload, Receive() yields [Pipeline, Receive Time, Data] for each      */
+#/* payload queued by the PipeReceiver. The Transmitter or PipeReceiver is */
+#/* configured and started by the application as usual, Start() then takes */
+#/* over the IRQ pin of the radio and the Transmitter or PipeReceiver      */
+#/* callback, which Stop() gives back.                                     */
+#/**************************************************************************/
+class AsyncRadio(object):
+   def __init__(self, Transmitter = None, Receiver = None, Radio = None):
+      if Radio is None:
+         if Transmitter is not None:
+            Radio = Transmitter.Radio
+         elif Receiver is not None:
+            Radio = Receiver.Radio
+         else:
+            Radio = RPiRF24L01.DefaultRadio
+      self.Radio = Radio
+      self.Transmitter = Transmitter
+      self.Receiver = Receiver
+      self.Loop = None
+      # Futures of the payloads sent and not yet retired, by id of the payload.
+      self.Waiting = {}
+      # Set in the event loop after each interupt has been serviced.
+      self.Interupted = None
+      self.PollTask = None
+      self.InteruptCount = 0
+      # Callback of the Transmitter or PipeReceiver, still called while started.
+      self.Callback = None
+
+
+   #/*************************************************************/
+   #/* Bind to the running event loop and start handling the IRQ */
+   #/* pin. With a ChannelHopper a task polls the transmitter so */
+   #/* payloads held back during blacklisted hops are sent.      */
+   #/*************************************************************/
+   async def Start(self):
+      try:
+         self.Loop = asyncio.get_running_loop()
+      except AttributeError:
+         # Python 3.6, inside a coroutine this is the running loop.
+         self.Loop = asyncio.get_event_loop()
+      self.Interupted = asyncio.Event()
+      if self.Transmitter is not None:
+         # Retired payloads are reported to the event loop, then to any existing callback.
+         self.Callback = self.Transmitter.Callback
+         self.Transmitter.Callback = self.TxCallback
+      elif self.Receiver is not None:
+         # Payloads queued by a dispatch thread wake Receive() as the interupt does.
+         self.Callback = self.Receiver.Callback
+         self.Receiver.Callback = self.RxCallback
+      RPiSPI.RPi.GPIO.add_event_detect(self.Radio.Irq, RPiSPI.RPi.GPIO.FALLING, callback = self.Interupt)
+      if self.Transmitter is not None and self.Transmitter.Hopper is not None:
+         self.PollTask = self.Loop.create_task(self.PollHops())
+
+
+   #/***********************************************************/
+   #/* Stop handling the IRQ pin, payloads still waiting for a */
+   #/* result have their Send() cancelled.                     */
+   #/***********************************************************/
+   async def Stop(self):
+      RPiSPI.RPi.GPIO.remove_event_detect(self.Radio.Irq)
+      if self.Transmitter is not None:
+         self.Transmitter.Callback = self.Callback
+      elif self.Receiver is not None:
+         self.Receiver.Callback = self.Callback
+      if self.PollTask is not None:
+         self.PollTask.cancel()
+         self.PollTask = None
+      for Entry in self.Waiting.values():
+         Entry[1].cancel()
+      self.Waiting.clear()
+
+
+   #/***************************************************************/
+   #/* Queue a payload and wait for it to be acknowledged, returns */
+   #/* True on TX_DS, False on MAX_RT or when the queue was full.  */
+   #/***************************************************************/
+   async def Send(self, Data):
+      # A copy of its own, the transmitter reports retired payloads by the object queued.
+      Data = bytearray(Data)
+      Future = self.Loop.create_future()
+      self.Waiting[id(Data)] = [Data, Future]
+      try:
+         Queued = self.Transmitter.Send(Data)
+      except ValueError:
+         del self.Waiting[id(Data)]
+         raise
+      if not Queued:
+         del self.Waiting[id(Data)]
+         return False
+      return await Future
+
+
+   #/***************************************************************/
+   #/* Yield [Pipeline, Receive Time, Data] of each payload queued */
+   #/* on the pipelines listed, all pipelines when None.           */
+   #/***************************************************************/
+   async def Receive(self, Pipelines = None):
+      if Pipelines is None:
+         Pipelines = range(RPiRF24L01.RF24L01_PIPE_COUNT)
+      while True:
+         # Cleared before draining, an interupt serviced after the drain sets it again.
+         self.Interupted.clear()
+         Entries = []
+         with self.Receiver.Condition:
+            for Pipeline in Pipelines:
+               Queue = self.Receiver.Queues[Pipeline]
+               while len(Queue) > 0:
+                  Entry = Queue.popleft()
+                  Entries.append([Pipeline, Entry[0], Entry[1]])
+         if len(Entries) == 0:
+            await self.Interupted.wait()
+         else:
+            Entries.sort(key = lambda Entry: Entry[1])
+            for Entry in Entries:
+               yield Entry
+
+
+   #/********************************************************************/
+   #/* RF24L01 interupt routine, on the RPi.GPIO thread. Services the   */
+   #/* interupt flags, then wakes the event loop without waiting on it. */
+   #/********************************************************************/
+   def Interupt(self, GpioPin):
+      IntFlags = self.Radio.GetIntFlags()
+      if self.Transmitter is not None:
+         self.Transmitter.Service(IntFlags)
+      elif self.Receiver is not None and IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
+         self.Receiver.Service()
+      self.InteruptCount += 1
+      self.Loop.call_soon_threadsafe(self.Interupted.set)
+
+
+   #/*************************************************************/
+   #/* Transmitter callback, on the thread which retired the     */
+   #/* payload. The result is passed to the event loop to settle */
+   #/* the future of the payload.                                */
+   #/*************************************************************/
+   def TxCallback(self, Data, Success):
+      self.Loop.call_soon_threadsafe(self.Retired, Data, Success)
+      if self.Callback is not None:
+         self.Callback(Data, Success)
+
+
+   #/**************************************************************/
+   #/* PipeReceiver callback, on the thread which dispatched the  */
+   #/* payloads. Wakes Receive() in the event loop to drain them. */
+   #/**************************************************************/
+   def RxCallback(self, Queued):
+      self.Loop.call_soon_threadsafe(self.Interupted.set)
+      if self.Callback is not None:
+         self.Callback(Queued)
+
+
+   #/********************************************************/
+   #/* Settle the future of a retired payload, in the loop. */
+   #/********************************************************/
+   def Retired(self, Data, Success):
+      Entry = self.Waiting.pop(id(Data), None)
+      if Entry is not None and Entry[0] is Data and not Entry[1].done():
+         Entry[1].set_result(Success)
+
+
+   #/****************************************************************/
+   #/* Load payloads held back by channel hopping, at the hop guard */
+   #/* interval, in place of the polling loops of the applications. */
+   #/****************************************************************/
+   async def PollHops(self):
+      while True:
+         await asyncio.sleep(RPiRF24L01.HOP_GUARD_SECONDS)
+         self.Transmitter.Poll()
+
+
+   #/*********************************************/
+   #/* Convert the front end statistics to text. */
+   #/*********************************************/
+   def DisplayStats(self):
+      Result = "RF24L01 ASYNC:\n"
+      Result += "Interupts: " + str(self.InteruptCount) + "\n"
+      Result += "Sends Waiting: " + str(len(self.Waiting)) + "\n"
+      return Result
@@ -0,0 +1,566 @@
+# RF24Sim - Simulated RF24L01 Devices in Python
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* RF24Sim - Simulated RF24L01 Devices in Python.                           */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Software RF24L01+ devices connected by a simulated air, so the driver    */
+#/* and the applications built on it run without a Raspberry Pi or radios.   */
+#/* Each SimRF24L01 answers the SPI transactions of an RPiRF24L01.RF24L01 on */
+#/* the SPI_BACKEND_SIM backend, follows its CE pin and drives its IRQ pin   */
+#/* through SimGPIO. Registers, STATUS, the three level TX and RX FIFOs,     */
+#/* acknowledge payloads, dynamic payload length and Enhanced ShockBurst     */
+#/* auto acknowledge, packet id repeat detection and auto retransmit are     */
+#/* simulated.                                                               */
+#/*                                                                          */
+#/* SimAir carries packets between the devices on the same channel, data     */
+#/* rate and address, taking the airtime of each packet at the configured    */
+#/* data rate plus a fixed latency, and losing packets and acknowledges at   */
+#/* random at the configured loss rate. Time is real time, events are run on */
+#/* the air thread.                                                          */
+#/*                                                                          */
+#/* Usage:                                                                   */
+#/*    Air = RF24Sim.SimAir(LossRate = 0.05)                                 */
+#/*    Radio = RPiRF24L01.RF24L01(Csn, Ce, Irq, RPiSPI.SpiBus())             */
+#/*    Radio.Init(RPiSPI.SPI_BACKEND_SIM)                                    */
+#/*    RF24Sim.Attach(Air, Radio)                                            */
+#/****************************************************************************/
+
+
+
+import time
+import heapq
+import random
+import threading
+import collections
+import SimGPIO
+import RPiSPI
+import RPiRF24L01
+
+
+
+# Radio settling time before each packet and acknowledge, seconds.
+SIM_SETTLING_SECONDS = 0.000130
+# Enhanced ShockBurst preamble and packet control field bits.
+SIM_PREAMBLE_BITS = 8
+SIM_CONTROL_BITS = 9
+# Number of packet ids, repeats are detected by packet id and payload.
+SIM_PID_MODULO = 4
+# Time a carrier remains detected after a packet ends, seconds.
+SIM_CARRIER_SECONDS = 0.000170
+
+# Data rate of each RF_SETUP data rate setting, bits per second.
+SIM_DATA_RATES = {
+   RPiRF24L01.RF24L01_RF_SETUP_250KBPS : 250000,
+   RPiRF24L01.RF24L01_RF_SETUP_1MBPS : 1000000,
+   RPiRF24L01.RF24L01_RF_SETUP_2MBPS : 2000000
+}
+
+# Register values after power on reset.
+SIM_RESET_REGISTERS = {
+   RPiRF24L01.RF24L01_CONFIG : [0x08],
+   RPiRF24L01.RF24L01_EN_AA : [0x3F],
+   RPiRF24L01.RF24L01_EN_RXADDR : [0x03],
+   RPiRF24L01.RF24L01_SETUP_AW : [0x03],
+   RPiRF24L01.RF24L01_SETUP_RETR : [0x03],
+   RPiRF24L01.RF24L01_RF_CH : [0x02],
+   RPiRF24L01.RF24L01_RF_SETUP : [0x0F],
+   RPiRF24L01.RF24L01_RX_ADDR_P0 : [0xE7, 0xE7, 0xE7, 0xE7, 0xE7],
+   RPiRF24L01.RF24L01_RX_ADDR_P1 : [0xC2, 0xC2, 0xC2, 0xC2, 0xC2],
+   RPiRF24L01.RF24L01_RX_ADDR_P2 : [0xC3],
+   RPiRF24L01.RF24L01_RX_ADDR_P3 : [0xC4],
+   RPiRF24L01.RF24L01_RX_ADDR_P4 : [0xC5],
+   RPiRF24L01.RF24L01_RX_ADDR_P5 : [0xC6],
+   RPiRF24L01.RF24L01_TX_ADDR : [0xE7, 0xE7, 0xE7, 0xE7, 0xE7],
+   RPiRF24L01.RF24L01_DYNPD : [0x00],
+   RPiRF24L01.RF24L01_FEATURE : [0x00]
+}
+
+
+
+#/**************************************************************************/
+#/* The air between simulated devices. LossRate is the chance of losing    */
+#/* each packet and AckLossRate each acknowledge, the same when None.      */
+#/* LatencySeconds is added to each packet and acknowledge. DataRate, bits */
+#/* per second, overrides the airtime of the data rate the devices are set */
+#/* to. Noise maps channels to the chance of a carrier being detected on   */
+#/* them, for spectrum sweeps.                                             */
+#/**************************************************************************/
+class SimAir(object):
+   def __init__(self, LossRate = 0.0, LatencySeconds = 0.0, DataRate = None, AckLossRate = None, Noise = None, Seed = None):
+      self.LossRate = LossRate
+      if AckLossRate is None:
+         AckLossRate = LossRate
+      self.AckLossRate = AckLossRate
+      self.LatencySeconds = LatencySeconds
+      self.DataRate = DataRate
+      if Noise is None:
+         Noise = {}
+      self.Noise = Noise
+      self.Random = random.Random(Seed)
+      self.Devices = []
+      # All device state is changed with the lock held, by SPI transactions and the air thread.
+      self.Lock = threading.RLock()
+      self.Condition = threading.Condition(self.Lock)
+      # Pending events, [Time, Order, Function, Arguments].
+      self.Events = []
+      self.EventCount = 0
+      # Time the carrier of the last packet on each channel ends.
+      self.CarrierTime = [0.0] * RPiRF24L01.RF24L01_CHANNEL_COUNT
+      self.PacketCount = 0
+      self.LostCount = 0
+      self.AckLostCount = 0
+      self.Thread = threading.Thread(target = self.Run)
+      self.Thread.daemon = True
+      self.Thread.start()
+
+
+   #/**************************************************************/
+   #/* Run Function with the arguments on the air thread at Time. */
+   #/**************************************************************/
+   def Schedule(self, Time, Function, *Arguments):
+      with self.Condition:
+         self.EventCount += 1
+         heapq.heappush(self.Events, [Time, self.EventCount, Function, Arguments])
+         self.Condition.notify()
+
+
+   #/********************************************/
+   #/* Air thread, run events as they fall due. */
+   #/********************************************/
+   def Run(self):
+      with self.Condition:
+         while True:
+            if len(self.Events) == 0:
+               self.Condition.wait()
+            else:
+               Delay = self.Events[0][0] - time.time()
+               if Delay > 0:
+                  self.Condition.wait(Delay)
+               else:
+                  Event = heapq.heappop(self.Events)
+                  Event[2](*Event[3])
+
+
+   #/**************************************************************/
+   #/* Return the airtime of a packet from a device, seconds, the */
+   #/* settling time and the packet at the device data rate.      */
+   #/**************************************************************/
+   def Airtime(self, Device, PayloadBytes):
+      DataRate = self.DataRate
+      if DataRate is None:
+         DataRate = Device.GetDataRate()
+      Bits = SIM_PREAMBLE_BITS + 8 * Device.GetAddressWidth() + SIM_CONTROL_BITS + 8 * PayloadBytes + 8 * Device.GetCrcBytes()
+      return SIM_SETTLING_SECONDS + float(Bits) / DataRate
+
+
+   #/************************************************************/
+   #/* Return True when a carrier is on the channel, for the CD */
+   #/* register.                                                */
+   #/************************************************************/
+   def Carrier(self, Channel):
+      return time.time() < self.CarrierTime[Channel] or self.Random.random() < self.Noise.get(Channel, 0.0)
+
+
+   #/**************************************************************/
+   #/* Send one attempt of a packet from a device, the outcome is */
+   #/* passed to the device AttemptEnd() when it is known.        */
+   #/**************************************************************/
+   def Transmit(self, Sender, Data, Pid, NoAck):
+      with self.Lock:
+         Now = time.time()
+         Channel = Sender.GetChannel()
+         Airtime = self.Airtime(Sender, len(Data))
+         self.CarrierTime[Channel] = max(self.CarrierTime[Channel], Now + Airtime + SIM_CARRIER_SECONDS)
+         Packet = [Sender.GetTxAddress(), Channel, Sender.GetDataRate(), Data, Pid, NoAck]
+         self.Schedule(Now + Airtime + self.LatencySeconds, self.Arrive, Sender, Packet, Now + Airtime)
+
+
+   #/****************************************************************/
+   #/* A packet arrives, deliver it to each listening device on the */
+   #/* channel, data rate and address, and return the acknowledge.  */
+   #/****************************************************************/
+   def Arrive(self, Sender, Packet, EndTime):
+      self.PacketCount += 1
+      Acked = False
+      AckPayload = None
+      if self.Random.random() < self.LossRate:
+         self.LostCount += 1
+      else:
+         for Device in self.Devices:
+            if Device is not Sender and Device.IsListening(Packet[1], Packet[2]):
+               Pipeline = Device.MatchAddress(Packet[0])
+               if Pipeline is not None:
+                  Result = Device.Receive(Pipeline, Packet)
+                  if Result[0] and not Acked:
+                     Acked = True
+                     AckPayload = Result[1]
+      ExpectAck = Sender.ExpectAck(Packet[5])
+      Now = time.time()
+      if not ExpectAck:
+         self.Schedule(Now, Sender.AttemptEnd, True, None)
+      elif Acked and self.Random.random() >= self.AckLossRate and Sender.MatchAddress(Packet[0]) == 0:
+         if AckPayload is None:
+            AckBytes = 0
+         else:
+            AckBytes = len(AckPayload)
+         self.Schedule(Now + self.Airtime(Sender, AckBytes) + self.LatencySeconds, Sender.AttemptEnd, True, AckPayload)
+      else:
+         if Acked:
+            self.AckLostCount += 1
+         # No acknowledge, the sender retransmits after the auto retransmit delay.
+         self.Schedule(max(Now, EndTime + Sender.GetRetransmitDelay()), Sender.AttemptEnd, False, None)
+
+
+   #/***************************************/
+   #/* Convert the air statistics to text. */
+   #/***************************************/
+   def DisplayStats(self):
+      Result = "SIMULATED AIR:\n"
+      Result += "Packets: " + str(self.PacketCount) + "\n"
+      Result += "Packets Lost: " + str(self.LostCount) + "\n"
+      Result += "Acknowledges Lost: " + str(self.AckLostCount) + "\n"
+      return Result
+
+
+
+#/************************************************************************/
+#/* One simulated RF24L01+ device in the air. Transfer() is the SPI      */
+#/* simulator function of its bus. Ce and Irq are its SimGPIO pins, Csn  */
+#/* selects it when several devices share a simulated bus, see Attach(). */
+#/************************************************************************/
+class SimRF24L01(object):
+   def __init__(self, Air, Csn, Ce, Irq):
+      self.Air = Air
+      self.Csn = Csn
+      self.Ce = Ce
+      self.Irq = Irq
+      self.Registers = {}
+      for RegisterAddress in SIM_RESET_REGISTERS:
+         self.Registers[RegisterAddress] = list(SIM_RESET_REGISTERS[RegisterAddress])
+      # STATUS interupt flags.
+      self.Flags = 0
+      # TX FIFO entries, [Data, Ack Payload Pipeline or None, No Acknowledge].
+      self.TxFifo = collections.deque()
+      # RX FIFO entries, [Pipeline, Data].
+      self.RxFifo = collections.deque()
+      # A packet is being sent, with its id and retransmit count.
+      self.Sending = False
+      self.Pid = 0
+      self.Retransmits = 0
+      # OBSERVE_TX counts.
+      self.ArcCount = 0
+      self.PlosCount = 0
+      # Packet id and payload last received on each pipeline, to detect repeats.
+      self.LastPacket = [None] * RPiRF24L01.RF24L01_PIPE_COUNT
+      with Air.Lock:
+         Air.Devices.append(self)
+      SimGPIO.AddOutputListener(Ce, self.ChipEnableChanged)
+      SimGPIO.SetInput(Irq, 1)
+
+
+   #/*************************************************************/
+   #/* SPI simulator function, handle one command and return the */
+   #/* response, STATUS followed by the data read.               */
+   #/*************************************************************/
+   def Transfer(self, DataWords):
+      with self.Air.Lock:
+         Command = DataWords[0]
+         Response = [self.GetStatus()] + [0] * (len(DataWords) - 1)
+         if Command < RPiRF24L01.RF24L01_W_REGISTER:
+            Data = self.ReadRegister(Command & 0x1F)
+            Response[1:] = (Data + [0] * len(DataWords))[:len(DataWords) - 1]
+         elif Command < RPiRF24L01.RF24L01_W_REGISTER + 0x20:
+            self.WriteRegister(Command & 0x1F, list(DataWords[1:]))
+         elif Command == RPiRF24L01.RF24L01_R_RX_PAYLOAD:
+            if len(self.RxFifo) > 0:
+               Data = self.RxFifo.popleft()[1]
+               Response[1:] = (Data + [0] * len(DataWords))[:len(DataWords) - 1]
+         elif Command == RPiRF24L01.RF24L01_R_RX_PL_WID:
+            if len(self.RxFifo) > 0 and len(DataWords) > 1:
+               Response[1] = len(self.RxFifo[0][1])
+         elif Command in (RPiRF24L01.RF24L01_W_TX_PAYLOAD, RPiRF24L01.RF24L01_W_TX_PAYLOAD_NOACK):
+            if len(self.TxFifo) < RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+               self.TxFifo.append([list(DataWords[1:]), None, Command == RPiRF24L01.RF24L01_W_TX_PAYLOAD_NOACK])
+         elif Command & 0xF8 == RPiRF24L01.RF24L01_W_ACK_PAYLOAD:
+            if len(self.TxFifo) < RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+               self.TxFifo.append([list(DataWords[1:]), Command & 0x07, False])
+         elif Command == RPiRF24L01.RF24L01_FLUSH_TX:
+            self.TxFifo.clear()
+         elif Command == RPiRF24L01.RF24L01_FLUSH_RX:
+            self.RxFifo.clear()
+         self.Update()
+      return Response
+
+
+   #/*****************************************************************/
+   #/* Return STATUS, the interupt flags, the pipeline of the        */
+   #/* payload at the head of the RX FIFO and the TX FIFO full flag. */
+   #/*****************************************************************/
+   def GetStatus(self):
+      if len(self.RxFifo) > 0:
+         Pipeline = self.RxFifo[0][0]
+      else:
+         Pipeline = RPiRF24L01.RF24L01_STATUS_RX_P_NO_EMPTY
+      Status = self.Flags | (Pipeline << 1)
+      if len(self.TxFifo) >= RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+         Status |= RPiRF24L01.RF24L01_STATUS_TX_FULL
+      return Status
+
+
+   #/*************************************************************/
+   #/* Return the bytes of a register, status registers are made */
+   #/* from the device state.                                    */
+   #/*************************************************************/
+   def ReadRegister(self, RegisterAddress):
+      if RegisterAddress == RPiRF24L01.RF24L01_STATUS:
+         Data = [self.GetStatus()]
+      elif RegisterAddress == RPiRF24L01.RF24L01_FIFO_STATUS:
+         FifoStatus = 0
+         if len(self.TxFifo) >= RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+            FifoStatus |= RPiRF24L01.RF24L01_FIFO_STATUS_TX_FULL
+         if len(self.TxFifo) == 0:
+            FifoStatus |= RPiRF24L01.RF24L01_FIFO_STATUS_TX_EMPTY
+         if len(self.RxFifo) >= RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+            FifoStatus |= RPiRF24L01.RF24L01_FIFO_STATUS_RX_FULL
+         if len(self.RxFifo) == 0:
+            FifoStatus |= RPiRF24L01.RF24L01_FIFO_STATUS_RX_EMPTY
+         Data = [FifoStatus]
+      elif RegisterAddress == RPiRF24L01.RF24L01_OBSERVE_TX:
+         Data = [(self.PlosCount << 4) | self.ArcCount]
+      elif RegisterAddress == RPiRF24L01.RF24L01_CD:
+         Data = [int(self.IsListening(self.GetChannel(), self.GetDataRate()) and self.Air.Carrier(self.GetChannel()))]
+      else:
+         Data = list(self.Registers.get(RegisterAddress, [0]))
+      return Data
+
+
+   #/*********************************************************************/
+   #/* Write a register, writing STATUS clears the interupt flags set in */
+   #/* the data, changing RF_CH resets the lost packet count.            */
+   #/*********************************************************************/
+   def WriteRegister(self, RegisterAddress, Data):
+      if len(Data) == 0:
+         return
+      if RegisterAddress == RPiRF24L01.RF24L01_STATUS:
+         self.Flags &= ~(Data[0] & RPiRF24L01.RF24L01_STATUS_IRQ)
+      elif RegisterAddress in (RPiRF24L01.RF24L01_FIFO_STATUS, RPiRF24L01.RF24L01_OBSERVE_TX, RPiRF24L01.RF24L01_CD):
+         pass
+      elif RegisterAddress in (RPiRF24L01.RF24L01_RX_ADDR_P0, RPiRF24L01.RF24L01_RX_ADDR_P1, RPiRF24L01.RF24L01_TX_ADDR):
+         self.Registers[RegisterAddress] = Data[:5]
+      else:
+         if RegisterAddress == RPiRF24L01.RF24L01_RF_CH and Data[0] != self.GetChannel():
+            self.PlosCount = 0
+         self.Registers[RegisterAddress] = [Data[0]]
+
+
+   #/***********************************************/
+   #/* Return the first byte of a stored register. */
+   #/***********************************************/
+   def Get(self, RegisterAddress):
+      return self.Registers.get(RegisterAddress, [0])[0]
+
+
+   def GetChannel(self):
+      return self.Get(RPiRF24L01.RF24L01_RF_CH) % RPiRF24L01.RF24L01_CHANNEL_COUNT
+
+
+   def GetDataRate(self):
+      return SIM_DATA_RATES.get(self.Get(RPiRF24L01.RF24L01_RF_SETUP) & RPiRF24L01.RF24L01_RF_SETUP_DATA_RATE, 2000000)
+
+
+   def GetAddressWidth(self):
+      return max(3, (self.Get(RPiRF24L01.RF24L01_SETUP_AW) & 0x03) + 2)
+
+
+   def GetCrcBytes(self):
+      Config = self.Get(RPiRF24L01.RF24L01_CONFIG)
+      if not Config & RPiRF24L01.RF24L01_CONFIG_EN_CRC:
+         CrcBytes = 0
+      elif Config & RPiRF24L01.RF24L01_CONFIG_CRCO:
+         CrcBytes = 2
+      else:
+         CrcBytes = 1
+      return CrcBytes
+
+
+   def GetTxAddress(self):
+      return self.Registers[RPiRF24L01.RF24L01_TX_ADDR][:self.GetAddressWidth()]
+
+
+   #/**************************************************************/
+   #/* Return the auto retransmit delay from SETUP_RETR, seconds. */
+   #/**************************************************************/
+   def GetRetransmitDelay(self):
+      return 0.000250 * (((self.Get(RPiRF24L01.RF24L01_SETUP_RETR) & RPiRF24L01.RF24L01_SETUP_RETR_ARD) >> 4) + 1)
+
+
+   #/************************************************************/
+   #/* Return True when a packet needs an acknowledge, auto     */
+   #/* acknowledge is enabled on pipeline 0 and it was not sent */
+   #/* with W_TX_PAYLOAD_NOACK.                                 */
+   #/************************************************************/
+   def ExpectAck(self, NoAck):
+      return not NoAck and (self.Get(RPiRF24L01.RF24L01_EN_AA) & 0x01) != 0
+
+
+   #/*************************************************************/
+   #/* Return True when in RX mode on the channel and data rate. */
+   #/*************************************************************/
+   def IsListening(self, Channel, DataRate):
+      Config = self.Get(RPiRF24L01.RF24L01_CONFIG)
+      return (Config & RPiRF24L01.RF24L01_CONFIG_PWR_UP) != 0 and (Config & RPiRF24L01.RF24L01_CONFIG_PRX) != 0 and SimGPIO.input(self.Ce) == 1 and Channel == self.GetChannel() and DataRate == self.GetDataRate()
+
+
+   #/*******************************************************/
+   #/* Return the enabled pipeline matching an address, or */
+   #/* None.                                               */
+   #/*******************************************************/
+   def MatchAddress(self, Address):
+      Width = self.GetAddressWidth()
+      Enabled = self.Get(RPiRF24L01.RF24L01_EN_RXADDR)
+      Base = self.Registers[RPiRF24L01.RF24L01_RX_ADDR_P1]
+      for Pipeline in range(RPiRF24L01.RF24L01_PIPE_COUNT):
+         if Pipeline <= 1:
+            PipeAddress = self.Registers[RPiRF24L01.RF24L01_RX_ADDR_P0 + Pipeline]
+         else:
+            PipeAddress = [self.Get(RPiRF24L01.RF24L01_RX_ADDR_P0 + Pipeline)] + Base[1:]
+         if Enabled & (1 << Pipeline) and PipeAddress[:Width] == Address[:Width]:
+            return Pipeline
+      return None
+
+
+   #/****************************************************************/
+   #/* Receive a packet on a pipeline, returns [Acknowledged, Ack   */
+   #/* Payload]. A repeat of the last packet, the same id and       */
+   #/* payload, is acknowledged but not stored. A packet is dropped */
+   #/* without acknowledge when the RX FIFO is full.                */
+   #/****************************************************************/
+   def Receive(self, Pipeline, Packet):
+      Data = Packet[3]
+      Dynamic = (self.Get(RPiRF24L01.RF24L01_FEATURE) & RPiRF24L01.RF24L01_FEATURE_EN_DPL) and (self.Get(RPiRF24L01.RF24L01_DYNPD) & (1 << Pipeline))
+      if not Dynamic:
+         Width = self.Get(RPiRF24L01.RF24L01_RX_PW_P0 + Pipeline)
+         if Width == 0:
+            return [False, None]
+         Data = (Data + [0] * RPiRF24L01.RF24L01_MAX_PAYLOAD)[:Width]
+      if self.LastPacket[Pipeline] != [Packet[4], Data]:
+         if len(self.RxFifo) >= RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+            return [False, None]
+         self.RxFifo.append([Pipeline, Data])
+         self.LastPacket[Pipeline] = [Packet[4], Data]
+         self.Flags |= RPiRF24L01.RF24L01_STATUS_RX_DR
+      Acked = not Packet[5] and (self.Get(RPiRF24L01.RF24L01_EN_AA) & (1 << Pipeline)) != 0
+      AckPayload = None
+      if Acked and self.Get(RPiRF24L01.RF24L01_FEATURE) & RPiRF24L01.RF24L01_FEATURE_EN_ACK_PAY:
+         for Entry in self.TxFifo:
+            if Entry[1] == Pipeline:
+               self.TxFifo.remove(Entry)
+               AckPayload = Entry[0]
+               # TX_DS is set in RX mode when an acknowledge payload is sent.
+               self.Flags |= RPiRF24L01.RF24L01_STATUS_TX_DS
+               break
+      self.Update()
+      return [Acked, AckPayload]
+
+
+   #/****************************************************************/
+   #/* The outcome of one attempt to send the packet at the head of */
+   #/* the TX FIFO, from the air thread.                            */
+   #/****************************************************************/
+   def AttemptEnd(self, Success, AckPayload):
+      if Success:
+         if len(self.TxFifo) > 0:
+            self.TxFifo.popleft()
+         self.Flags |= RPiRF24L01.RF24L01_STATUS_TX_DS
+         if AckPayload is not None and len(self.RxFifo) < RPiRF24L01.RF24L01_TX_FIFO_SIZE:
+            self.RxFifo.append([0, AckPayload])
+            self.Flags |= RPiRF24L01.RF24L01_STATUS_RX_DR
+         self.ArcCount = self.Retransmits
+         self.Pid = (self.Pid + 1) % SIM_PID_MODULO
+         self.Sending = False
+      elif self.Retransmits < (self.Get(RPiRF24L01.RF24L01_SETUP_RETR) & RPiRF24L01.RF24L01_SETUP_RETR_ARC) and len(self.TxFifo) > 0:
+         self.Retransmits += 1
+         Entry = self.TxFifo[0]
+         self.Air.Transmit(self, Entry[0], self.Pid, Entry[2])
+      else:
+         # The packet stays in the TX FIFO until flushed, sending stops until MAX_RT is cleared.
+         self.ArcCount = self.Retransmits
+         self.PlosCount = min(15, self.PlosCount + 1)
+         self.Flags |= RPiRF24L01.RF24L01_STATUS_MAX_RT
+         self.Sending = False
+      self.Update()
+
+
+   #/*********************************/
+   #/* CE pin changed, from SimGPIO. */
+   #/*********************************/
+   def ChipEnableChanged(self, Pin, Level):
+      with self.Air.Lock:
+         self.Update()
+
+
+   #/*****************************************************************/
+   #/* Drive the IRQ pin from the unmasked interupt flags, and start */
+   #/* sending the head of the TX FIFO when in TX mode with CE high. */
+   #/*****************************************************************/
+   def Update(self):
+      Config = self.Get(RPiRF24L01.RF24L01_CONFIG)
+      SimGPIO.SetInput(self.Irq, (self.Flags & ~Config & RPiRF24L01.RF24L01_STATUS_IRQ) == 0)
+      if not self.Sending and len(self.TxFifo) > 0 and (Config & RPiRF24L01.RF24L01_CONFIG_PWR_UP) and not (Config & RPiRF24L01.RF24L01_CONFIG_PRX) and SimGPIO.input(self.Ce) == 1 and not (self.Flags & RPiRF24L01.RF24L01_STATUS_MAX_RT):
+         Entry = self.TxFifo[0]
+         self.Sending = True
+         self.Retransmits = 0
+         self.Air.Transmit(self, Entry[0], self.Pid, Entry[2])
+
+
+
+# Simulated devices sharing each simulated bus, selected by their CSN pins.
+SimBusDevices = {}
+
+
+
+#/***************************************************************************/
+#/* Attach a simulated device in the air to an RPiRF24L01.RF24L01 instance, */
+#/* DefaultRadio when None, using the pins of the instance. The bus of the  */
+#/* instance must use SPI_BACKEND_SIM. Returns the SimRF24L01.              */
+#/***************************************************************************/
+def Attach(Air, Radio = None):
+   if Radio is None:
+      Radio = RPiRF24L01.DefaultRadio
+   if not RPiSPI.SPI_GPIO_SIMULATED:
+      raise RuntimeError("RF24Sim needs SimGPIO, RPi.GPIO is installed.")
+   Device = SimRF24L01(Air, Radio.Csn, Radio.Ce, Radio.Irq)
+   Devices = SimBusDevices.setdefault(Radio.Bus, [])
+   Devices.append(Device)
+   if len(Devices) == 1:
+      Radio.Bus.SetSimulator(Device.Transfer)
+   else:
+      Radio.Bus.SetSimulator(lambda DataWords: SelectDevice(Devices, DataWords))
+   return Device
+
+
+
+#/*************************************************************/
+#/* Pass a transaction to the device selected by its CSN pin. */
+#/*************************************************************/
+def SelectDevice(Devices, DataWords):
+   for Device in Devices:
+      if SimGPIO.input(Device.Csn) == 0:
+         return Device.Transfer(DataWords)
+   return [RPiSPI.SPI_SIM_IDLE_WORD] * len(DataWords)
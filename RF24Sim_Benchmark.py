@@ -0,0 +1,152 @@
+#!/usr/bin/python
+
+# RF24Sim_Benchmark - Measure Link Throughput on Simulated RF24L01 Devices
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/*****************************************************************************/
+#/* RF24Sim_Benchmark - Measure Link Throughput on Simulated RF24L01 Devices. */
+#/* ------------------------------------------------------------------------  */
+#/* V1.00 - 2019-08-28 - Jason Birch                                          */
+#/* ------------------------------------------------------------------------  */
+#/* Runs a Transmitter and a PipeReceiver, set up as PiRF24L01_Tx and         */
+#/* PiRF24L01_Rx set up the device, on two simulated RF24L01 devices in a     */
+#/* simulated air with loss. Reports packets delivered per second, lost and   */
+#/* repeated packets, and the latency from queueing a packet to it being      */
+#/* queued at the receiver. Runs without a Raspberry Pi.                      */
+#/*                                                                           */
+#/* Usage: RF24Sim_Benchmark.py [PACKETS] [LATENCY_MS]                        */
+#/*****************************************************************************/
+
+
+
+import sys
+import time
+import struct
+import threading
+import RPiSPI
+import RPiRF24L01
+import RF24Sim
+
+
+
+# RF channel and transmitter pipeline.
+RF_CHANNEL = 100
+TX_PIPELINE = 1
+# Pins of the simulated devices, [CSN, CE, IRQ].
+TX_PINS = [25, 8, 24]
+RX_PINS = [5, 6, 13]
+# Packet loss rates to measure, fraction of packets and acknowledges lost.
+LOSS_RATES = [0.0, 0.05, 0.20]
+# Data rates to measure, RF_SETUP settings.
+DATA_RATES = [RPiRF24L01.RF24L01_RF_SETUP_2MBPS, RPiRF24L01.RF24L01_RF_SETUP_1MBPS, RPiRF24L01.RF24L01_RF_SETUP_250KBPS]
+# Time to wait for the last packets, seconds.
+DRAIN_SECONDS = 5.0
+# Payload, packet number and padding to a full payload.
+PayloadStruct = struct.Struct("<I28x")
+
+
+
+#/***************************************************************/
+#/* Create an RF24L01 instance on its own simulated SPI bus and */
+#/* attach a simulated device in the air to it.                 */
+#/***************************************************************/
+def CreateRadio(Air, Pins, DataRate):
+   Radio = RPiRF24L01.RF24L01(Pins[0], Pins[1], Pins[2], RPiSPI.SpiBus())
+   Radio.Init(RPiSPI.SPI_BACKEND_SIM)
+   RF24Sim.Attach(Air, Radio)
+   Radio.Configure()
+   Radio.EnableDynamicPayloads(AckPayload = True)
+   Response = Radio.WriteRegister(RPiRF24L01.RF24L01_RF_SETUP, [(DataRate | RPiRF24L01.RF24L01_RF_SETUP_0DBM | RPiRF24L01.RF24L01_RF_SETUP_LNA_GAIN)])
+   Response = Radio.WriteRegister(RPiRF24L01.RF24L01_SETUP_RETR, [RPiRF24L01.RetransmitSetup(500, 15)])
+   return Radio
+
+
+
+#/***********************************************************/
+#/* Send packets through the simulated air, report results. */
+#/***********************************************************/
+def Benchmark(PacketCount, LossRate, DataRate, LatencySeconds):
+   Air = RF24Sim.SimAir(LossRate = LossRate, LatencySeconds = LatencySeconds, Seed = 1)
+   TxRadio = CreateRadio(Air, TX_PINS, DataRate)
+   RxRadio = CreateRadio(Air, RX_PINS, DataRate)
+
+   SendTimes = [None] * PacketCount
+   Latencies = []
+   Received = threading.Event()
+
+   # Receiver, as PiRF24L01_Rx.
+   Receiver = RPiRF24L01.PipeReceiver(SequenceRange = lambda Data: [PayloadStruct.unpack(bytearray(Data))[0] % RPiRF24L01.SEQUENCE_MODULO, 1], Radio = RxRadio)
+   def RxInterupt(GpioPin):
+      IntFlags = RxRadio.GetIntFlags()
+      if IntFlags & RPiRF24L01.RF24L01_STATUS_RX_DR:
+         Receiver.Service()
+   def RxHandler(Pipeline, ReceiveTime, Data):
+      Latencies.append(ReceiveTime - SendTimes[PayloadStruct.unpack(bytearray(Data))[0]])
+      if len(Latencies) >= PacketCount:
+         Received.set()
+   RxRadio.ConfigureRxPipes(RF_CHANNEL, [RPiRF24L01.RX_PIPE_DYNAMIC] * RPiRF24L01.RF24L01_PIPE_COUNT)
+   RxRadio.Reset()
+   Receiver.StartWorkers({TX_PIPELINE : RxHandler})
+   RPiSPI.RPi.GPIO.add_event_detect(RxRadio.Irq, RPiSPI.RPi.GPIO.FALLING, callback = RxInterupt)
+
+   # Transmitter, as PiRF24L01_Tx.
+   Transmitter = RPiRF24L01.Transmitter(RF_CHANNEL, TX_PIPELINE, Radio = TxRadio)
+   def TxInterupt(GpioPin):
+      Transmitter.Service(TxRadio.GetIntFlags())
+   TxRadio.ConfigureTx(RF_CHANNEL)
+   TxRadio.Reset()
+   RPiSPI.RPi.GPIO.add_event_detect(TxRadio.Irq, RPiSPI.RPi.GPIO.FALLING, callback = TxInterupt)
+   Transmitter.Start()
+
+   StartTime = time.time()
+   for Count in range(PacketCount):
+      while Transmitter.GetBacklog() >= Transmitter.QueueSize:
+         time.sleep(0.0005)
+      SendTimes[Count] = time.time()
+      Transmitter.Send(PayloadStruct.pack(Count))
+   EndTime = time.time() + DRAIN_SECONDS
+   while Transmitter.GetBacklog() > 0 and time.time() < EndTime:
+      time.sleep(0.001)
+   Received.wait(max(0.0, EndTime - time.time()))
+   Elapsed = time.time() - StartTime
+   Receiver.StopWorkers()
+   RPiSPI.RPi.GPIO.remove_event_detect(TxRadio.Irq)
+   RPiSPI.RPi.GPIO.remove_event_detect(RxRadio.Irq)
+   TxRadio.ConfigureOff()
+   RxRadio.ConfigureOff()
+
+   Latencies.sort()
+   if len(Latencies) == 0:
+      Latencies = [0.0]
+   Window = Receiver.Windows[TX_PIPELINE]
+   print("{:>8s} {:5.0f}% {:6d} {:6d} {:6d} {:5d} {:5d} {:9.0f} {:8.2f} {:8.2f} {:8.2f}".format(RPiRF24L01.DATA_RATE_NAMES[DataRate], 100 * LossRate, Receiver.ReceivedCount[TX_PIPELINE], Transmitter.FailedCount, Air.PacketCount, Window.LostCount, Window.DuplicateCount, Receiver.ReceivedCount[TX_PIPELINE] / Elapsed, 1000 * Latencies[len(Latencies) // 2], 1000 * Latencies[len(Latencies) * 99 // 100], 1000 * Latencies[-1]))
+
+
+
+if len(sys.argv) > 1:
+   PacketCount = int(sys.argv[1])
+else:
+   PacketCount = 2000
+if len(sys.argv) > 2:
+   LatencySeconds = float(sys.argv[2]) / 1000
+else:
+   LatencySeconds = 0.0
+
+print("{:d} packets of {:d} bytes, {:.1f}mS latency each way.\n".format(PacketCount, PayloadStruct.size, 1000 * LatencySeconds))
+print("{:>8s} {:>6s} {:>6s} {:>6s} {:>6s} {:>5s} {:>5s} {:>9s} {:>8s} {:>8s} {:>8s}".format("RATE", "LOSS", "RX", "FAILED", "AIR", "LOST", "DUPS", "PKTS/SEC", "MED mS", "P99 mS", "MAX mS"))
+for DataRate in DATA_RATES:
+   for LossRate in LOSS_RATES:
+      Benchmark(PacketCount, LossRate, DataRate, LatencySeconds)
@@ -0,0 +1,409 @@
+# RF24Transport - Messages Larger Than One RF24L01 Payload
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/******************************************************************************/
+#/* RF24Transport - Messages Larger Than One RF24L01 Payload.                  */
+#/* ------------------------------------------------------------------------   */
+#/* V1.00 - 2019-08-28 - Jason Birch                                           */
+#/* ------------------------------------------------------------------------   */
+#/* Transport layer on top of the RF24L01 driver, for NMEA sentences,          */
+#/* satellite tables and configuration blobs. A message is split into          */
+#/* fragments, each a payload with a five byte header:                         */
+#/*                                                                            */
+#/* Offset Size Field                                                          */
+#/*      0    1 Type, TRANSPORT_FRAGMENT.                                      */
+#/*      1    1 Session, chosen at random by each sender as it starts.         */
+#/*      2    1 Message id, 0 - 255, wrapping.                                 */
+#/*      3    1 Fragment index, 0 - Count-1.                                   */
+#/*      4    1 Fragment count, 1 - 255.                                       */
+#/*      5  <=27 Message data.                                                 */
+#/*                                                                            */
+#/* After the fragments the sender sends TRANSPORT_POLL payloads,              */
+#/* [Type, Session, Id]. The receiver answers in automatic acknowledge         */
+#/* payloads with TRANSPORT_STATUS, [Type, Session, Id, State, Base, Missing   */
+#/* Bitmap...], the bitmap marking fragments still missing from fragment       */
+#/* Base on, least significant bit first. Only missing fragments are sent      */
+#/* again. Message ids start again from 0 when the sender restarts, the        */
+#/* session keeps them apart from the ids the receiver has completed.          */
+#/*                                                                            */
+#/* The type values are never the first byte of a GpsPacket or a link          */
+#/* control payload, so the transport shares the link with them.               */
+#/******************************************************************************/
+
+
+
+import time
+import random
+import collections
+
+
+
+# First byte of each transport payload.
+TRANSPORT_FRAGMENT = 0xE0
+TRANSPORT_POLL = 0xE1
+TRANSPORT_STATUS = 0xE2
+
+# Message states in a status payload.
+STATUS_DONE = 0
+STATUS_MISSING = 1
+STATUS_UNKNOWN = 2
+
+# Largest RF24L01 payload.
+MAX_PAYLOAD = 32
+# Bytes of fragment header and of status header.
+FRAGMENT_HEADER_SIZE = 5
+STATUS_HEADER_SIZE = 5
+# Message data carried in each fragment.
+FRAGMENT_DATA_SIZE = MAX_PAYLOAD - FRAGMENT_HEADER_SIZE
+# Largest number of fragments in a message, and the largest message.
+MAX_FRAGMENTS = 255
+MAX_MESSAGE_SIZE = MAX_FRAGMENTS * FRAGMENT_DATA_SIZE
+# Fragments covered by one status payload bitmap.
+STATUS_BITMAP_FRAGMENTS = 8 * (MAX_PAYLOAD - STATUS_HEADER_SIZE)
+# Number of message ids before they repeat.
+MESSAGE_ID_MODULO = 256
+# Number of sender sessions.
+SESSION_MODULO = 256
+
+# Time between polls for the status of an unacknowledged message.
+POLL_SECONDS = 0.05
+# Polls without progress before a message is failed.
+POLL_RETRIES = 10
+# Messages being sent at once.
+MAX_SEND_MESSAGES = 4
+
+# Default reassembly limits, partial messages and their total bytes.
+REASSEMBLY_MESSAGES = 8
+REASSEMBLY_BYTES = 16384
+# Partial messages are dropped after this long without a fragment.
+REASSEMBLY_TIMEOUT = 5.0
+# Number of completed (Session, Message Id) remembered, to answer polls and ignore repeats.
+COMPLETED_HISTORY = 16
+
+
+
+#/***************************************************************/
+#/* Split a message, a string or bytes, into fragment payloads. */
+#/***************************************************************/
+def Fragment(Session, MessageId, Message):
+   Message = bytearray(Message)
+   if len(Message) > MAX_MESSAGE_SIZE:
+      raise ValueError("Message of {:d} bytes exceeds {:d} bytes.".format(len(Message), MAX_MESSAGE_SIZE))
+   Count = max(1, (len(Message) + FRAGMENT_DATA_SIZE - 1) // FRAGMENT_DATA_SIZE)
+   Fragments = []
+   for Index in range(Count):
+      Payload = bytearray([TRANSPORT_FRAGMENT, Session, MessageId, Index, Count])
+      Payload += Message[Index * FRAGMENT_DATA_SIZE:(Index + 1) * FRAGMENT_DATA_SIZE]
+      Fragments.append(Payload)
+   return Fragments
+
+
+
+#/***************************************************************************/
+#/* Return True when a payload, received as bytes or a list of byte values, */
+#/* belongs to the transport.                                               */
+#/***************************************************************************/
+def IsTransport(Data):
+   return len(Data) > 0 and Data[0] in (TRANSPORT_FRAGMENT, TRANSPORT_POLL, TRANSPORT_STATUS)
+
+
+
+#/**************************************************************************/
+#/* Sends messages through a payload send function, such as                */
+#/* RPiRF24L01.Transmitter.SendMany. Status payloads returned by the       */
+#/* receiver must be passed to Status(), from the Transmitter AckCallback, */
+#/* and Poll() called periodically to request status and resend fragments. */
+#/* Callback is passed (MessageId, Success) as each message finishes.      */
+#/**************************************************************************/
+class MessageSender(object):
+   def __init__(self, SendFunction, Callback = None, MaxMessages = MAX_SEND_MESSAGES):
+      self.SendFunction = SendFunction
+      self.Callback = Callback
+      self.MaxMessages = MaxMessages
+      # Distinguishes the messages of this sender from those sent before a restart.
+      self.Session = random.randrange(SESSION_MODULO)
+      self.NextId = 0
+      # Messages not yet acknowledged, by id, [Fragments, Poll Time, Polls Without Progress].
+      self.Messages = collections.OrderedDict()
+      self.MessageCount = 0
+      self.FailedCount = 0
+      self.FragmentCount = 0
+      self.ResentCount = 0
+      self.PollCount = 0
+
+
+   #/******************************************************************/
+   #/* Send a message, returns its id, or None when too many messages */
+   #/* are waiting to be acknowledged.                                */
+   #/******************************************************************/
+   def Send(self, Message):
+      if len(self.Messages) >= self.MaxMessages:
+         return None
+      MessageId = self.NextId
+      self.NextId = (self.NextId + 1) % MESSAGE_ID_MODULO
+      Fragments = Fragment(self.Session, MessageId, Message)
+      self.Messages[MessageId] = [Fragments, time.time() + POLL_SECONDS, 0]
+      self.FragmentCount += len(Fragments)
+      self.SendFunction(Fragments)
+      return MessageId
+
+
+   #/********************************************************************/
+   #/* Handle a status payload from the receiver. Returns True when the */
+   #/* payload was a transport status.                                  */
+   #/********************************************************************/
+   def Status(self, Data):
+      Data = bytearray(Data)
+      if len(Data) < STATUS_HEADER_SIZE or Data[0] != TRANSPORT_STATUS:
+         return False
+      MessageId = Data[2]
+      Message = self.Messages.get(MessageId)
+      # A status for another session is for a message sent before a restart.
+      if Message is not None and Data[1] == self.Session:
+         State = Data[3]
+         if State == STATUS_DONE:
+            self.Finish(MessageId, True)
+         else:
+            Fragments = Message[0]
+            if State == STATUS_UNKNOWN:
+               Resend = Fragments
+            else:
+               Base = Data[4]
+               Resend = []
+               for Index in range(Base, min(len(Fragments), Base + 8 * (len(Data) - STATUS_HEADER_SIZE))):
+                  Offset = Index - Base
+                  if Data[STATUS_HEADER_SIZE + Offset // 8] & (1 << (Offset % 8)):
+                     Resend.append(Fragments[Index])
+            if len(Resend) > 0:
+               # Progress, the receiver is answering.
+               Message[2] = 0
+               Message[1] = time.time() + POLL_SECONDS
+               self.ResentCount += len(Resend)
+               self.SendFunction(Resend)
+      return True
+
+
+   #/****************************************************************/
+   #/* Poll the receiver for the status of each message not yet     */
+   #/* acknowledged, failing messages after POLL_RETRIES polls      */
+   #/* without progress. Call periodically while messages are sent. */
+   #/****************************************************************/
+   def Poll(self):
+      Now = time.time()
+      for MessageId in list(self.Messages):
+         Message = self.Messages[MessageId]
+         if Now >= Message[1]:
+            if Message[2] >= POLL_RETRIES:
+               self.Finish(MessageId, False)
+            else:
+               Message[1] = Now + POLL_SECONDS
+               Message[2] += 1
+               self.PollCount += 1
+               self.SendFunction([bytearray([TRANSPORT_POLL, self.Session, MessageId])])
+
+
+   #/*******************************************/
+   #/* Finish sending a message and report it. */
+   #/*******************************************/
+   def Finish(self, MessageId, Success):
+      del self.Messages[MessageId]
+      if Success:
+         self.MessageCount += 1
+      else:
+         self.FailedCount += 1
+      if self.Callback is not None:
+         self.Callback(MessageId, Success)
+
+
+   #/******************************************/
+   #/* Return the number of messages waiting. */
+   #/******************************************/
+   def GetBacklog(self):
+      return len(self.Messages)
+
+
+   #/******************************************/
+   #/* Convert the sender statistics to text. */
+   #/******************************************/
+   def DisplayStats(self):
+      Result = "RF24 TRANSPORT SENDER:\n"
+      Result += "Messages Sent: " + str(self.MessageCount) + "\n"
+      Result += "Messages Failed: " + str(self.FailedCount) + "\n"
+      Result += "Fragments Sent: " + str(self.FragmentCount) + "\n"
+      Result += "Fragments Resent: " + str(self.ResentCount) + "\n"
+      Result += "Polls Sent: " + str(self.PollCount) + "\n"
+      return Result
+
+
+
+#/**************************************************************************/
+#/* Reassembles messages from the fragments received on one pipeline. Pass */
+#/* every payload to Received(), complete messages are passed to Callback. */
+#/* Status payloads for the sender are passed to StatusFunction, such as a */
+#/* function writing an acknowledge payload for the pipeline. Memory is    */
+#/* bounded, at most MaxMessages partial messages of MaxBytes in total are */
+#/* held, the least recently active is dropped to make room, and partial   */
+#/* messages are dropped after TimeoutSeconds without a fragment.          */
+#/**************************************************************************/
+class Reassembler(object):
+   def __init__(self, Callback, StatusFunction = None, MaxMessages = REASSEMBLY_MESSAGES, MaxBytes = REASSEMBLY_BYTES, TimeoutSeconds = REASSEMBLY_TIMEOUT):
+      self.Callback = Callback
+      self.StatusFunction = StatusFunction
+      self.MaxMessages = MaxMessages
+      self.MaxBytes = MaxBytes
+      self.TimeoutSeconds = TimeoutSeconds
+      # Partial messages by (Session, Message Id), least recently active first, [Count, Fragments, Bytes, Time].
+      self.Messages = collections.OrderedDict()
+      self.Bytes = 0
+      self.Completed = collections.deque(maxlen = COMPLETED_HISTORY)
+      self.MessageCount = 0
+      self.FragmentCount = 0
+      self.DuplicateCount = 0
+      self.ExpiredCount = 0
+      self.EvictedCount = 0
+
+
+   #/******************************************************************/
+   #/* Handle a received payload. Returns True when the payload was a */
+   #/* transport payload, which is not passed on as data.             */
+   #/******************************************************************/
+   def Received(self, Data):
+      Data = bytearray(Data)
+      if len(Data) >= FRAGMENT_HEADER_SIZE and Data[0] == TRANSPORT_FRAGMENT:
+         self.Expire()
+         self.AddFragment((Data[1], Data[2]), Data[3], Data[4], Data[FRAGMENT_HEADER_SIZE:])
+         Result = True
+      elif len(Data) >= 3 and Data[0] == TRANSPORT_POLL:
+         self.Expire()
+         self.SendStatus((Data[1], Data[2]))
+         Result = True
+      else:
+         Result = False
+      return Result
+
+
+   #/********************************************************************/
+   #/* Store a fragment of the message with Key, (Session, Message Id), */
+   #/* completing the message when it is the last.                      */
+   #/********************************************************************/
+   def AddFragment(self, Key, Index, Count, FragmentData):
+      if Key in self.Completed:
+         self.DuplicateCount += 1
+         return
+      Message = self.Messages.get(Key)
+      if Message is not None and Message[0] != Count:
+         # A new message reusing the id of a stale one.
+         self.Drop(Key)
+         Message = None
+      if Message is None:
+         if Index >= Count:
+            return
+         self.MakeRoom(Count * FRAGMENT_DATA_SIZE)
+         Message = [Count, [None] * Count, 0, time.time()]
+         self.Messages[Key] = Message
+      elif Index >= Count:
+         return
+      if Message[1][Index] is not None:
+         self.DuplicateCount += 1
+      else:
+         Message[1][Index] = FragmentData
+         Message[2] += len(FragmentData)
+         self.Bytes += len(FragmentData)
+         self.FragmentCount += 1
+      Message[3] = time.time()
+      # Keep the least recently active message first.
+      del self.Messages[Key]
+      self.Messages[Key] = Message
+
+      if None not in Message[1]:
+         self.Drop(Key)
+         self.Completed.append(Key)
+         self.MessageCount += 1
+         self.SendStatus(Key)
+         self.Callback(bytes(bytearray().join(Message[1])))
+      elif Index == Count - 1:
+         # The last fragment has arrived, report what is missing ready for the poll.
+         self.SendStatus(Key)
+
+
+   #/********************************************************************/
+   #/* Drop the least recently active messages until a message of Bytes */
+   #/* fits within the limits.                                          */
+   #/********************************************************************/
+   def MakeRoom(self, Bytes):
+      while len(self.Messages) > 0 and (len(self.Messages) >= self.MaxMessages or self.Bytes + Bytes > self.MaxBytes):
+         self.Drop(next(iter(self.Messages)))
+         self.EvictedCount += 1
+
+
+   #/***********************************************************/
+   #/* Drop partial messages with no fragment for the timeout. */
+   #/***********************************************************/
+   def Expire(self):
+      Now = time.time()
+      while len(self.Messages) > 0:
+         Key = next(iter(self.Messages))
+         if Now - self.Messages[Key][3] < self.TimeoutSeconds:
+            break
+         self.Drop(Key)
+         self.ExpiredCount += 1
+
+
+   #/*****************************/
+   #/* Forget a partial message. */
+   #/*****************************/
+   def Drop(self, Key):
+      Message = self.Messages.pop(Key)
+      self.Bytes -= Message[2]
+
+
+   #/***********************************************************/
+   #/* Pass the status of a message to the StatusFunction, the */
+   #/* missing fragments of a partial message from the first   */
+   #/* missing fragment on.                                    */
+   #/***********************************************************/
+   def SendStatus(self, Key):
+      if self.StatusFunction is None:
+         return
+      Message = self.Messages.get(Key)
+      if Key in self.Completed:
+         Status = bytearray([TRANSPORT_STATUS, Key[0], Key[1], STATUS_DONE, 0])
+      elif Message is None:
+         Status = bytearray([TRANSPORT_STATUS, Key[0], Key[1], STATUS_UNKNOWN, 0])
+      else:
+         Fragments = Message[1]
+         Base = Fragments.index(None)
+         Bitmap = bytearray(min(STATUS_BITMAP_FRAGMENTS, len(Fragments) - Base + 7) // 8)
+         for Index in range(Base, min(len(Fragments), Base + 8 * len(Bitmap))):
+            if Fragments[Index] is None:
+               Offset = Index - Base
+               Bitmap[Offset // 8] |= (1 << (Offset % 8))
+         Status = bytearray([TRANSPORT_STATUS, Key[0], Key[1], STATUS_MISSING, Base]) + Bitmap
+      self.StatusFunction(Status)
+
+
+   #/**********************************************/
+   #/* Convert the reassembly statistics to text. */
+   #/**********************************************/
+   def DisplayStats(self):
+      Result = "RF24 TRANSPORT RECEIVER:\n"
+      Result += "Messages Received: " + str(self.MessageCount) + "\n"
+      Result += "Fragments Received: " + str(self.FragmentCount) + "\n"
+      Result += "Duplicate Fragments: " + str(self.DuplicateCount) + "\n"
+      Result += "Partial Messages: " + str(len(self.Messages)) + " (" + str(self.Bytes) + " bytes)\n"
+      Result += "Expired Messages: " + str(self.ExpiredCount) + "\n"
+      Result += "Evicted Messages: " + str(self.EvictedCount) + "\n"
+      return Result
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+
+# RF24Transport_Benchmark - Measure RF24 Transport Message Throughput
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* RF24Transport_Benchmark - Measure RF24 Transport Message Throughput.     */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Send messages from 32 bytes to 4KB through a MessageSender and a         */
+#/* Reassembler joined by a simulated link which loses payloads at random.   */
+#/* Reports payloads sent per message, resent fragments, the processing      */
+#/* rate, and the message bytes per second the RF link can carry from the    */
+#/* Enhanced ShockBurst airtime of each payload sent.                        */
+#/*                                                                          */
+#/* Usage: RF24Transport_Benchmark.py [LOSS_PERCENT]                         */
+#/****************************************************************************/
+
+
+
+import sys
+import time
+import random
+import RF24Transport
+
+
+
+# Message sizes to measure, bytes.
+MESSAGE_SIZES = [32, 64, 128, 256, 512, 1024, 2048, 4096]
+# Messages sent for each size.
+MESSAGE_COUNT = 200
+# Payload loss rates to measure when none is given, fraction of payloads lost.
+LOSS_RATES = [0.0, 0.05, 0.20]
+
+# Enhanced ShockBurst packet overhead bits, preamble, 5 byte address, packet control field, 1 byte CRC.
+ESB_OVERHEAD_BITS = 8 + 40 + 9 + 8
+# Radio TX/RX settling time before each packet and acknowledge, seconds.
+ESB_SETTLING_TIME = 0.000130
+# Data rates to report, bits per second.
+DATA_RATES = [250000, 1000000, 2000000]
+
+
+
+#/************************************************************/
+#/* Airtime of one packet with its acknowledge, seconds, the */
+#/* acknowledge carrying AckBytes of acknowledge payload.    */
+#/************************************************************/
+def PacketAirtime(PayloadBytes, DataRate, AckBytes = 0):
+   PacketTime = float(ESB_OVERHEAD_BITS + 8 * PayloadBytes) / DataRate
+   AckTime = float(ESB_OVERHEAD_BITS + 8 * AckBytes) / DataRate
+   return 2 * ESB_SETTLING_TIME + PacketTime + AckTime
+
+
+
+#/***************************************************************************/
+#/* Simulated link, payloads are lost at random before reaching the         */
+#/* Reassembler, and a status payload is returned in the acknowledge of the */
+#/* next payload delivered, as the RF24L01 acknowledge payloads are.        */
+#/***************************************************************************/
+class LossyLink(object):
+   def __init__(self, LossRate):
+      self.LossRate = LossRate
+      self.Random = random.Random(LossRate)
+      self.Sender = None
+      self.Receiver = None
+      self.AckPayload = None
+      self.PayloadCount = 0
+      self.PayloadBytes = 0
+      self.AckBytes = 0
+
+
+   #/********************************************************/
+   #/* Deliver a list of payloads, as Transmitter.SendMany. */
+   #/********************************************************/
+   def Send(self, Payloads):
+      for Data in Payloads:
+         self.PayloadCount += 1
+         self.PayloadBytes += len(Data)
+         if self.Random.random() >= self.LossRate:
+            self.Receiver.Received(Data)
+            if self.AckPayload is not None:
+               AckPayload = self.AckPayload
+               self.AckPayload = None
+               self.AckBytes += len(AckPayload)
+               self.Sender.Status(AckPayload)
+
+
+   #/***************************************************/
+   #/* Load a status payload for the next acknowledge. */
+   #/***************************************************/
+   def Status(self, Data):
+      self.AckPayload = Data
+
+
+
+#/**************************************************/
+#/* Send messages of one size, and report results. */
+#/**************************************************/
+def Benchmark(MessageSize, LossRate):
+   Link = LossyLink(LossRate)
+   Received = []
+   Link.Receiver = RF24Transport.Reassembler(Received.append, Link.Status)
+   Link.Sender = RF24Transport.MessageSender(Link.Send)
+   # Poll at once, the simulated link has no delay.
+   RF24Transport.POLL_SECONDS = 0.0
+
+   Message = bytes(bytearray(Count % 256 for Count in range(MessageSize)))
+   StartTime = time.time()
+   for Count in range(MESSAGE_COUNT):
+      Link.Sender.Send(Message)
+      while Link.Sender.GetBacklog() > 0:
+         Link.Sender.Poll()
+   Elapsed = time.time() - StartTime
+
+   Delivered = 0
+   for Data in Received:
+      if Data == Message:
+         Delivered += 1
+   MessageBytes = MessageSize * MESSAGE_COUNT
+   AveragePayload = float(Link.PayloadBytes) / Link.PayloadCount
+   AverageAck = float(Link.AckBytes) / Link.PayloadCount
+
+   Result = "{:6d} {:5.0f}% {:5d}/{:<5d} {:9.2f} {:8.2f} {:10.0f}".format(MessageSize, 100 * LossRate, Delivered, MESSAGE_COUNT, float(Link.PayloadCount) / MESSAGE_COUNT, float(Link.Sender.ResentCount) / MESSAGE_COUNT, MESSAGE_COUNT / Elapsed)
+   for DataRate in DATA_RATES:
+      AirTime = Link.PayloadCount * PacketAirtime(AveragePayload, DataRate, AverageAck)
+      Result += " {:9.0f}".format(MessageBytes / AirTime)
+   print(Result)
+
+
+
+if len(sys.argv) > 1:
+   LossRates = [float(sys.argv[1]) / 100]
+else:
+   LossRates = LOSS_RATES
+
+print("{:d} messages of each size, link bytes/sec from payload airtime.\n".format(MESSAGE_COUNT))
+Header = "{:>6s} {:>6s} {:>11s} {:>9s} {:>8s} {:>10s}".format("BYTES", "LOSS", "DELIVERED", "PAYLOADS", "RESENT", "MSGS/SEC")
+for DataRate in DATA_RATES:
+   Header += " {:>9s}".format("@{:d}kbps".format(DataRate // 1000))
+print(Header)
+for LossRate in LossRates:
+   for MessageSize in MESSAGE_SIZES:
+      Benchmark(MessageSize, LossRate)
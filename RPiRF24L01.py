@@ -21,12 +21,23 @@
 #/* ------------------------------------------------------------------------ */
 #/* Library for RPiRF24L01 module communication on the Raspberry Pi using    */
 #/* Python.                                                                  */
+#/*                                                                          */
+#/* Each RF24L01 instance drives one device, several may run at once on      */
+#/* their own pins. The module level functions drive DefaultRadio.           */
 #/****************************************************************************/
 
 
 
 import time
-import RPi.GPIO
+import array
+import random
+import threading
+import collections
+# RPi.GPIO is only available on a Raspberry Pi, elsewhere GPIO is simulated.
+try:
+   import RPi.GPIO
+except ImportError:
+   import SimGPIO as RPi
 import RPiSPI
 
 
@@ -38,6 +49,83 @@ BASE_ADDRESS = [0x1C, 0x93, 0xB5, 0xFE, 0xD2]
 # Define GPIO pin allocation.
 GPIO_RF24L01_CSN = 25
 GPIO_RF24L01_INT = 24
+# RF24L01 CE is connected to the SPI CE0 pin, driven as a GPIO output.
+GPIO_RF24L01_CE = RPiSPI.GPIO_SPI_CE
+
+# Number of payloads the RF24L01 TX FIFO holds.
+RF24L01_TX_FIFO_SIZE = 3
+# Number of RF24L01 receive pipelines.
+RF24L01_PIPE_COUNT = 6
+# Default number of payloads held for each receive pipeline.
+RX_PIPE_QUEUE_SIZE = 64
+# Default number of payloads drained from the RX FIFO waiting to be dispatched to the pipelines.
+RX_INCOMING_QUEUE_SIZE = 256
+# Receive pipeline width for dynamic payload length.
+RX_PIPE_DYNAMIC = 0
+# Modulo of the payload sequence numbers counted by a PipeReceiver.
+SEQUENCE_MODULO = 65536
+# Sequence numbers behind the highest received which are checked for repeats.
+SEQUENCE_WINDOW = 256
+# Largest step back to a repeated or late sequence number, further back the transmitter has
+# restarted. Must cover the largest batch of fixes a transmitter sends again.
+SEQUENCE_REORDER = 64
+# Default number of payloads waiting to be loaded into the TX FIFO.
+TX_QUEUE_SIZE = 64
+# Times a payload reaching MAX_RT is sent again before it is counted failed.
+TX_RETRY_COUNT = 1
+# Number of per packet transmit outcomes remembered.
+TX_OUTCOME_HISTORY = 64
+# Number of received acknowledge payloads remembered.
+TX_ACK_PAYLOAD_HISTORY = 16
+
+# Number of RF channels, 2400MHz to 2525MHz in 1MHz steps.
+RF24L01_CHANNEL_COUNT = 126
+# Time from power down to standby.
+RF24L01_POWER_UP_SECONDS = 0.0015
+# Carrier detect samples taken on each channel in a spectrum sweep.
+SWEEP_SAMPLES = 16
+# Time in RX mode before each carrier detect sample, 130uS RX settling plus
+# the 128uS carrier detect needs to see a signal.
+SWEEP_DWELL_SECONDS = 0.000260
+# Characters for the occupancy of a channel in a displayed sweep, empty to full.
+SWEEP_DISPLAY_LEVELS = ".123456789"
+
+# Default channel hopping channels, 8MHz apart so 2Mbps channels do not overlap.
+HOP_CHANNELS = list(range(2, RF24L01_CHANNEL_COUNT, 8))
+# Time spent on each channel when hopping.
+HOP_SECONDS = 1.0
+# No new packets are loaded this close to the end of a hop.
+HOP_GUARD_SECONDS = 0.05
+# Packets sent on a channel before it can be blacklisted.
+HOP_BLACKLIST_MIN_PACKETS = 8
+# Blacklist a channel losing more than this fraction of packets.
+HOP_BLACKLIST_LOSS = 0.25
+# Blacklist a channel averaging more retransmits than this per delivered packet.
+HOP_BLACKLIST_RETRIES = 4.0
+# Time a channel stays blacklisted.
+HOP_BLACKLIST_SECONDS = 60.0
+# Number of hop decisions remembered.
+HOP_HISTORY = 64
+
+# Packets in each link adaptation decision.
+LINK_WINDOW_PACKETS = 16
+# Delivery ratio the link adaptation aims for.
+LINK_TARGET_RATIO = 0.95
+# Move to a faster setting after this many windows meeting the target with
+# fewer retransmits per packet than LINK_STEP_UP_RETRIES.
+LINK_STEP_UP_WINDOWS = 2
+LINK_STEP_UP_RETRIES = 1.0
+# Below this delivery ratio the receiver may be on another data rate, fall
+# back to the most robust setting, which the receiver also falls back to.
+LINK_FALLBACK_RATIO = 0.25
+# Receiver falls back to the most robust setting after this long without packets.
+LINK_FALLBACK_SECONDS = 15.0
+# Pause after a data rate change, for the receiver to change too.
+LINK_SWITCH_SECONDS = 0.02
+# First byte of link control payloads, never the first byte of a GpsPacket.
+LINK_CONTROL_MARKER = 0xF0
+# Number of link decisions remembered.
+LINK_HISTORY = 64
 
 
 #/************************/
@@ -59,6 +147,18 @@ RF24L01_FLUSH_RX = 0xE2
 RF24L01_REUSE_TX_PL = 0xE3
 # No Operation, get the device status.
 RF24L01_NOP = 0xFF
+# Read RX payload width for the top R_RX_PAYLOAD in the RX FIFO. Flush RX FIFO if the read value is larger than 32 bytes.
+RF24L01_R_RX_PL_WID = 0x60
+# Used in RX mode. OR 3 bit pipe number. Write payload to be transmitted together with ACK packet on the pipe. Maximum three ACK packet payloads can be pending.
+RF24L01_W_ACK_PAYLOAD = 0xA8
+# Used in TX mode. Disables AUTOACK on this specific packet.
+RF24L01_W_TX_PAYLOAD_NOACK = 0xB0
+# nRF24L01 (non +) only. Followed by the data 0x73, activates the R_RX_PL_WID, W_ACK_PAYLOAD and W_TX_PAYLOAD_NOACK commands and the FEATURE register.
+RF24L01_ACTIVATE = 0x50
+RF24L01_ACTIVATE_DATA = 0x73
+
+# Maximum payload size in bytes.
+RF24L01_MAX_PAYLOAD = 32
 
 
 #/*********************/
@@ -93,11 +193,15 @@ RF24L01_RF_SETUP = 0x06
 # Data Rate '0' - 1 Mbps, '1' - 2 Mbps.
 RF24L01_RF_SETUP_1MBPS = 0x00
 RF24L01_RF_SETUP_2MBPS = 0x08
+# nRF24L01+ only. RF_DR_LOW, 250 kbps, takes priority over the 2 Mbps bit.
+RF24L01_RF_SETUP_250KBPS = 0x20
+RF24L01_RF_SETUP_DATA_RATE = (RF24L01_RF_SETUP_250KBPS | RF24L01_RF_SETUP_2MBPS)
 # Set RF output power in TX mode. '00' - -18 dBm, '01' - -12 dBm, ,'10' - -6 dBm, '11' - 0 dBm.
 RF24L01_RF_SETUP_18DBM = 0x00
 RF24L01_RF_SETUP_12DBM = 0x02
 RF24L01_RF_SETUP_10DBM = 0x04
 RF24L01_RF_SETUP_0DBM = 0x06
+RF24L01_RF_SETUP_PA = 0x06
 # Setup LNA gain.
 RF24L01_RF_SETUP_LNA_GAIN = 0x01
 
@@ -115,6 +219,10 @@ RF24L01_STATUS_TX_DS = 0x20
 RF24L01_STATUS_MAX_RT = 0x10
 # Data pipe number for the payload.
 RF24L01_STATUS_RX_P_NO = 0x0E
+# RX_P_NO value when the RX FIFO is empty.
+RF24L01_STATUS_RX_P_NO_EMPTY = 0x07
+# All interupt flags.
+RF24L01_STATUS_IRQ = (RF24L01_STATUS_RX_DR | RF24L01_STATUS_TX_DS | RF24L01_STATUS_MAX_RT)
 # TX FIFO full flag. 1: TX FIFO full. 0: Available locations in TX FIFO.
 RF24L01_STATUS_TX_FULL = 0x01
 
@@ -170,254 +278,1936 @@ RF24L01_FIFO_STATUS_RX_FULL = 0x02
 # RX FIFO empty flag. 1: RX FIFO empty. 0: Data in RX FIFO.
 RF24L01_FIFO_STATUS_RX_EMPTY = 0x01
 
+# Enable dynamic payload length, one bit per data pipe. Requires EN_DPL and auto acknowledgment on the pipe.
+RF24L01_DYNPD = 0x1C
+RF24L01_DYNPD_ALL = 0x3F
+
+RF24L01_FEATURE = 0x1D
+# Enables Dynamic Payload Length.
+RF24L01_FEATURE_EN_DPL = 0x04
+# Enables Payload with ACK.
+RF24L01_FEATURE_EN_ACK_PAY = 0x02
+# Enables the W_TX_PAYLOAD_NOACK command.
+RF24L01_FEATURE_EN_DYN_ACK = 0x01
+
+
+# Registers only changed by writing to them, which are held in the register
+# cache. STATUS, OBSERVE_TX, CD and FIFO_STATUS are changed by the device so
+# are always read from the device.
+RF24L01_CACHED_REGISTERS = [
+   RF24L01_CONFIG, RF24L01_EN_AA, RF24L01_EN_RXADDR, RF24L01_SETUP_AW, RF24L01_SETUP_RETR,
+   RF24L01_RF_CH, RF24L01_RF_SETUP,
+   RF24L01_RX_ADDR_P0, RF24L01_RX_ADDR_P1, RF24L01_RX_ADDR_P2, RF24L01_RX_ADDR_P3,
+   RF24L01_RX_ADDR_P4, RF24L01_RX_ADDR_P5, RF24L01_TX_ADDR,
+   RF24L01_RX_PW_P0, RF24L01_RX_PW_P1, RF24L01_RX_PW_P2, RF24L01_RX_PW_P3,
+   RF24L01_RX_PW_P4, RF24L01_RX_PW_P5, RF24L01_DYNPD, RF24L01_FEATURE
+]
+
+# Registers read into a RegisterSnapshot.
+RF24L01_SNAPSHOT_REGISTERS = list(range(RF24L01_FIFO_STATUS + 1)) + [RF24L01_DYNPD, RF24L01_FEATURE]
+
+# Names of the RF_SETUP data rate and PA level settings.
+DATA_RATE_NAMES = {
+   RF24L01_RF_SETUP_250KBPS : "250Kbps",
+   RF24L01_RF_SETUP_1MBPS : "1Mbps",
+   RF24L01_RF_SETUP_2MBPS : "2Mbps"
+}
+PA_LEVEL_NAMES = {
+   RF24L01_RF_SETUP_18DBM : "-18dBm",
+   RF24L01_RF_SETUP_12DBM : "-12dBm",
+   RF24L01_RF_SETUP_10DBM : "-6dBm",
+   RF24L01_RF_SETUP_0DBM : "0dBm"
+}
+
+# Link adaptation settings, fastest first and most robust last,
+# [Data Rate, PA Level, Auto Retransmit Delay uS, Auto Retransmit Count].
+# Longer delays leave time for acknowledge payloads at lower data rates.
+LINK_LEVELS = [
+   [RF24L01_RF_SETUP_2MBPS, RF24L01_RF_SETUP_12DBM, 250, 3],
+   [RF24L01_RF_SETUP_2MBPS, RF24L01_RF_SETUP_0DBM, 500, 5],
+   [RF24L01_RF_SETUP_1MBPS, RF24L01_RF_SETUP_0DBM, 750, 10],
+   [RF24L01_RF_SETUP_250KBPS, RF24L01_RF_SETUP_0DBM, 1500, 15]
+]
+# Shortest auto retransmit delay at each data rate leaving time for acknowledge payloads,
+# used when link adaptation is pinned to one data rate.
+LINK_MIN_ARD = {
+   RF24L01_RF_SETUP_2MBPS : 250,
+   RF24L01_RF_SETUP_1MBPS : 500,
+   RF24L01_RF_SETUP_250KBPS : 1500
+}
+
+# Byte count of each cached register.
+RF24L01_REGISTER_SIZE = {
+   RF24L01_RX_ADDR_P0 : 5,
+   RF24L01_RX_ADDR_P1 : 5,
+   RF24L01_TX_ADDR : 5
+}
+
+
+
+#/********************************************************************/
+#/* Convert a data packet, a string or a sequence of byte values, to */
+#/* the list of data words sent to the RF24L01. Data larger than a   */
+#/* payload must be split, see RF24Transport.                        */
+#/********************************************************************/
+def PayloadToWords(Data):
+   if isinstance(Data, str):
+      Words = [ord(Char) for Char in Data]
+   else:
+      Words = list(bytearray(Data))
+   if len(Words) > RF24L01_MAX_PAYLOAD:
+      raise ValueError("Payload of {:d} bytes exceeds {:d} bytes.".format(len(Words), RF24L01_MAX_PAYLOAD))
+   return Words
 
 
-#/****************************/
-#/* Initialise RF24L01 GPIO. */
-#/****************************/
-def Init():
-   RPiSPI.SpiInit()
-   RPi.GPIO.setup(GPIO_RF24L01_INT, RPi.GPIO.IN, pull_up_down=RPi.GPIO.PUD_UP)
-   RPi.GPIO.setup(GPIO_RF24L01_CSN, RPi.GPIO.OUT, initial=0)
 
+#/***************************************************************/
+#/* Return the SETUP_RETR value for an auto retransmit delay in */
+#/* uS, 250uS to 4000uS in 250uS steps, and retransmit count.   */
+#/***************************************************************/
+def RetransmitSetup(DelayUs, Count):
+   Delay = min(15, max(0, (DelayUs + 249) // 250 - 1))
+   return (Delay << 4) | (min(15, Count) & RF24L01_SETUP_RETR_ARC)
 
 
-#/********************************************/
-#/* Send a single SPI command to the RF24L01 */
-#/* device and receive the response.         */
-#/********************************************/
-def SendCommand(Command):
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 0)
-   Response = []
-   for ThisWord in Command:
-      Response.append(RPiSPI.SpiSendReceiveWord(ThisWord))
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 1)
-   return Response
+
+#/****************************************************************************/
+#/* One RF24L01 device, its pins, SPI bus, register cache and statistics.    */
+#/* Several devices may be driven at once on their own CSN, CE and IRQ pins, */
+#/* sharing an RPiSPI.SpiBus or each on its own. The module level functions  */
+#/* drive DefaultRadio, on the GPIO pins defined above.                      */
+#/****************************************************************************/
+class RF24L01(object):
+   def __init__(self, Csn = GPIO_RF24L01_CSN, Ce = GPIO_RF24L01_CE, Irq = GPIO_RF24L01_INT, Bus = None, BaseAddress = BASE_ADDRESS):
+      if Bus is None:
+         Bus = RPiSPI.DefaultBus
+      self.Csn = Csn
+      self.Ce = Ce
+      self.Irq = Irq
+      self.Bus = Bus
+      self.BaseAddress = list(BaseAddress)
+      # Last STATUS value clocked out of the device, the RF24L01 returns STATUS as
+      # the first byte of every SPI command.
+      self.LastStatus = 0
+      # Shadow of the device register values, indexed by register address.
+      self.RegisterCache = {}
+      # Register accesses served from the cache and sent to the device.
+      self.RegisterCacheHits = 0
+      self.RegisterCacheMisses = 0
+
+
+   #/****************************************************************/
+   #/* STATUS register clocked out by the last SPI command, without */
+   #/* a new transaction, GetStatus(True) reads it from the device. */
+   #/****************************************************************/
+   @property
+   def Status(self):
+      return self.LastStatus
+
+
+   #/*****************************************************************/
+   #/* Initialise RF24L01 GPIO. The SPI backend defaults to hardware */
+   #/* SPI when available, otherwise bit banged GPIO. Pass None for  */
+   #/* a bus already initialised for another device on it.           */
+   #/*****************************************************************/
+   def Init(self, SpiBackend = RPiSPI.SPI_BACKEND_AUTO):
+      if SpiBackend is not None:
+         self.Bus.Init(SpiBackend)
+      self.InvalidateRegisterCache()
+      RPi.GPIO.setup(self.Irq, RPi.GPIO.IN, pull_up_down=RPi.GPIO.PUD_UP)
+      RPi.GPIO.setup(self.Csn, RPi.GPIO.OUT, initial=1)
+      # The bus sets up its own hardware chip select pin.
+      if self.Ce != self.Bus.Ce:
+         RPi.GPIO.setup(self.Ce, RPi.GPIO.OUT, initial=1)
+
+
+   #/********************************************/
+   #/* Send a single SPI command to the RF24L01 */
+   #/* device and receive the response.         */
+   #/********************************************/
+   def SendCommand(self, Command):
+
+      # The interrupt callback and the main loop may both send commands.
+      with self.Bus.Lock:
+         RPi.GPIO.output(self.Csn, 0)
+         # The whole command is clocked out as a single SPI transaction.
+         Response = self.Bus.Transfer(Command)
+         RPi.GPIO.output(self.Csn, 1)
+         self.LastStatus = Response[0]
+      return Response
+
+
+   #/******************************************************************/
+   #/* Send several SPI commands as one sequence, the bus is held for */
+   #/* them all so no other command comes between them. Returns the   */
+   #/* response of each command.                                      */
+   #/******************************************************************/
+   def SendCommands(self, Commands):
+      Responses = []
+      with self.Bus.Lock:
+         # Local references avoid lookups per command.
+         Output = RPi.GPIO.output
+         Transfer = self.Bus.Transfer
+         Csn = self.Csn
+         for Command in Commands:
+            Output(Csn, 0)
+            Responses.append(Transfer(Command))
+            Output(Csn, 1)
+         if len(Responses) > 0:
+            self.LastStatus = Responses[-1][0]
+      return Responses
+
+
+   #/********************************************************************/
+   #/* Return the RF24L01 STATUS register. The value clocked out by the */
+   #/* last SPI command is returned unless a refresh is requested, when */
+   #/* a single byte NOP command is sent to read it.                    */
+   #/********************************************************************/
+   def GetStatus(self, Refresh = False):
+      if Refresh:
+         self.SendCommand([RF24L01_NOP])
+      return self.LastStatus
+
+
+   #/***************************************************************************/
+   #/* Read the specified number of bytes from the specified RF24L01 register. */
+   #/* Registers in the register cache are not read from the device, unless    */
+   #/* UseCache is False, when the cache is updated with the device value.     */
+   #/***************************************************************************/
+   def ReadRegister(self, RegisterAddress, DataWordCount, UseCache = True):
+
+      CachedData = self.RegisterCache.get(RegisterAddress)
+      if UseCache and CachedData is not None and len(CachedData) >= DataWordCount:
+         self.RegisterCacheHits += 1
+         Response = [self.LastStatus] + CachedData[:DataWordCount]
+      else:
+         Command = [(RF24L01_R_REGISTER | RegisterAddress)]
+         for Count in range(DataWordCount):
+            Command.append(0x00)
+         Response = self.SendCommand(Command)
+         if RegisterAddress in RF24L01_CACHED_REGISTERS:
+            self.RegisterCacheMisses += 1
+            self.RegisterCache[RegisterAddress] = Response[1:]
+      return Response
+
+
+   #/*********************************************************************/
+   #/* Write the specified data array to the specified RF24L01 register. */
+   #/* Writes of the value already in the register cache are skipped.    */
+   #/*********************************************************************/
+   def WriteRegister(self, RegisterAddress, WriteData):
+
+      WriteData = list(WriteData)
+      if self.RegisterCache.get(RegisterAddress) == WriteData:
+         self.RegisterCacheHits += 1
+         Response = [self.LastStatus]
+      else:
+         Command = [(RF24L01_W_REGISTER | RegisterAddress)]
+         for Data in WriteData:
+            Command.append(Data)
+         Response = self.SendCommand(Command)
+         if RegisterAddress in RF24L01_CACHED_REGISTERS:
+            self.RegisterCacheMisses += 1
+            self.RegisterCache[RegisterAddress] = WriteData
+      return Response
+
+
+   #/**************************************************************************/
+   #/* Forget all cached register values, the next access of each register    */
+   #/* goes to the device. Call after the device has lost power or been reset */
+   #/* other than by this driver.                                             */
+   #/**************************************************************************/
+   def InvalidateRegisterCache(self):
+      self.RegisterCache.clear()
+
+
+   #/************************************************************/
+   #/* Reload the register cache with the values on the device. */
+   #/************************************************************/
+   def ResyncRegisterCache(self):
+      self.InvalidateRegisterCache()
+      for RegisterAddress in RF24L01_CACHED_REGISTERS:
+         self.ReadRegister(RegisterAddress, RF24L01_REGISTER_SIZE.get(RegisterAddress, 1))
+
+
+   #/**************************************************************/
+   #/* Return the register cache hit and miss counts, a hit is an */
+   #/* SPI transaction which was not needed.                      */
+   #/**************************************************************/
+   def GetRegisterCacheStats(self):
+      return [self.RegisterCacheHits, self.RegisterCacheMisses]
+
+
+   #/*************************************************/
+   #/* Reset the register cache hit and miss counts. */
+   #/*************************************************/
+   def ResetRegisterCacheStats(self):
+
+      self.RegisterCacheHits = 0
+      self.RegisterCacheMisses = 0
+
+
+   #/************************/
+   #/* Flush the TX buffer. */
+   #/************************/
+   def FlushTxBuffer(self):
+      # Flush old transmit data.
+      Command = [RF24L01_FLUSH_TX]
+      Response = self.SendCommand(Command)   
+
+
+   #/************************/
+   #/* Flush the RX buffer. */
+   #/************************/
+   def FlushRxBuffer(self):
+      # Flush old received data.
+      Command = [RF24L01_FLUSH_RX]
+      Response = self.SendCommand(Command)   
+
+
+   #/*******************************************/
+   #/* Standard initial general configuration. */
+   #/*******************************************/
+   def Configure(self):
+      # Configure local transmit address.
+      Response = self.WriteRegister(RF24L01_TX_ADDR, [self.BaseAddress[0], self.BaseAddress[1], self.BaseAddress[2], self.BaseAddress[3], self.BaseAddress[4]])
+      # Configure local receive base address.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P0, [self.BaseAddress[0], self.BaseAddress[1], self.BaseAddress[2], self.BaseAddress[3], self.BaseAddress[4]])
+
+      # Configure local receive address 1.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P1, [self.BaseAddress[0] + 1, self.BaseAddress[1], self.BaseAddress[2], self.BaseAddress[3], self.BaseAddress[4]])
+      # Configure local receive address 2.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P2, [self.BaseAddress[0] + 2])
+      # Configure local receive address 3.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P3, [self.BaseAddress[0] + 3])
+      # Configure local receive address 4.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P4, [self.BaseAddress[0] + 4])
+      # Configure local receive address 5.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P5, [self.BaseAddress[0] + 5])
+      # Configure 1Mb/s and 0 DBm.
+      Response = self.WriteRegister(RF24L01_RF_SETUP, [(RF24L01_RF_SETUP_1MBPS | RF24L01_RF_SETUP_0DBM | RF24L01_RF_SETUP_LNA_GAIN)])
+      # Power off module radio.
+      Response = self.WriteRegister(RF24L01_CONFIG, [RF24L01_CONFIG_EN_CRC])
+
+
+   #/**************************************/
+   #/* Configure the current mode for TX. */
+   #/**************************************/
+   def ConfigureTx(self, Channel):
+      # Set RF channel, resets bad packet counts back to zero when the channel changes.
+      Response = self.WriteRegister(RF24L01_RF_CH, [Channel])
+      # Power on module radio for transmitting.
+      Response = self.WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PTX)])
+
+
+   #/**************************************/
+   #/* Configure the current mode for RX. */
+   #/**************************************/
+   def ConfigureRx(self, Channel, Pipeline, ByteCount):
+      # Set RF channel, resets bad packet counts back to zero when the channel changes.
+      Response = self.WriteRegister(RF24L01_RF_CH, [Channel])
+      # Set byte count being received, must be exact size of data arriving.
+      Response = self.WriteRegister(RF24L01_RX_PW_P0 + Pipeline, [ByteCount])
+      # Power on module radio for receiving.
+      Response = self.WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PRX)])
+      Response = self.WriteRegister(RF24L01_EN_RXADDR, [(1 | (1 << Pipeline))])
+      RPi.GPIO.output(self.Csn, 1)
+
+
+   #/******************************************************************/
+   #/* Configure for receiving on several pipelines. PipeWidths holds */
+   #/* the payload width of each pipeline 0 - 5, RX_PIPE_DYNAMIC for  */
+   #/* dynamic payload length, or None to disable the pipeline.       */
+   #/******************************************************************/
+   def ConfigureRxPipes(self, Channel, PipeWidths):
+      # Set RF channel, resets bad packet counts back to zero when the channel changes.
+      Response = self.WriteRegister(RF24L01_RF_CH, [Channel])
+      EnabledPipes = 0
+      DynamicPipes = 0
+      for Pipeline in range(len(PipeWidths)):
+         if PipeWidths[Pipeline] is not None:
+            EnabledPipes |= (1 << Pipeline)
+            if PipeWidths[Pipeline] == RX_PIPE_DYNAMIC:
+               DynamicPipes |= (1 << Pipeline)
+            else:
+               Response = self.WriteRegister(RF24L01_RX_PW_P0 + Pipeline, [PipeWidths[Pipeline]])
+      if DynamicPipes != 0 and (self.ReadRegister(RF24L01_FEATURE, 1)[1] & RF24L01_FEATURE_EN_DPL) == 0:
+         self.EnableDynamicPayloads(DynamicPipes)
+      else:
+         # Dynamic payload length requires auto acknowledge on the pipe.
+         AutoAckEnabled = self.ReadRegister(RF24L01_EN_AA, 1)[1]
+         Response = self.WriteRegister(RF24L01_EN_AA, [(AutoAckEnabled | DynamicPipes)])
+         Response = self.WriteRegister(RF24L01_DYNPD, [DynamicPipes])
+      # Power on module radio for receiving.
+      Response = self.WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PRX)])
+      Response = self.WriteRegister(RF24L01_EN_RXADDR, [EnabledPipes])
+      self.ChipEnable(1)
+
+
+   #/***************************************************/
+   #/* Configure the current mode for off (low power). */
+   #/***************************************************/
+   def ConfigureOff(self):
+      # Power off module radio.
+      Response = self.WriteRegister(RF24L01_CONFIG, [RF24L01_CONFIG_EN_CRC])
+      self.ChipEnable(0)
+
+
+   #/*************************************************************************/
+   #/* Clear the TX and RX buffers of the RF24L01 and reset interupt status. */
+   #/*************************************************************************/
+   def Reset(self):
+      # Flush old transmit data.
+      self.FlushTxBuffer()
+      # Flush old received data.
+      self.FlushRxBuffer()
+      # Reset max retries flag, TX data sent flag, RX data ready flag.
+      Response = self.WriteRegister(RF24L01_STATUS, [RF24L01_STATUS_MAX_RT | RF24L01_STATUS_TX_DS | RF24L01_STATUS_RX_DR])
+
+
+   #/*************************************************************/
+   #/* Return interupt flags, and reset ready for next interupt. */
+   #/*************************************************************/
+   def GetIntFlags(self):
+      IntFlags = self.GetStatus(True)
+      if IntFlags & RF24L01_STATUS_IRQ:
+         # Reset all pending max retries, TX data sent and RX data ready flags in one write.
+         Response = self.WriteRegister(RF24L01_STATUS, [(IntFlags & RF24L01_STATUS_IRQ)])
+
+      return IntFlags
+
+
+   #/**************************************************************************/
+   #/* Enable dynamic payload length on the pipes in the mask, and optionally */
+   #/* payloads in the automatic acknowledge packets. Both ends of a link     */
+   #/* must enable dynamic payload length. The nRF24L01 (non +) ignores       */
+   #/* FEATURE writes until activated, so ACTIVATE is sent when the FEATURE   */
+   #/* value read back does not match.                                        */
+   #/**************************************************************************/
+   def EnableDynamicPayloads(self, PipeMask = RF24L01_DYNPD_ALL, AckPayload = False):
+      Feature = RF24L01_FEATURE_EN_DPL | RF24L01_FEATURE_EN_DYN_ACK
+      if AckPayload:
+         Feature |= RF24L01_FEATURE_EN_ACK_PAY
+      Response = self.WriteRegister(RF24L01_FEATURE, [Feature])
+      self.RegisterCache.pop(RF24L01_FEATURE, None)
+      if self.ReadRegister(RF24L01_FEATURE, 1)[1] != Feature:
+         Response = self.SendCommand([RF24L01_ACTIVATE, RF24L01_ACTIVATE_DATA])
+         self.RegisterCache.pop(RF24L01_FEATURE, None)
+         Response = self.WriteRegister(RF24L01_FEATURE, [Feature])
+      # Dynamic payload length requires auto acknowledge on the pipe.
+      AutoAckEnabled = self.ReadRegister(RF24L01_EN_AA, 1)[1]
+      Response = self.WriteRegister(RF24L01_EN_AA, [(AutoAckEnabled | PipeMask)])
+      Response = self.WriteRegister(RF24L01_DYNPD, [PipeMask])
+
+
+   #/******************************************************************/
+   #/* Return to static payload widths set by the RX_PW_Px registers. */
+   #/******************************************************************/
+   def DisableDynamicPayloads(self):
+      Response = self.WriteRegister(RF24L01_DYNPD, [0x00])
+      Response = self.WriteRegister(RF24L01_FEATURE, [0x00])
+
+
+   #/**********************************************************************/
+   #/* Return the width of the payload at the head of the RX FIFO when    */
+   #/* using dynamic payload length. An invalid width over 32 bytes means */
+   #/* a corrupt payload, the RX FIFO is flushed and 0 returned.          */
+   #/**********************************************************************/
+   def GetPayloadWidth(self):
+      RxBytes = self.SendCommand([RF24L01_R_RX_PL_WID, 0x00])[1]
+      if RxBytes > RF24L01_MAX_PAYLOAD:
+         self.FlushRxBuffer()
+         RxBytes = 0
+      return RxBytes
+
+
+   #/*******************************************************************/
+   #/* Load a payload to be returned in the next automatic acknowledge */
+   #/* packet sent on the pipeline. Up to three may be pending.        */
+   #/*******************************************************************/
+   def WriteAckPayload(self, Pipeline, Data):
+      Command = [(RF24L01_W_ACK_PAYLOAD | Pipeline)] + PayloadToWords(Data)
+      Response = self.SendCommand(Command)
+
+
+   #/*********************************************************************/
+   #/* Set the RF channel and the transmit address for the pipeline. The */
+   #/* pipe 0 receive address matches to receive automatic acknowledges. */
+   #/*********************************************************************/
+   def ConfigureTxAddress(self, Channel, Pipeline):
+      # Configure local transmit address.
+      Response = self.WriteRegister(RF24L01_TX_ADDR, [self.BaseAddress[0] + Pipeline, self.BaseAddress[1], self.BaseAddress[2], self.BaseAddress[3], self.BaseAddress[4]])
+      # Configure local receive base address.
+      Response = self.WriteRegister(RF24L01_RX_ADDR_P0, [self.BaseAddress[0] + Pipeline, self.BaseAddress[1], self.BaseAddress[2], self.BaseAddress[3], self.BaseAddress[4]])
+
+      # Set RF channel, resets bad packet counts back to zero when the channel changes.
+      Response = self.WriteRegister(RF24L01_RF_CH, [Channel])
+
+
+   #/****************************************/
+   #/* Set the level of the RF24L01 CE pin. */
+   #/****************************************/
+   def ChipEnable(self, Level):
+      RPi.GPIO.output(self.Ce, Level)
+
+
+   #/***************************************************************************/
+   #/* Send the specified data packet on the RF channel and pipeline provided. */
+   #/***************************************************************************/
+   def SendData(self, Channel, Pipeline, Data):
+      self.ConfigureTxAddress(Channel, Pipeline)
+
+      # Flush old transmit data.
+      self.FlushTxBuffer()
+
+      # Configure to transmit.
+      Response = self.WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PTX)])
+
+      # Load data to be transmitted.
+      Command = [RF24L01_W_TX_PAYLOAD] + PayloadToWords(Data)
+      Response = self.SendCommand(Command)   
+
+      # Start transmit, CE high sends the loaded payload.
+      self.ChipEnable(1)
+
+
+   #/**************************************/
+   #/* Retreive the received data packet. */
+   #/**************************************/
+   def GetData(self):
+      RxData = []
+      # Get the RX pipeline number.
+      RxPipeline = (self.GetStatus(True) & RF24L01_STATUS_RX_P_NO) >> 1
+      if RxPipeline < 7:
+         # Get the RX buffer data size.
+         RxBytes = self.ReadRegister(RF24L01_RX_PW_P0 + RxPipeline, 1)[1]
+         # Read the RX data.
+         Command = [0] * (RxBytes + 1)
+         Command[0] = RF24L01_R_RX_PAYLOAD
+         RxData = self.SendCommand(Command)
+      # Flush old received data.
+      self.FlushRxBuffer()
+      return RxData[1:]
+
+
+   #/**********************************************************************/
+   #/* Retreive every data packet waiting in the RX FIFO, as a list of    */
+   #/* [Pipeline, Data] in the order received. The RX FIFO is read until  */
+   #/* empty rather than flushed, and the device is left in receive mode. */
+   #/**********************************************************************/
+   def GetPackets(self):
+      Packets = []
+      DynamicPipes = self.ReadRegister(RF24L01_DYNPD, 1)[1]
+      # STATUS holds the pipeline number of the payload at the head of the RX FIFO,
+      # or RX_P_NO_EMPTY when there are no more payloads.
+      RxPipeline = (self.GetStatus(True) & RF24L01_STATUS_RX_P_NO) >> 1
+      while RxPipeline <= 5:
+         # Get the RX buffer data size.
+         if DynamicPipes & (1 << RxPipeline):
+            RxBytes = self.GetPayloadWidth()
+         else:
+            RxBytes = self.ReadRegister(RF24L01_RX_PW_P0 + RxPipeline, 1)[1]
+         if RxBytes > 0:
+            # Read the RX data.
+            Command = [0] * (RxBytes + 1)
+            Command[0] = RF24L01_R_RX_PAYLOAD
+            RxData = self.SendCommand(Command)
+            Packets.append([RxPipeline, RxData[1:]])
+         else:
+            # No valid payload size, discard to avoid reading the same entry forever.
+            self.FlushRxBuffer()
+         RxPipeline = (self.GetStatus(True) & RF24L01_STATUS_RX_P_NO) >> 1
+      return Packets
+
+
+   #/***************************************************************************/
+   #/* Survey the RF channels with the carrier detect register, CD on the      */
+   #/* RF24L01 or RPD on the RF24L01+. Each channel is sampled the specified   */
+   #/* number of times, entering RX mode for DwellSeconds before each sample.  */
+   #/* Returns an array of the samples with a carrier, indexed by channel.     */
+   #/* Commands are built once and sent directly, without the register cache,  */
+   #/* so each sample is a single two byte SPI transaction. The RF channel and */
+   #/* configuration are restored afterwards, resetting the lost packet count. */
+   #/* Only sweep while the link is idle, packets may be received during it.   */
+   #/***************************************************************************/
+   def SpectrumSweep(self, Samples = SWEEP_SAMPLES, DwellSeconds = SWEEP_DWELL_SECONDS, Channels = None):
+      if Channels is None:
+         Channels = range(RF24L01_CHANNEL_COUNT)
+      Occupancy = array.array("H", [0] * RF24L01_CHANNEL_COUNT)
+      ReadCarrier = [RF24L01_R_REGISTER | RF24L01_CD, RF24L01_NOP]
+      WriteChannel = RF24L01_W_REGISTER | RF24L01_RF_CH
+      WriteConfig = RF24L01_W_REGISTER | RF24L01_CONFIG
+
+      # The register cache keeps the configuration to restore.
+      Config = self.ReadRegister(RF24L01_CONFIG, 1)[1]
+      Channel = self.ReadRegister(RF24L01_RF_CH, 1)[1]
+      self.ChipEnable(0)
+      self.SendCommand([WriteConfig, (RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PRX)])
+      if not Config & RF24L01_CONFIG_PWR_UP:
+         RPiSPI.SpiBusyWait(RF24L01_POWER_UP_SECONDS)
+
+      # Local references avoid attribute lookups per sample.
+      Send = self.SendCommand
+      Wait = RPiSPI.SpiBusyWait
+      Enable = self.ChipEnable
+      SampleRange = range(Samples)
+      for ThisChannel in Channels:
+         Send([WriteChannel, ThisChannel])
+         Count = 0
+         for Sample in SampleRange:
+            # Leaving RX mode between samples re-arms the latched RPD bit.
+            Enable(1)
+            Wait(DwellSeconds)
+            Count += Send(ReadCarrier)[1] & 1
+            Enable(0)
+         Occupancy[ThisChannel] = Count
+
+      self.SendCommand([WriteChannel, Channel])
+      self.SendCommand([WriteConfig, Config])
+      self.ChipEnable(1)
+      return Occupancy
+
+
+
+# The device driven by the module level functions.
+DefaultRadio = RF24L01()
+
+# Module level interface to the default device, for applications with one radio.
+Init = DefaultRadio.Init
+SendCommand = DefaultRadio.SendCommand
+GetStatus = DefaultRadio.GetStatus
+ReadRegister = DefaultRadio.ReadRegister
+WriteRegister = DefaultRadio.WriteRegister
+InvalidateRegisterCache = DefaultRadio.InvalidateRegisterCache
+ResyncRegisterCache = DefaultRadio.ResyncRegisterCache
+GetRegisterCacheStats = DefaultRadio.GetRegisterCacheStats
+ResetRegisterCacheStats = DefaultRadio.ResetRegisterCacheStats
+FlushTxBuffer = DefaultRadio.FlushTxBuffer
+FlushRxBuffer = DefaultRadio.FlushRxBuffer
+Configure = DefaultRadio.Configure
+ConfigureTx = DefaultRadio.ConfigureTx
+ConfigureRx = DefaultRadio.ConfigureRx
+ConfigureRxPipes = DefaultRadio.ConfigureRxPipes
+ConfigureOff = DefaultRadio.ConfigureOff
+Reset = DefaultRadio.Reset
+GetIntFlags = DefaultRadio.GetIntFlags
+EnableDynamicPayloads = DefaultRadio.EnableDynamicPayloads
+DisableDynamicPayloads = DefaultRadio.DisableDynamicPayloads
+GetPayloadWidth = DefaultRadio.GetPayloadWidth
+WriteAckPayload = DefaultRadio.WriteAckPayload
+ConfigureTxAddress = DefaultRadio.ConfigureTxAddress
+ChipEnable = DefaultRadio.ChipEnable
+SendData = DefaultRadio.SendData
+GetData = DefaultRadio.GetData
+GetPackets = DefaultRadio.GetPackets
+SpectrumSweep = DefaultRadio.SpectrumSweep
 
 
 
 #/***************************************************************************/
-#/* Read the specified number of bytes from the specified RF24L01 register. */
+#/* Time scheduled channel hopping. Both nodes create a ChannelHopper with  */
+#/* the same seed, which shuffles the channels into the same hop sequence,  */
+#/* and move to the next channel in the sequence every HopSeconds.          */
+#/*                                                                         */
+#/* The receiver hops on its own clock, StartReceiver() runs a thread which */
+#/* sets RF_CH at each hop. The transmitter follows the receiver, the       */
+#/* Transmitter class asks TxChannel() for the channel to use and reports   */
+#/* each delivered and failed packet. A failed packet starts a resync, the  */
+#/* packet is retried on the channels either side of the current hop, then  */
+#/* down the whole sequence, then parked on one channel until the receiver  */
+#/* hops onto it. Resync is bounded by one probe per channel plus one pass  */
+#/* of the sequence, GetResyncLimit(), before the packet is failed.         */
+#/*                                                                         */
+#/* Channels losing packets or needing many retransmits, from the MAX_RT    */
+#/* count and the OBSERVE_TX ARC_CNT, are blacklisted for a time. The       */
+#/* transmitter stays quiet during blacklisted hops, the receiver still     */
+#/* visits them so the schedule never changes. At most half the channels    */
+#/* can be blacklisted.                                                     */
 #/***************************************************************************/
-def ReadRegister(RegisterAddress, DataWordCount):
-   Command = [(RF24L01_R_REGISTER | RegisterAddress)]
-   for Count in range(DataWordCount):
-      Command.append(0x00)
-   Response = SendCommand(Command)
-   return Response
-
+class ChannelHopper(object):
+   def __init__(self, Seed, Channels = None, HopSeconds = HOP_SECONDS, Radio = None):
+      if Radio is None:
+         Radio = DefaultRadio
+      self.Radio = Radio
+      if Channels is None:
+         Channels = HOP_CHANNELS
+      self.Sequence = list(Channels)
+      random.Random(Seed).shuffle(self.Sequence)
+      self.HopSeconds = HopSeconds
+      # Start time of hop zero on the local clock, and on the transmitter the
+      # range of receiver start times consistent with the packets delivered.
+      self.Epoch = time.time()
+      self.EpochLow = None
+      self.EpochHigh = None
+      # Per channel packets delivered, packets lost and retransmits.
+      self.Sent = {}
+      self.Lost = {}
+      self.Retries = {}
+      # Blacklisted channels and the time they are released.
+      self.Blacklist = {}
+      # Hops still to probe and the hop currently probed during a resync.
+      self.Probes = []
+      self.ProbeHop = None
+      self.LossHop = None
+      self.ParkUntil = None
+      self.ResyncStart = 0.0
+      self.ResyncCount = 0
+      self.ResyncFailCount = 0
+      self.LastResyncTime = 0.0
+      # Most recent decisions, [Time, Text].
+      self.History = collections.deque(maxlen = HOP_HISTORY)
+      self.Thread = None
+      self.Running = False
+
+
+   #/******************************************************/
+   #/* Return the hop number at the specified local time. */
+   #/******************************************************/
+   def GetHop(self, Now = None):
+      if Now is None:
+         Now = time.time()
+      return int((Now - self.Epoch) // self.HopSeconds)
+
+
+   #/****************************************/
+   #/* Return the channel used for the hop. */
+   #/****************************************/
+   def GetChannel(self, Hop):
+      return self.Sequence[Hop % len(self.Sequence)]
+
+
+   #/**********************************************/
+   #/* Return the local time the next hop starts. */
+   #/**********************************************/
+   def GetNextHopTime(self, Now = None):
+      return self.Epoch + (self.GetHop(Now) + 1) * self.HopSeconds
+
+
+   #/**********************************************************/
+   #/* Return the longest time a resync can take, in seconds, */
+   #/* for the auto retransmit delay and count configured.    */
+   #/**********************************************************/
+   def GetResyncLimit(self, MaxRtSeconds = 0.064):
+      return (len(self.Sequence) + 1) * (MaxRtSeconds + self.HopSeconds)
+
+
+   #/********************************************************/
+   #/* Return True if the channel is currently blacklisted. */
+   #/********************************************************/
+   def IsBlacklisted(self, Channel, Now = None):
+      if Now is None:
+         Now = time.time()
+      Release = self.Blacklist.get(Channel)
+      if Release is not None and Release <= Now:
+         del self.Blacklist[Channel]
+         self.Log(Now, "RELEASE {:d}".format(Channel))
+         Release = None
+      return Release is not None
+
+
+   #/******************************/
+   #/* Record a hopping decision. */
+   #/******************************/
+   def Log(self, Now, Text):
+      self.History.append([Now, Text])
+
+
+   #/*****************************************************************/
+   #/* Return the channel the transmitter should use now, or None    */
+   #/* when it should not start sending, during a blacklisted hop or */
+   #/* close to the start or end of a hop.                           */
+   #/*****************************************************************/
+   def TxChannel(self, Now = None):
+      if Now is None:
+         Now = time.time()
+      if self.ProbeHop is not None:
+         Channel = self.GetChannel(self.ProbeHop)
+      else:
+         Channel = self.GetChannel(self.GetHop(Now))
+         NextHopTime = self.GetNextHopTime(Now)
+         if self.IsBlacklisted(Channel, Now) or NextHopTime - Now < HOP_GUARD_SECONDS or Now - (NextHopTime - self.HopSeconds) < HOP_GUARD_SECONDS:
+            Channel = None
+      return Channel
+
+
+   #/***************************************************************/
+   #/* Record a packet delivered on the channel with the number of */
+   #/* retransmits from OBSERVE_TX ARC_CNT. Completes a resync.    */
+   #/***************************************************************/
+   def Delivered(self, Channel, ArcCount, Now = None):
+      if Now is None:
+         Now = time.time()
+      if self.ProbeHop is not None:
+         # The receiver is on the probed hop, numbered nearest the local hop.
+         Count = len(self.Sequence)
+         Hop = self.ProbeHop + Count * int(round(float(self.GetHop(Now) - self.ProbeHop) / Count))
+         self.LastResyncTime = Now - self.ResyncStart
+         self.Log(Now, "SYNC {:d} {:.3f}s".format(Channel, self.LastResyncTime))
+         self.ProbeHop = None
+         self.Probes = []
+         self.ParkUntil = None
+         self.Align(Now - (Hop + 1) * self.HopSeconds, Now - Hop * self.HopSeconds)
+         LossChannel = self.GetChannel(self.LossHop)
+         if self.GetChannel(self.GetHop(self.ResyncStart)) != LossChannel:
+            # The receiver was on another hop, the loss was not the channel.
+            self.Lost[LossChannel] = max(0, self.Lost.get(LossChannel, 0) - 1)
+      else:
+         Hop = self.GetHop(Now)
+         self.Align(Now - (Hop + 1) * self.HopSeconds, Now - Hop * self.HopSeconds)
+      self.Sent[Channel] = self.Sent.get(Channel, 0) + 1
+      self.Retries[Channel] = self.Retries.get(Channel, 0) + ArcCount
+      self.CheckChannel(Channel, Now)
+
+
+   #/***************************************************************/
+   #/* Record a packet failed on the channel, MAX_RT. Returns True */
+   #/* when the packet should be retried on the next resync probe, */
+   #/* False when the resync has failed and the packet is lost.    */
+   #/***************************************************************/
+   def Failed(self, Channel, Now = None):
+      if Now is None:
+         Now = time.time()
+      Result = True
+      if self.ProbeHop is None:
+         Hop = self.GetHop(Now)
+         self.Lost[Channel] = self.Lost.get(Channel, 0) + 1
+         self.LossHop = Hop
+         # Retry the hop, probe a missed hop either side, then down the whole sequence.
+         self.Probes = [Hop, Hop + 1, Hop - 1]
+         for Count in range(2, len(self.Sequence)):
+            self.Probes.append(Hop - Count)
+         self.ResyncStart = Now
+         self.ResyncCount += 1
+         self.Log(Now, "RESYNC {:d}".format(Channel))
+         self.NextProbe(Now)
+         self.CheckChannel(Channel, Now)
+      elif len(self.Probes) > 0:
+         self.NextProbe(Now)
+      elif self.ParkUntil is None:
+         # Wait on one channel for the receiver to hop onto it.
+         self.ProbeHop = self.LossHop
+         self.ParkUntil = Now + (len(self.Sequence) + 1) * self.HopSeconds
+      elif Now >= self.ParkUntil:
+         self.ResyncFailCount += 1
+         self.Log(Now, "RESYNC FAILED")
+         self.ProbeHop = None
+         self.ParkUntil = None
+         Result = False
+      return Result
+
+
+   #/**********************************/
+   #/* Move to the next hop to probe. */
+   #/**********************************/
+   def NextProbe(self, Now):
+      self.ProbeHop = self.Probes.pop(0)
+
+
+   #/*****************************************************************/
+   #/* Narrow the range of receiver start times to those between Low */
+   #/* and High, and use the middle of the range. A range which no   */
+   #/* longer overlaps, after a resync or clock drift, starts again. */
+   #/*****************************************************************/
+   def Align(self, Low, High):
+      if self.EpochLow is None or Low > self.EpochHigh or High < self.EpochLow:
+         self.EpochLow = Low
+         self.EpochHigh = High
+      else:
+         self.EpochLow = max(self.EpochLow, Low)
+         self.EpochHigh = min(self.EpochHigh, High)
+      self.Epoch = (self.EpochLow + self.EpochHigh) / 2.0
+
+
+   #/************************************************************/
+   #/* Blacklist the channel if it has lost too many packets or */
+   #/* needed too many retransmits.                             */
+   #/************************************************************/
+   def CheckChannel(self, Channel, Now):
+      Sent = self.Sent.get(Channel, 0)
+      Lost = self.Lost.get(Channel, 0)
+      if Sent + Lost >= HOP_BLACKLIST_MIN_PACKETS:
+         Bad = float(Lost) / (Sent + Lost) > HOP_BLACKLIST_LOSS or (Sent > 0 and float(self.Retries.get(Channel, 0)) / Sent > HOP_BLACKLIST_RETRIES)
+         if Bad and len(self.Blacklist) < len(self.Sequence) // 2:
+            self.Blacklist[Channel] = Now + HOP_BLACKLIST_SECONDS
+            self.Log(Now, "BLACKLIST {:d} SENT {:d} LOST {:d}".format(Channel, Sent, Lost))
+         # Start counting again, recent packets decide.
+         self.Sent[Channel] = 0
+         self.Lost[Channel] = 0
+         self.Retries[Channel] = 0
+
+
+   #/***********************************************************/
+   #/* Start a thread hopping the receiver on the local clock. */
+   #/***********************************************************/
+   def StartReceiver(self):
+      self.Running = True
+      self.Thread = threading.Thread(target = self.ReceiverThread)
+      self.Thread.daemon = True
+      self.Thread.start()
+
+
+   #/*************************************/
+   #/* Stop the receiver hopping thread. */
+   #/*************************************/
+   def StopReceiver(self):
+      self.Running = False
+      if self.Thread is not None:
+         self.Thread.join()
+         self.Thread = None
+
+
+   #/********************************************************/
+   #/* Set RF_CH at each hop while the receiver is running. */
+   #/********************************************************/
+   def ReceiverThread(self):
+      while self.Running:
+         Now = time.time()
+         Channel = self.GetChannel(self.GetHop(Now))
+         if self.Radio.ReadRegister(RF24L01_RF_CH, 1)[1] != Channel:
+            self.Radio.ChipEnable(0)
+            self.Radio.WriteRegister(RF24L01_RF_CH, [Channel])
+            self.Radio.ChipEnable(1)
+         time.sleep(max(0.0, self.GetNextHopTime(Now) - time.time()))
+
+
+   #/**************************************/
+   #/* Convert the hopping state to text. */
+   #/**************************************/
+   def DisplayStats(self):
+      Now = time.time()
+      Result = "RF24L01 CHANNEL HOPPING:\n"
+      Result += "Sequence: " + str(self.Sequence) + "\n"
+      Result += "Current Channel: " + str(self.GetChannel(self.GetHop(Now))) + "\n"
+      Result += "Blacklisted: " + str([Channel for Channel in sorted(self.Blacklist) if self.IsBlacklisted(Channel, Now)]) + "\n"
+      Result += "Resyncs: " + str(self.ResyncCount) + " Failed: " + str(self.ResyncFailCount) + "\n"
+      Result += "Last Resync Time: {:.3f}s\n".format(self.LastResyncTime)
+      return Result
 
 
-#/*********************************************************************/
-#/* Write the specified data array to the specified RF24L01 register. */
-#/*********************************************************************/
-def WriteRegister(RegisterAddress, WriteData):
-   Command = [(RF24L01_W_REGISTER | RegisterAddress)]
-   for Data in WriteData:
-      Command.append(Data)
-   Response = SendCommand(Command)
-   return Response
 
+#/***************************************************************************/
+#/* Link adaptation, steps through LINK_LEVELS, trading throughput for      */
+#/* robustness, to keep the delivery ratio at the target. The Transmitter   */
+#/* reports each packet with its OBSERVE_TX ARC_CNT, after every window of  */
+#/* packets the controller moves to a more robust level when below target,  */
+#/* or a faster level when comfortably above it.                            */
+#/*                                                                         */
+#/* The PA level and auto retransmit settings only affect the transmitter.  */
+#/* A data rate change is sent to the receiver in a link control payload    */
+#/* first, the transmitter changes once it has been acknowledged. The       */
+#/* receiver passes each payload to Received() and calls CheckFallback()    */
+#/* periodically. When the link is lost both ends fall back to the most     */
+#/* robust level, the receiver after LINK_FALLBACK_SECONDS without packets. */
+#/*                                                                         */
+#/* A receiver shared by transmitters on several pipelines has one data     */
+#/* rate for all of them. Either every end is given the same DataRate,      */
+#/* and each transmitter only adapts its PA level and retransmits, or the   */
+#/* receiver is given a MasterPipeline, the only transmitter whose link     */
+#/* control payloads are followed and whose packets delay the fallback.     */
+#/***************************************************************************/
+class LinkController(object):
+   def __init__(self, Levels = None, TargetRatio = LINK_TARGET_RATIO, WindowPackets = LINK_WINDOW_PACKETS, Radio = None, DataRate = None, MasterPipeline = None):
+      if Radio is None:
+         Radio = DefaultRadio
+      self.Radio = Radio
+      if Levels is None:
+         Levels = LINK_LEVELS
+      if DataRate is not None:
+         Levels = PinDataRate(Levels, DataRate)
+      self.Levels = Levels
+      # Data rate all levels are pinned to, link control payloads are ignored when set.
+      self.DataRate = DataRate
+      # Pipeline of the transmitter followed by a shared receiver, None for any.
+      self.MasterPipeline = MasterPipeline
+      self.TargetRatio = TargetRatio
+      self.WindowPackets = WindowPackets
+      # Both ends start on the most robust level.
+      self.Level = len(Levels) - 1
+      self.Delivered = 0
+      self.Failed = 0
+      self.Retries = 0
+      self.GoodWindows = 0
+      # Link control payload waiting to be sent, and the level it requests.
+      self.ControlData = None
+      self.ControlLevel = None
+      self.ControlSent = False
+      self.HoldUntil = 0.0
+      # Last receive time of the master pipeline, or of any pipeline without one.
+      self.LastReceiveTime = time.time()
+      # Last receive time of each pipeline.
+      self.PipeReceiveTimes = {}
+      self.IgnoredCount = 0
+      # Most recent decisions, [Time, Level, Delivery Ratio, Retries per packet, Reason].
+      self.History = collections.deque(maxlen = LINK_HISTORY)
+
+
+   #/************************************************/
+   #/* Write the settings of a level to the device. */
+   #/************************************************/
+   def Apply(self, Level):
+      Settings = self.Levels[Level]
+      Response = self.Radio.WriteRegister(RF24L01_SETUP_RETR, [RetransmitSetup(Settings[2], Settings[3])])
+      if self.Radio.ReadRegister(RF24L01_RF_SETUP, 1)[1] & RF24L01_RF_SETUP_DATA_RATE != Settings[0]:
+         # Leave TX or RX mode while changing data rate.
+         self.Radio.ChipEnable(0)
+         Response = self.Radio.WriteRegister(RF24L01_RF_SETUP, [(Settings[0] | Settings[1] | RF24L01_RF_SETUP_LNA_GAIN)])
+         self.Radio.ChipEnable(1)
+      else:
+         Response = self.Radio.WriteRegister(RF24L01_RF_SETUP, [(Settings[0] | Settings[1] | RF24L01_RF_SETUP_LNA_GAIN)])
+      self.Level = Level
+
+
+   #/******************************************************************/
+   #/* Move to another level, through a link control payload when the */
+   #/* data rate changes.                                             */
+   #/******************************************************************/
+   def ChangeLevel(self, Level, Ratio, Retries, Reason, Now):
+      self.History.append([Now, Level, Ratio, Retries, Reason])
+      if self.Levels[Level][0] == self.Levels[self.Level][0]:
+         self.Apply(Level)
+      elif self.ControlData is None:
+         self.ControlData = [LINK_CONTROL_MARKER, Level]
+         self.ControlLevel = Level
+         self.ControlSent = False
+
+
+   #/***********************************************************/
+   #/* Return a new link control payload to send, or None. The */
+   #/* Transmitter queues it ahead of any other payloads.      */
+   #/***********************************************************/
+   def GetControl(self):
+      if self.ControlData is not None and not self.ControlSent:
+         self.ControlSent = True
+         Result = self.ControlData
+      else:
+         Result = None
+      return Result
+
+
+   #/************************************************************/
+   #/* Return True when payloads can be loaded, False while the */
+   #/* receiver is changing data rate.                          */
+   #/************************************************************/
+   def Ready(self):
+      return time.time() >= self.HoldUntil
+
+
+   #/******************************************************************/
+   #/* Record the outcome of a packet on the transmitter, with the    */
+   #/* number of retransmits from OBSERVE_TX ARC_CNT. Link adaptation */
+   #/* decisions are made after each window of packets.               */
+   #/******************************************************************/
+   def Retired(self, Data, Success, ArcCount):
+      Now = time.time()
+      if Data is self.ControlData:
+         if Success:
+            # The receiver has changed, give it time before sending more.
+            self.Apply(self.ControlLevel)
+            self.HoldUntil = Now + LINK_SWITCH_SECONDS
+         else:
+            # The receiver may or may not have changed, both fall back.
+            self.History.append([Now, len(self.Levels) - 1, 0.0, 0.0, "CONTROL FAILED"])
+            self.Apply(len(self.Levels) - 1)
+         self.ControlData = None
+         self.ControlSent = False
+         return
+
+      if Success:
+         self.Delivered += 1
+         self.Retries += ArcCount
+      else:
+         self.Failed += 1
+      if self.Delivered + self.Failed >= self.WindowPackets:
+         Ratio = float(self.Delivered) / (self.Delivered + self.Failed)
+         Retries = float(self.Retries) / max(1, self.Delivered)
+         self.Delivered = 0
+         self.Failed = 0
+         self.Retries = 0
+         if Ratio < LINK_FALLBACK_RATIO and self.Level != len(self.Levels) - 1:
+            self.GoodWindows = 0
+            self.ChangeLevel(len(self.Levels) - 1, Ratio, Retries, "FALLBACK", Now)
+         elif Ratio < self.TargetRatio:
+            self.GoodWindows = 0
+            if self.Level < len(self.Levels) - 1:
+               self.ChangeLevel(self.Level + 1, Ratio, Retries, "SLOWER", Now)
+         elif Retries < LINK_STEP_UP_RETRIES:
+            self.GoodWindows += 1
+            if self.GoodWindows >= LINK_STEP_UP_WINDOWS and self.Level > 0:
+               self.GoodWindows = 0
+               self.ChangeLevel(self.Level - 1, Ratio, Retries, "FASTER", Now)
+         else:
+            self.GoodWindows = 0
+
+
+   #/********************************************************************/
+   #/* On the receiver, pass each payload received with its pipeline.   */
+   #/* Returns True for link control payloads, which are not data. They */
+   #/* are only acted on from the master pipeline, and never when the   */
+   #/* data rate is pinned.                                             */
+   #/********************************************************************/
+   def Received(self, Data, Pipeline = None):
+      Now = time.time()
+      self.PipeReceiveTimes[Pipeline] = Now
+      IsMaster = self.MasterPipeline is None or Pipeline == self.MasterPipeline
+      if IsMaster:
+         self.LastReceiveTime = Now
+      if len(Data) == 2 and Data[0] == LINK_CONTROL_MARKER:
+         if IsMaster and self.DataRate is None and Data[1] < len(self.Levels):
+            self.History.append([Now, Data[1], 0.0, 0.0, "CONTROL"])
+            self.Apply(Data[1])
+         else:
+            self.IgnoredCount += 1
+         Result = True
+      else:
+         Result = False
+      return Result
+
+
+   #/*******************************************************************/
+   #/* On the receiver, fall back to the most robust level when no     */
+   #/* packets have arrived for LINK_FALLBACK_SECONDS. Call regularly. */
+   #/*******************************************************************/
+   def CheckFallback(self):
+      Now = time.time()
+      if self.Level != len(self.Levels) - 1 and Now - self.LastReceiveTime > LINK_FALLBACK_SECONDS:
+         self.History.append([Now, len(self.Levels) - 1, 0.0, 0.0, "FALLBACK"])
+         self.Apply(len(self.Levels) - 1)
+
+
+   #/************************************************/
+   #/* Return the current settings as a dictionary. */
+   #/************************************************/
+   def GetSettings(self):
+      Settings = self.Levels[self.Level]
+      return {
+         "LEVEL" : self.Level,
+         "DATA_RATE" : DATA_RATE_NAMES.get(Settings[0], "UNKNOWN"),
+         "PA_LEVEL" : PA_LEVEL_NAMES.get(Settings[1], "UNKNOWN"),
+         "ARD" : Settings[2],
+         "ARC" : Settings[3]
+      }
+
+
+   #/*****************************************/
+   #/* Convert the current settings to text. */
+   #/*****************************************/
+   def DisplaySettings(self):
+      Settings = self.GetSettings()
+      return "LINK LEVEL {:d}: {:s} {:s} ARD {:d}uS ARC {:d}".format(Settings["LEVEL"], Settings["DATA_RATE"], Settings["PA_LEVEL"], Settings["ARD"], Settings["ARC"])
+
+
+   #/*****************************************/
+   #/* Convert the decision history to text. */
+   #/*****************************************/
+   def DisplayHistory(self):
+      Result = "RF24L01 LINK DECISIONS:\n"
+      for Decision in self.History:
+         Result += "{:s} LEVEL {:d} RATIO {:.2f} RETRIES {:.2f} {:s}\n".format(time.strftime("%H:%M:%S", time.localtime(Decision[0])), Decision[1], Decision[2], Decision[3], Decision[4])
+      return Result
+
+
+
+#/********************************************************************/
+#/* Return link levels with the data rate replaced by DataRate, each */
+#/* auto retransmit delay at least LINK_MIN_ARD for the rate, and    */
+#/* levels made the same removed. Order is kept, fastest first.      */
+#/********************************************************************/
+def PinDataRate(Levels, DataRate):
+   Pinned = []
+   for Level in Levels:
+      Settings = [DataRate, Level[1], max(Level[2], LINK_MIN_ARD[DataRate]), Level[3]]
+      if Settings not in Pinned:
+         Pinned.append(Settings)
+   return Pinned
 
 
-#/************************/
-#/* Flush the TX buffer. */
-#/************************/
-def FlushTxBuffer():
-   # Flush old transmit data.
-   Command = [RF24L01_FLUSH_TX]
-   Response = SendCommand(Command)   
 
+#/****************************************************************************/
+#/* Queued transmitter, keeps the 3 deep RF24L01 TX FIFO loaded from a queue */
+#/* of payloads while CE is held high, so Enhanced ShockBurst sends packets  */
+#/* back to back. Entries are retired on the TX_DS and MAX_RT interupts,     */
+#/* Service() must be called with the flags returned from GetIntFlags().     */
+#/* RX_DR on a transmitter signals acknowledge payloads, which are read and  */
+#/* passed to AckCallback or kept in AckPayloads. With a ChannelHopper the   */
+#/* channel follows the hop schedule, call Poll() periodically so payloads   */
+#/* held back during blacklisted hops are sent.                              */
+#/****************************************************************************/
+class Transmitter(object):
+   def __init__(self, Channel, Pipeline, QueueSize = TX_QUEUE_SIZE, Callback = None, AckCallback = None, Hopper = None, Controller = None, Radio = None):
+      if Radio is None:
+         Radio = DefaultRadio
+      self.Radio = Radio
+      self.Channel = Channel
+      self.Pipeline = Pipeline
+      # Optional ChannelHopper choosing the channel for each packet.
+      self.Hopper = Hopper
+      # Optional LinkController adapting the data rate, PA level and retransmits.
+      self.Controller = Controller
+      self.QueueSize = QueueSize
+      # Optional function called with (Data, Success) as each packet is retired.
+      self.Callback = Callback
+      # Optional function called with the data of each acknowledge payload received.
+      self.AckCallback = AckCallback
+      # Most recent acknowledge payloads received, when not passed to AckCallback.
+      self.AckPayloads = collections.deque(maxlen = TX_ACK_PAYLOAD_HISTORY)
+      self.Lock = threading.Lock()
+      # Payloads waiting for space in the TX FIFO.
+      self.Pending = collections.deque()
+      # Payloads loaded in the TX FIFO, oldest first.
+      self.InFlight = collections.deque()
+      # Most recent packet outcomes, [Data, Success, Time].
+      self.Outcomes = collections.deque(maxlen = TX_OUTCOME_HISTORY)
+      # Oldest payload in flight which has reached MAX_RT, and times it has been sent again.
+      self.RetryData = None
+      self.RetryCount = 0
+      self.SentCount = 0
+      self.FailedCount = 0
+      self.RetriedCount = 0
+      self.DroppedCount = 0
+      self.StartTime = time.time()
+
+
+   #/*****************************************************************/
+   #/* Configure the RF24L01 for transmitting and hold CE high ready */
+   #/* to send as soon as a payload is in the TX FIFO.               */
+   #/*****************************************************************/
+   def Start(self):
+      with self.Lock:
+         self.Radio.ConfigureTxAddress(self.Channel, self.Pipeline)
+         self.Radio.FlushTxBuffer()
+         self.Requeue()
+         Response = self.Radio.WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PTX)])
+         if self.Controller is not None:
+            self.Controller.Apply(self.Controller.Level)
+         self.Radio.ChipEnable(1)
+         self.StartTime = time.time()
+         self.Load()
+
+
+   #/************************************************************/
+   #/* Queue a payload for transmission, returns False when the */
+   #/* queue is full and the payload has been dropped.          */
+   #/************************************************************/
+   def Send(self, Data):
+      # Checked here, an oversized payload would stall the queue when loaded.
+      if len(Data) > RF24L01_MAX_PAYLOAD:
+         raise ValueError("Payload of {:d} bytes exceeds {:d} bytes.".format(len(Data), RF24L01_MAX_PAYLOAD))
+      with self.Lock:
+         if len(self.Pending) >= self.QueueSize:
+            self.DroppedCount += 1
+            Result = False
+         else:
+            self.Pending.append(Data)
+            self.Load()
+            Result = True
+      return Result
+
+
+   #/******************************************************/
+   #/* Queue several payloads, returns the number queued. */
+   #/******************************************************/
+   def SendMany(self, DataList):
+      Count = 0
+      for Data in DataList:
+         if self.Send(Data):
+            Count += 1
+      return Count
+
+
+   #/*****************************************************************/
+   #/* Load queued payloads into the TX FIFO until the FIFO is full. */
+   #/*****************************************************************/
+   def Load(self):
+      if self.Hopper is not None and not self.Hop():
+         return
+      if self.Controller is not None:
+         Control = self.Controller.GetControl()
+         if Control is not None:
+            self.Pending.appendleft(Control)
+         # Nothing is loaded behind a link control payload until it is acknowledged.
+         if not self.Controller.Ready() or any(Data is self.Controller.ControlData for Data in self.InFlight):
+            return
+      while len(self.Pending) > 0 and len(self.InFlight) < RF24L01_TX_FIFO_SIZE:
+         Data = self.Pending.popleft()
+         self.Radio.SendCommand([RF24L01_W_TX_PAYLOAD] + PayloadToWords(Data))
+         self.InFlight.append(Data)
+         if self.Controller is not None and Data is self.Controller.ControlData:
+            break
+
+
+   #/******************************************************************/
+   #/* Move to the channel chosen by the hopper, returns False when   */
+   #/* no packets should be loaded yet. The channel only changes once */
+   #/* the TX FIFO has emptied.                                       */
+   #/******************************************************************/
+   def Hop(self):
+      Channel = self.Hopper.TxChannel()
+      if Channel is None:
+         Result = False
+      elif Channel == self.Channel:
+         Result = True
+      elif len(self.InFlight) > 0:
+         Result = False
+      else:
+         self.Radio.ChipEnable(0)
+         Response = self.Radio.WriteRegister(RF24L01_RF_CH, [Channel])
+         self.Radio.ChipEnable(1)
+         self.Channel = Channel
+         Result = True
+      return Result
+
+
+   #/**********************************************************/
+   #/* Load any queued payloads held back by channel hopping, */
+   #/* call periodically when hopping.                        */
+   #/**********************************************************/
+   def Poll(self):
+      with self.Lock:
+         self.Load()
+
+
+   #/***************************************************************/
+   #/* Move payloads still in the TX FIFO back to the queue, after */
+   #/* the TX FIFO has been flushed.                               */
+   #/***************************************************************/
+   def Requeue(self):
+      while len(self.InFlight) > 0:
+         self.Pending.appendleft(self.InFlight.pop())
+
+
+   #/****************************************/
+   #/* Record the outcome of a sent packet. */
+   #/****************************************/
+   def Retire(self, Success, ArcCount = 0):
+      Data = self.InFlight.popleft()
+      if Data is self.RetryData:
+         self.RetryData = None
+         self.RetryCount = 0
+      if self.Controller is not None:
+         IsControl = Data is self.Controller.ControlData
+         if Success:
+            self.Controller.Retired(Data, True, ArcCount)
+         else:
+            self.Controller.Retired(Data, False, self.Controller.Levels[self.Controller.Level][3])
+         if IsControl:
+            # Link control payloads are not counted or reported.
+            return
+      if Success:
+         self.SentCount += 1
+         if self.Hopper is not None:
+            self.Hopper.Delivered(self.Channel, ArcCount)
+      else:
+         self.FailedCount += 1
+      self.Outcomes.append([Data, Success, time.time()])
+      if self.Callback is not None:
+         self.Callback(Data, Success)
+
+
+   #/*******************************************************************/
+   #/* Return the number of payloads in flight certainly sent, from    */
+   #/* the TX FIFO level. Only an empty or a full FIFO gives its exact */
+   #/* count, any other level is taken as the most it can hold, so a   */
+   #/* payload is never retired before it has been sent.               */
+   #/*******************************************************************/
+   def GetCompleted(self):
+      FifoStatus = self.Radio.ReadRegister(RF24L01_FIFO_STATUS, 1)[1]
+      if FifoStatus & RF24L01_FIFO_STATUS_TX_EMPTY:
+         InFifo = 0
+      elif FifoStatus & RF24L01_FIFO_STATUS_TX_FULL:
+         InFifo = RF24L01_TX_FIFO_SIZE
+      else:
+         InFifo = RF24L01_TX_FIFO_SIZE - 1
+      return len(self.InFlight) - InFifo
+
+
+   #/************************************************************************/
+   #/* Handle TX_DS and MAX_RT interupt flags and refill the TX FIFO. TX_DS */
+   #/* may cover several packets, or none when they were retired on the     */
+   #/* interupt before, so the payloads retired are counted from the TX     */
+   #/* FIFO level alone. While payloads are queued the FIFO is refilled and */
+   #/* the level read again, so a level of one or two is resolved as the    */
+   #/* FIFO fills. The last payloads are retired once the FIFO empties. On  */
+   #/* MAX_RT the TX FIFO is flushed and the oldest packet not known to be  */
+   #/* sent is queued again with those behind it, until it has been sent    */
+   #/* again TX_RETRY_COUNT times, then it has failed.                      */
+   #/************************************************************************/
+   def Service(self, IntFlags):
+      with self.Lock:
+         if IntFlags & RF24L01_STATUS_MAX_RT:
+            for Count in range(self.GetCompleted()):
+               self.Retire(True)
+            if len(self.InFlight) > 0:
+               self.Radio.FlushTxBuffer()
+               # While the hopper resyncs, the failed packet is retried on the next probe channel.
+               if self.Hopper is None or not self.Hopper.Failed(self.Channel):
+                  if self.InFlight[0] is not self.RetryData:
+                     self.RetryData = self.InFlight[0]
+                     self.RetryCount = 0
+                  if self.RetryCount < TX_RETRY_COUNT:
+                     self.RetryCount += 1
+                     self.RetriedCount += 1
+                  else:
+                     self.Retire(False)
+               self.Requeue()
+         elif IntFlags & RF24L01_STATUS_TX_DS:
+            ArcCount = 0
+            if self.Hopper is not None or self.Controller is not None:
+               # Retransmits of the last packet sent, an estimate for each packet retired.
+               ArcCount = self.Radio.ReadRegister(RF24L01_OBSERVE_TX, 1)[1] & RF24L01_OBSERVE_TX_ARC_CNT
+            Completed = self.GetCompleted()
+            while Completed > 0:
+               for Count in range(Completed):
+                  self.Retire(True, ArcCount)
+               self.Load()
+               Completed = self.GetCompleted()
+         if IntFlags & RF24L01_STATUS_RX_DR:
+            # Payloads returned in automatic acknowledge packets.
+            for Packet in self.Radio.GetPackets():
+               if self.AckCallback is not None:
+                  self.AckCallback(Packet[1])
+               else:
+                  self.AckPayloads.append(Packet[1])
+         self.Load()
+
+
+   #/****************************************************/
+   #/* Discard all queued payloads not yet transmitted. */
+   #/****************************************************/
+   def Clear(self):
+      with self.Lock:
+         self.Radio.FlushTxBuffer()
+         self.Requeue()
+         self.DroppedCount += len(self.Pending)
+         self.Pending.clear()
+         self.RetryData = None
+         self.RetryCount = 0
+
+
+   #/**************************************************/
+   #/* Return the number of payloads not yet retired. */
+   #/**************************************************/
+   def GetBacklog(self):
+      return len(self.Pending) + len(self.InFlight)
+
+
+   #/*******************************************************/
+   #/* Return the delivered packet rate in packets/second. */
+   #/*******************************************************/
+   def GetPacketRate(self):
+      Elapsed = time.time() - self.StartTime
+      if Elapsed <= 0:
+         PacketRate = 0.0
+      else:
+         PacketRate = self.SentCount / Elapsed
+      return PacketRate
 
 
-#/************************/
-#/* Flush the RX buffer. */
-#/************************/
-def FlushRxBuffer():
-   # Flush old received data.
-   Command = [RF24L01_FLUSH_RX]
-   Response = SendCommand(Command)   
-
-
-
-#/*******************************************/
-#/* Standard initial general configuration. */
-#/*******************************************/
-def Configure():
-   # Configure local transmit address.
-   Response = WriteRegister(RF24L01_TX_ADDR, [BASE_ADDRESS[0], BASE_ADDRESS[1], BASE_ADDRESS[2], BASE_ADDRESS[3], BASE_ADDRESS[4]])
-   # Configure local receive base address.
-   Response = WriteRegister(RF24L01_RX_ADDR_P0, [BASE_ADDRESS[0], BASE_ADDRESS[1], BASE_ADDRESS[2], BASE_ADDRESS[3], BASE_ADDRESS[4]])
-
-   # Configure local receive address 1.
-   Response = WriteRegister(RF24L01_RX_ADDR_P1, [BASE_ADDRESS[0] + 1, BASE_ADDRESS[1], BASE_ADDRESS[2], BASE_ADDRESS[3], BASE_ADDRESS[4]])
-   # Configure local receive address 2.
-   Response = WriteRegister(RF24L01_RX_ADDR_P2, [BASE_ADDRESS[0] + 2])
-   # Configure local receive address 3.
-   Response = WriteRegister(RF24L01_RX_ADDR_P3, [BASE_ADDRESS[0] + 3])
-   # Configure local receive address 4.
-   Response = WriteRegister(RF24L01_RX_ADDR_P4, [BASE_ADDRESS[0] + 4])
-   # Configure local receive address 5.
-   Response = WriteRegister(RF24L01_RX_ADDR_P5, [BASE_ADDRESS[0] + 5])
-   # Configure 1Mb/s and 0 DBm.
-   Response = WriteRegister(RF24L01_RF_SETUP, [(RF24L01_RF_SETUP_1MBPS | RF24L01_RF_SETUP_0DBM | RF24L01_RF_SETUP_LNA_GAIN)])
-   # Power off module radio.
-   Response = WriteRegister(RF24L01_CONFIG, [RF24L01_CONFIG_EN_CRC])
-
-
-
-#/**************************************/
-#/* Configure the current mode for TX. */
-#/**************************************/
-def ConfigureTx(Channel):
-   # Set RF channel, resets bad packet counts back to zero.
-   Response = WriteRegister(RF24L01_RF_CH, [Channel])
-   # Power on module radio for transmitting.
-   Response = WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PTX)])
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 0)
-
-
-
-#/**************************************/
-#/* Configure the current mode for RX. */
-#/**************************************/
-def ConfigureRx(Channel, Pipeline, ByteCount):
-   # Set RF channel, resets bad packet counts back to zero.
-   Response = WriteRegister(RF24L01_RF_CH, [Channel])
-   # Set byte count being received, must be exact size of data arriving.
-   Response = WriteRegister(RF24L01_RX_PW_P0 + Pipeline, [ByteCount])
-   # Power on module radio for receiving.
-   Response = WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PRX)])
-   Response = WriteRegister(RF24L01_EN_RXADDR, [(1 | (1 << Pipeline))])
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 1)
-
-
-
-#/***************************************************/
-#/* Configure the current mode for off (low power). */
-#/***************************************************/
-def ConfigureOff():
-   # Power off module radio.
-   Response = WriteRegister(RF24L01_CONFIG, [RF24L01_CONFIG_EN_CRC])
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 0)
-
-
-
-#/*************************************************************************/
-#/* Clear the TX and RX buffers of the RF24L01 and reset interupt status. */
-#/*************************************************************************/
-def Reset():
-   # Flush old transmit data.
-   FlushTxBuffer()
-   # Flush old received data.
-   FlushRxBuffer()
-   # Reset max retries flag, TX data sent flag, RX data ready flag.
-   Response = WriteRegister(RF24L01_STATUS, [RF24L01_STATUS_MAX_RT | RF24L01_STATUS_TX_DS | RF24L01_STATUS_RX_DR])
-
-
-
-#/*************************************************************/
-#/* Return interupt flags, and reset ready for next interupt. */
-#/*************************************************************/
-def GetIntFlags():
-   IntFlags = ReadRegister(RF24L01_FIFO_STATUS, 1)[0]
-   if IntFlags & RF24L01_STATUS_MAX_RT:
-      # Reset max retries flag.
-      Response = WriteRegister(RF24L01_STATUS, [RF24L01_STATUS_MAX_RT])
-   if IntFlags & RF24L01_STATUS_TX_DS:
-      # Reset TX data sent flag.
-      Response = WriteRegister(RF24L01_STATUS, [RF24L01_STATUS_TX_DS])
-   if IntFlags & RF24L01_STATUS_RX_DR:
-      # Reset RX data ready flag.
-      Response = WriteRegister(RF24L01_STATUS, [RF24L01_STATUS_RX_DR])
-
-   return IntFlags
+   #/***********************************************/
+   #/* Convert the transmitter statistics to text. */
+   #/***********************************************/
+   def DisplayStats(self):
+      Result = "RF24L01 TRANSMITTER:\n"
+      Result += "Packets Sent: " + str(self.SentCount) + "\n"
+      Result += "Packets Failed: " + str(self.FailedCount) + "\n"
+      Result += "Packets Retried: " + str(self.RetriedCount) + "\n"
+      Result += "Packets Dropped: " + str(self.DroppedCount) + "\n"
+      Result += "Packets Queued: " + str(self.GetBacklog()) + "\n"
+      Result += "Packet Rate: {:.1f}/s\n".format(self.GetPacketRate())
+      return Result
 
 
 
 #/***************************************************************************/
-#/* Send the specified data packet on the RF channel and pipeline provided. */
+#/* Sliding window of the sequence numbers received from one transmitter.   */
+#/* A bitmap of SEQUENCE_WINDOW bits marks the numbers received behind the  */
+#/* highest, so repeated payloads, resent when an acknowledge was lost, are */
+#/* recognised in constant time and memory. Numbers skipped ahead of the    */
+#/* highest are counted lost, and moved to reordered if they arrive later.  */
+#/* A transmitter which restarts from sequence 0 is recognised by a new     */
+#/* session, when its payloads carry one, and the window is started again.  */
+#/* Without sessions a number more than ReorderLimit behind the highest is  */
+#/* taken as a restart.                                                     */
 #/***************************************************************************/
-def SendData(Channel, Pipeline, Data):
-   # Configure local transmit address.
-   Response = WriteRegister(RF24L01_TX_ADDR, [BASE_ADDRESS[0] + Pipeline, BASE_ADDRESS[1], BASE_ADDRESS[2], BASE_ADDRESS[3], BASE_ADDRESS[4]])
-   # Configure local receive base address.
-   Response = WriteRegister(RF24L01_RX_ADDR_P0, [BASE_ADDRESS[0] + Pipeline, BASE_ADDRESS[1], BASE_ADDRESS[2], BASE_ADDRESS[3], BASE_ADDRESS[4]])
-
-   # Set RF channel, resets bad packet counts back to zero.
-   Response = WriteRegister(RF24L01_RF_CH, [Channel])
-
-   # Flush old transmit data.
-   FlushTxBuffer()
-
-   # Configure to transmit.
-   Response = WriteRegister(RF24L01_CONFIG, [(RF24L01_CONFIG_PWR_UP | RF24L01_CONFIG_EN_CRC | RF24L01_CONFIG_PTX)])
-
-   # Load data to be transmitted.
-   Command = [RF24L01_W_TX_PAYLOAD]
-   for Char in Data:
-      Command.append(ord(Char))
-   Response = SendCommand(Command)   
-
-   # Start transmit.
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 1)
-   time.sleep(0.000001)
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 0)
-
-
-
-#/**************************************/
-#/* Retreive the received data packet. */
-#/**************************************/
-def GetData():
-   RxData = []
-   # Turn off radio.
-   RPi.GPIO.output(GPIO_RF24L01_CSN, 0)
-   # Get the RX pipeline number.
-   ThisStatus = ReadRegister(RF24L01_FIFO_STATUS, 1)
-   RxPipeline = (ThisStatus[0] & RF24L01_STATUS_RX_P_NO) >> 1
-   if RxPipeline < 7:
-      # Get the RX buffer data size.
-      RxBytes = ReadRegister(RF24L01_RX_PW_P0 + RxPipeline, 1)[1]
-      # Read the RX data.
-      Command = [0] * (RxBytes + 1)
-      Command[0] = RF24L01_R_RX_PAYLOAD
-      RxData = SendCommand(Command)
-   # Flush old received data.
-   FlushRxBuffer()
-   return RxData[1:]
-
-
-
-#/**********************************************/
-#/* Convert the RF24L01 status values to text. */
-#/**********************************************/
-def DisplayStatus():
-   ThisStatus = ReadRegister(RF24L01_FIFO_STATUS, 1)
+class SequenceWindow(object):
+   def __init__(self, WindowSize = SEQUENCE_WINDOW, ReorderLimit = SEQUENCE_REORDER):
+      self.WindowSize = WindowSize
+      self.ReorderLimit = min(ReorderLimit, WindowSize)
+      self.WindowMask = (1 << WindowSize) - 1
+      # Highest sequence number received, bit N of the bitmap is Highest - N.
+      self.Highest = None
+      self.Bitmap = 0
+      # Session of the transmitter, None when its payloads carry none.
+      self.Session = None
+      self.LostCount = 0
+      self.DuplicateCount = 0
+      self.ReorderCount = 0
+      self.ResyncCount = 0
+
+
+   #/***************************************************************/
+   #/* Mark Count sequence numbers from First as received. Returns */
+   #/* False when all of them had already been received.           */
+   #/***************************************************************/
+   def Accept(self, First, Count, Session = None):
+      if Session is not None and Session != self.Session:
+         if self.Highest is not None:
+            self.ResyncCount += 1
+         self.Session = Session
+         self.Highest = None
+         self.Bitmap = 0
+      Last = (First + Count - 1) % SEQUENCE_MODULO
+      RangeMask = (1 << Count) - 1
+      if self.Highest is None:
+         Ahead = 0
+         Offset = self.WindowSize
+      else:
+         Ahead = (Last - self.Highest) % SEQUENCE_MODULO
+         Offset = (self.Highest - Last) % SEQUENCE_MODULO
+      if 0 < Ahead < SEQUENCE_MODULO // 2:
+         # Newer than any received, numbers skipped over are lost for now.
+         self.LostCount += max(0, Ahead - Count)
+         self.Bitmap = ((self.Bitmap << Ahead) | RangeMask) & self.WindowMask
+         self.Highest = Last
+         Result = True
+      elif Offset > self.ReorderLimit or Offset + Count > self.WindowSize:
+         if self.Highest is not None:
+            self.ResyncCount += 1
+         self.Bitmap = RangeMask
+         self.Highest = Last
+         Result = True
+      else:
+         Mask = RangeMask << Offset
+         Missing = Mask & ~self.Bitmap
+         if Missing == 0:
+            self.DuplicateCount += 1
+            Result = False
+         else:
+            # Late numbers were counted lost when skipped over.
+            Filled = bin(Missing).count("1")
+            self.LostCount -= min(Filled, self.LostCount)
+            self.ReorderCount += 1
+            self.Bitmap |= Mask
+            Result = True
+      return Result
+
+
+
+#/****************************************************************************/
+#/* Receiver for several transmitters on separate pipelines. Service() is    */
+#/* called from the interupt routine, it only drains the RX FIFO into the    */
+#/* bounded incoming queue with the receive time of each payload. Dispatch() */
+#/* then places each payload in the bounded queue of its pipeline, a full    */
+#/* queue drops the oldest payload. Each pipeline is consumed separately     */
+#/* with Get(), or by a worker thread per pipeline started with              */
+#/* StartWorkers(), so one slow consumer does not hold up the others.        */
+#/* StartWorkers() also starts a dispatch thread, without it Service()       */
+#/* dispatches before returning.                                             */
+#/*                                                                          */
+#/* SequenceRange is an optional function returning [First Sequence, Count,  */
+#/* Session] or [First Sequence, Count] for a payload, such as               */
+#/* GpsPacket.GetSequenceRange. A SequenceWindow per pipeline then discards  */
+#/* repeated payloads and counts those lost and reordered. Filter is an      */
+#/* optional function, passed (Pipeline, Data), returning True for payloads  */
+#/* which are not queued. Callback is an optional function, passed the       */
+#/* [Pipeline, Data] of the payloads queued by each Dispatch(), on the       */
+#/* thread which dispatched them.                                            */
+#/****************************************************************************/
+class PipeReceiver(object):
+   def __init__(self, QueueSize = RX_PIPE_QUEUE_SIZE, SequenceRange = None, Filter = None, Radio = None, IncomingSize = RX_INCOMING_QUEUE_SIZE, Callback = None):
+      if Radio is None:
+         Radio = DefaultRadio
+      self.Radio = Radio
+      self.SequenceRange = SequenceRange
+      self.Filter = Filter
+      self.Callback = Callback
+      # Payloads drained from the RX FIFO, [Receive Time, Pipeline, Data], not yet dispatched.
+      self.Incoming = collections.deque()
+      self.IncomingSize = IncomingSize
+      self.IncomingCondition = threading.Condition()
+      self.IncomingDropped = 0
+      self.IncomingPeak = 0
+      self.DispatchLock = threading.Lock()
+      self.Dispatcher = None
+      self.Condition = threading.Condition()
+      self.Queues = []
+      for Pipeline in range(RF24L01_PIPE_COUNT):
+         self.Queues.append(collections.deque(maxlen = QueueSize))
+      self.ReceivedCount = [0] * RF24L01_PIPE_COUNT
+      self.ByteCount = [0] * RF24L01_PIPE_COUNT
+      self.DroppedCount = [0] * RF24L01_PIPE_COUNT
+      self.PeakQueued = [0] * RF24L01_PIPE_COUNT
+      self.FirstTime = [None] * RF24L01_PIPE_COUNT
+      self.LastTime = [None] * RF24L01_PIPE_COUNT
+      # Sequence numbers received on each pipeline, one transmitter per pipeline.
+      self.Windows = []
+      for Pipeline in range(RF24L01_PIPE_COUNT):
+         self.Windows.append(SequenceWindow())
+      self.Workers = []
+      self.Running = False
+
+
+   #/****************************************************************/
+   #/* Read all payloads waiting in the RX FIFO into the incoming   */
+   #/* queue, called from the interupt routine. A full queue drops  */
+   #/* the payload read. Returns the [Pipeline, Data] of each read. */
+   #/****************************************************************/
+   def Service(self):
+      Now = time.time()
+      Packets = self.Radio.GetPackets()
+      for Packet in Packets:
+         if len(self.Incoming) >= self.IncomingSize:
+            self.IncomingDropped += 1
+         else:
+            self.Incoming.append([Now, Packet[0], Packet[1]])
+      self.IncomingPeak = max(self.IncomingPeak, len(self.Incoming))
+      if self.Dispatcher is None:
+         self.Dispatch()
+      elif len(Packets) > 0:
+         with self.IncomingCondition:
+            self.IncomingCondition.notify()
+      return Packets
+
+
+   #/*****************************************************************/
+   #/* Filter, count and queue each incoming payload on its pipeline */
+   #/* queue. Returns the [Pipeline, Data] of each payload queued.   */
+   #/*****************************************************************/
+   def Dispatch(self):
+      Queued = []
+      with self.DispatchLock:
+         while len(self.Incoming) > 0:
+            Entry = self.Incoming.popleft()
+            Now = Entry[0]
+            Pipeline = Entry[1]
+            Data = Entry[2]
+            if self.Filter is not None and self.Filter(Pipeline, Data):
+               continue
+            if not self.Count(Pipeline, Data, Now):
+               continue
+            with self.Condition:
+               if len(self.Queues[Pipeline]) == self.Queues[Pipeline].maxlen:
+                  self.DroppedCount[Pipeline] += 1
+               self.Queues[Pipeline].append([Now, Data])
+               self.PeakQueued[Pipeline] = max(self.PeakQueued[Pipeline], len(self.Queues[Pipeline]))
+               self.Condition.notify_all()
+            Queued.append([Pipeline, Data])
+      if self.Callback is not None and len(Queued) > 0:
+         self.Callback(Queued)
+      return Queued
+
+
+   #/**************************************************************/
+   #/* Update the statistics of the pipeline, returns False for a */
+   #/* repeated payload which is not counted as received.         */
+   #/**************************************************************/
+   def Count(self, Pipeline, Data, Now):
+      if self.SequenceRange is not None:
+         Range = self.SequenceRange(Data)
+         if Range is not None and not self.Windows[Pipeline].Accept(*Range):
+            return False
+      self.ReceivedCount[Pipeline] += 1
+      self.ByteCount[Pipeline] += len(Data)
+      if self.FirstTime[Pipeline] is None:
+         self.FirstTime[Pipeline] = Now
+      self.LastTime[Pipeline] = Now
+      return True
+
+
+   #/**************************************************************/
+   #/* Return the oldest [Receive Time, Data] of the pipeline,    */
+   #/* waiting up to Timeout seconds, None waits forever. Returns */
+   #/* None when no payload arrived in time.                      */
+   #/**************************************************************/
+   def Get(self, Pipeline, Timeout = None):
+      with self.Condition:
+         if Timeout is not None:
+            EndTime = time.time() + Timeout
+         while len(self.Queues[Pipeline]) == 0:
+            if Timeout is None:
+               self.Condition.wait()
+            else:
+               Remaining = EndTime - time.time()
+               if Remaining <= 0:
+                  return None
+               self.Condition.wait(Remaining)
+         return self.Queues[Pipeline].popleft()
+
+
+   #/**********************************************************/
+   #/* Start a worker thread for each pipeline in Handlers, a */
+   #/* dictionary of functions passed (Pipeline, Time, Data), */
+   #/* and the thread dispatching incoming payloads.          */
+   #/**********************************************************/
+   def StartWorkers(self, Handlers):
+      self.Running = True
+      if self.Dispatcher is None:
+         self.Dispatcher = threading.Thread(target = self.DispatchThread)
+         self.Dispatcher.daemon = True
+         self.Dispatcher.start()
+      for Pipeline in Handlers:
+         Worker = threading.Thread(target = self.WorkerThread, args = (Pipeline, Handlers[Pipeline]))
+         Worker.daemon = True
+         Worker.start()
+         self.Workers.append(Worker)
+
+
+   #/*******************************************************/
+   #/* Stop the pipeline worker threads and the dispatch   */
+   #/* thread, Service() then dispatches before returning. */
+   #/*******************************************************/
+   def StopWorkers(self):
+      self.Running = False
+      with self.IncomingCondition:
+         self.IncomingCondition.notify()
+      with self.Condition:
+         self.Condition.notify_all()
+      if self.Dispatcher is not None:
+         self.Dispatcher.join()
+         self.Dispatcher = None
+      for Worker in self.Workers:
+         Worker.join()
+      self.Workers = []
+      self.Dispatch()
+
+
+   #/*******************************************************/
+   #/* Dispatch incoming payloads as Service() reads them. */
+   #/*******************************************************/
+   def DispatchThread(self):
+      while self.Running:
+         with self.IncomingCondition:
+            if len(self.Incoming) == 0:
+               self.IncomingCondition.wait(1.0)
+         self.Dispatch()
+
+
+   #/*****************************************************/
+   #/* Pass each payload of the pipeline to the handler. */
+   #/*****************************************************/
+   def WorkerThread(self, Pipeline, Handler):
+      while self.Running:
+         Entry = self.Get(Pipeline, 1.0)
+         if Entry is not None:
+            Handler(Pipeline, Entry[0], Entry[1])
+
+
+   #/********************************************************/
+   #/* Return the payload rate of the pipeline, per second. */
+   #/********************************************************/
+   def GetPacketRate(self, Pipeline):
+      if self.FirstTime[Pipeline] is None or self.LastTime[Pipeline] <= self.FirstTime[Pipeline]:
+         PacketRate = 0.0
+      else:
+         PacketRate = (self.ReceivedCount[Pipeline] - 1) / (self.LastTime[Pipeline] - self.FirstTime[Pipeline])
+      return PacketRate
+
+
+   #/****************************************************/
+   #/* Convert the statistics of each pipeline to text. */
+   #/****************************************************/
+   def DisplayStats(self):
+      Result = "RF24L01 PIPELINES:\n"
+      Result += "Incoming Queued: {:d} Peak: {:d} Dropped: {:d}\n".format(len(self.Incoming), self.IncomingPeak, self.IncomingDropped)
+      Result += "PIPE RECEIVED  BYTES  RATE/S  LOST  DUPS REORD RESYNC DROPPED QUEUED  PEAK\n"
+      for Pipeline in range(RF24L01_PIPE_COUNT):
+         Window = self.Windows[Pipeline]
+         Result += "{:4d} {:8d} {:6d} {:7.2f} {:5d} {:5d} {:5d} {:6d} {:7d} {:6d} {:5d}\n".format(Pipeline, self.ReceivedCount[Pipeline], self.ByteCount[Pipeline], self.GetPacketRate(Pipeline), Window.LostCount, Window.DuplicateCount, Window.ReorderCount, Window.ResyncCount, self.DroppedCount[Pipeline], len(self.Queues[Pipeline]), self.PeakQueued[Pipeline])
+      return Result
+
+
+
+#/************************************************************/
+#/* Convert a spectrum sweep to a single line of text, one   */
+#/* character per channel from '.' empty to '9' always busy. */
+#/************************************************************/
+def DisplaySweep(Occupancy, Samples = SWEEP_SAMPLES):
+   MaxLevel = len(SWEEP_DISPLAY_LEVELS) - 1
+   Result = ""
+   for Count in Occupancy:
+      Result += SWEEP_DISPLAY_LEVELS[(Count * MaxLevel + Samples - 1) // Samples]
+   return Result
+
+
+
+#/****************************************************************/
+#/* Return the channel with the least carrier detected on it and */
+#/* the Spread channels either side of it.                       */
+#/****************************************************************/
+def QuietestChannel(Occupancy, Spread = 2):
+   BestChannel = 0
+   BestCount = None
+   for Channel in range(len(Occupancy)):
+      Count = sum(Occupancy[max(0, Channel - Spread):Channel + Spread + 1])
+      if BestCount is None or Count < BestCount:
+         BestChannel = Channel
+         BestCount = Count
+   return BestChannel
+
+
+
+#/**************************************************************************/
+#/* Snapshot of the whole RF24L01 register map, registers 0x00 - 0x17 and  */
+#/* DYNPD/FEATURE. The registers not taken from the register cache are     */
+#/* read from the device in one sequence of commands with the bus held,    */
+#/* starting with a NOP for STATUS. STATUS, OBSERVE_TX, CD and FIFO_STATUS */
+#/* are always read from the device, registers held in the register cache  */
+#/* are taken from the cache unless UseCache is False, which reads every   */
+#/* register from the device to detect configuration drift. Fields holds   */
+#/* the decoded values by name.                                            */
+#/**************************************************************************/
+class RegisterSnapshot(object):
+   # Fields changed by the device, not configuration.
+   VOLATILE_FIELDS = [
+      "RX_DR", "TX_DS", "MAX_RT", "RX_P_NO", "TX_FULL", "PLOS_CNT", "ARC_CNT", "CD",
+      "TX_REUSE", "FIFO_TX_FULL", "TX_EMPTY", "RX_FULL", "RX_EMPTY"
+   ]
+   # Fields changed by a LinkController.
+   LINK_FIELDS = ["RF_2MBPS", "RF_250KBPS", "RF_PWR", "ARD", "ARC"]
+
+
+   def __init__(self, UseCache = True, Radio = None):
+      if Radio is None:
+         Radio = DefaultRadio
+      self.Radio = Radio
+      self.Time = time.time()
+      self.Registers = {}
+      Commands = [[RF24L01_NOP]]
+      Addresses = [RF24L01_STATUS]
+      for RegisterAddress in RF24L01_SNAPSHOT_REGISTERS:
+         if RegisterAddress != RF24L01_STATUS:
+            DataWordCount = RF24L01_REGISTER_SIZE.get(RegisterAddress, 1)
+            CachedData = self.Radio.RegisterCache.get(RegisterAddress)
+            if UseCache and CachedData is not None and len(CachedData) >= DataWordCount:
+               self.Registers[RegisterAddress] = CachedData[:DataWordCount]
+            else:
+               Commands.append([(RF24L01_R_REGISTER | RegisterAddress)] + [0x00] * DataWordCount)
+               Addresses.append(RegisterAddress)
+      Responses = self.Radio.SendCommands(Commands)
+      self.Registers[RF24L01_STATUS] = [Responses[0][0]]
+      for RegisterAddress, Response in zip(Addresses[1:], Responses[1:]):
+         self.Registers[RegisterAddress] = Response[1:]
+         if RegisterAddress in RF24L01_CACHED_REGISTERS:
+            self.Radio.RegisterCache[RegisterAddress] = Response[1:]
+      self.Fields = self.Decode()
+
+
+   #/****************************************************/
+   #/* Return the first byte of the specified register. */
+   #/****************************************************/
+   def Get(self, RegisterAddress):
+      return self.Registers[RegisterAddress][0]
+
+
+   #/*************************************************/
+   #/* Decode the register values into named fields. */
+   #/*************************************************/
+   def Decode(self):
+      Fields = {}
+      Config = self.Get(RF24L01_CONFIG)
+      Fields["EN_CRC"] = (Config & RF24L01_CONFIG_EN_CRC) != 0
+      Fields["CRC_BYTES"] = ((Config & RF24L01_CONFIG_CRCO) >> 2) + 1
+      Fields["PWR_UP"] = (Config & RF24L01_CONFIG_PWR_UP) != 0
+      Fields["PRIM_RX"] = (Config & RF24L01_CONFIG_PRX) != 0
+      Fields["EN_AA"] = self.Get(RF24L01_EN_AA)
+      Fields["EN_RXADDR"] = self.Get(RF24L01_EN_RXADDR)
+      Fields["ADDRESS_WIDTH"] = self.Get(RF24L01_SETUP_AW) + 2
+      AutoRetransmit = self.Get(RF24L01_SETUP_RETR)
+      Fields["ARD"] = (250 * ((AutoRetransmit & RF24L01_SETUP_RETR_ARD) >> 4)) + 86
+      Fields["ARC"] = (AutoRetransmit & RF24L01_SETUP_RETR_ARC)
+      Fields["RF_CH"] = self.Get(RF24L01_RF_CH)
+      RfSetup = self.Get(RF24L01_RF_SETUP)
+      Fields["RF_2MBPS"] = (RfSetup & RF24L01_RF_SETUP_DATA_RATE) == RF24L01_RF_SETUP_2MBPS
+      Fields["RF_250KBPS"] = (RfSetup & RF24L01_RF_SETUP_250KBPS) != 0
+      Fields["RF_PWR"] = (RfSetup & RF24L01_RF_SETUP_0DBM)
+      Fields["LNA_HCURR"] = (RfSetup & RF24L01_RF_SETUP_LNA_GAIN) != 0
+      Status = self.Get(RF24L01_STATUS)
+      Fields["RX_DR"] = (Status & RF24L01_STATUS_RX_DR) != 0
+      Fields["TX_DS"] = (Status & RF24L01_STATUS_TX_DS) != 0
+      Fields["MAX_RT"] = (Status & RF24L01_STATUS_MAX_RT) != 0
+      Fields["RX_P_NO"] = (Status & RF24L01_STATUS_RX_P_NO) >> 1
+      Fields["TX_FULL"] = (Status & RF24L01_STATUS_TX_FULL) != 0
+      ObserveTx = self.Get(RF24L01_OBSERVE_TX)
+      Fields["PLOS_CNT"] = (ObserveTx & RF24L01_OBSERVE_TX_PLOS_CNT) >> 4
+      Fields["ARC_CNT"] = (ObserveTx & RF24L01_OBSERVE_TX_ARC_CNT)
+      Fields["CD"] = self.Get(RF24L01_CD)
+      Fields["TX_ADDR"] = self.Registers[RF24L01_TX_ADDR][:Fields["ADDRESS_WIDTH"]]
+      for Pipeline in range(6):
+         if Pipeline < 2:
+            RxAddress = self.Registers[RF24L01_RX_ADDR_P0 + Pipeline]
+         else:
+            # Pipes 2 - 5 share the upper address bytes of pipe 1.
+            RxAddress = [self.Get(RF24L01_RX_ADDR_P0 + Pipeline)] + self.Registers[RF24L01_RX_ADDR_P1][1:]
+         Fields["RX_ADDR_P" + str(Pipeline)] = RxAddress[:Fields["ADDRESS_WIDTH"]]
+         Fields["RX_PW_P" + str(Pipeline)] = self.Get(RF24L01_RX_PW_P0 + Pipeline)
+      FifoStatus = self.Get(RF24L01_FIFO_STATUS)
+      Fields["TX_REUSE"] = (FifoStatus & RF24L01_FIFO_STATUS_TX_REUSE) != 0
+      Fields["FIFO_TX_FULL"] = (FifoStatus & RF24L01_FIFO_STATUS_TX_FULL) != 0
+      Fields["TX_EMPTY"] = (FifoStatus & RF24L01_FIFO_STATUS_TX_EMPTY) != 0
+      Fields["RX_FULL"] = (FifoStatus & RF24L01_FIFO_STATUS_RX_FULL) != 0
+      Fields["RX_EMPTY"] = (FifoStatus & RF24L01_FIFO_STATUS_RX_EMPTY) != 0
+      Fields["DYNPD"] = self.Get(RF24L01_DYNPD)
+      Fields["FEATURE"] = self.Get(RF24L01_FEATURE)
+      return Fields
+
+
+   #/*************************************************************/
+   #/* Compare with an earlier snapshot, returns a list of       */
+   #/* [Name, Earlier Value, This Value] for each changed field. */
+   #/* Volatile status fields are skipped unless requested, and  */
+   #/* fields named in Ignore are always skipped.                */
+   #/*************************************************************/
+   def Diff(self, Earlier, IncludeVolatile = False, Ignore = ()):
+      Changes = []
+      for Name in sorted(self.Fields):
+         if (IncludeVolatile or Name not in self.VOLATILE_FIELDS) and Name not in Ignore:
+            if Earlier.Fields.get(Name) != self.Fields[Name]:
+               Changes.append([Name, Earlier.Fields.get(Name), self.Fields[Name]])
+      return Changes
+
+
+   #/*********************************************************/
+   #/* Convert the changes from an earlier snapshot to text. */
+   #/*********************************************************/
+   def DisplayDiff(self, Earlier, IncludeVolatile = False, Ignore = ()):
+      Result = ""
+      for Change in self.Diff(Earlier, IncludeVolatile, Ignore):
+         Result += "RF24L01 {:s}: {:s} -> {:s}\n".format(Change[0], str(Change[1]), str(Change[2]))
+      return Result
+
+
+
+#/************************************************************/
+#/* Convert the RF24L01 status values to text. All of the    */
+#/* Display functions format from a single RegisterSnapshot, */
+#/* taking one when none is given.                           */
+#/************************************************************/
+def DisplayStatus(Snapshot = None):
+   if Snapshot is None:
+      Snapshot = RegisterSnapshot()
+   Fields = Snapshot.Fields
    Response = "RF24L01 STATUS:\n"
-   if ThisStatus[0] & RF24L01_STATUS_RX_DR:
+   if Fields["RX_DR"]:
       Response += "RX FIFO Data Ready\n"
-   if ThisStatus[0] & RF24L01_STATUS_TX_DS:
+   if Fields["TX_DS"]:
       Response += "TX FIFO Data Sent\n"
-   if ThisStatus[0] & RF24L01_STATUS_MAX_RT:
+   if Fields["MAX_RT"]:
       Response += "MAX TX Retrys Exceeded\n"
-   RxPipeline = (ThisStatus[0] & RF24L01_STATUS_RX_P_NO) >> 1
-   if RxPipeline != 7:
-      Response += "RX Pipeline: {:d}\n".format(RxPipeline)
-   if ThisStatus[0] & RF24L01_STATUS_TX_FULL:
+   if Fields["RX_P_NO"] != RF24L01_STATUS_RX_P_NO_EMPTY:
+      Response += "RX Pipeline: {:d}\n".format(Fields["RX_P_NO"])
+   if Fields["TX_FULL"]:
       Response += "TX FIFO Full\n"
-   if ThisStatus[0] & RF24L01_CONFIG_EN_CRC:
-      Response += "CRC [" + str((((ThisStatus[0] & RF24L01_CONFIG_CRCO) >> 2) + 1)) + " bytes]\n"
+   if Fields["EN_CRC"]:
+      Response += "CRC [" + str(Fields["CRC_BYTES"]) + " bytes]\n"
 
-   if ThisStatus[1] & RF24L01_FIFO_STATUS_TX_REUSE:
+   if Fields["TX_REUSE"]:
       Response += "Reuse Last Sent Data Packet\n"
-   if ThisStatus[1] & RF24L01_FIFO_STATUS_TX_FULL:
+   if Fields["FIFO_TX_FULL"]:
       Response += "TX FIFO FULL\n"
-   if ThisStatus[1] & RF24L01_FIFO_STATUS_TX_EMPTY:
+   if Fields["TX_EMPTY"]:
       Response += "TX FIFO EMPTY\n"
-   if ThisStatus[1] & RF24L01_FIFO_STATUS_RX_FULL:
+   if Fields["RX_FULL"]:
       Response += "RX FIFO FULL\n"
-   if ThisStatus[1] & RF24L01_FIFO_STATUS_RX_EMPTY:
+   if Fields["RX_EMPTY"]:
       Response += "RX FIFO EMPTY\n"
 
    return Response
@@ -427,43 +2217,25 @@ def DisplayStatus():
 #/*****************************************************/
 #/* Convert the RF24L01 configured addresses to text. */
 #/*****************************************************/
-def DisplayAddresses():
+def DisplayAddresses(Snapshot = None):
+   if Snapshot is None:
+      Snapshot = RegisterSnapshot()
+   Fields = Snapshot.Fields
    Result = "RF24L01 ADDRESSES:\n"
    Result += "                   [>>> - Channel Enabled]\n"
    Result += "                   [ *  - Auto Acknowledgement Enabled]\n"
-   AddressWidth = ReadRegister(RF24L01_SETUP_AW, 1)[1] + 2
-   AutoAckEnabled = ReadRegister(RF24L01_EN_AA, 1)[1]
-   RxEnabled = ReadRegister(RF24L01_EN_RXADDR, 1)[1]
-   TxAddress = ReadRegister(RF24L01_TX_ADDR, 5)[1:]
-   Result += "RF24L01 TRANSMIT ADDRESS: " + str(TxAddress) + "\n"
-   for Count in range(2):
-      if RxEnabled & (1 << Count):
+   Result += "RF24L01 TRANSMIT ADDRESS: " + str(Snapshot.Registers[RF24L01_TX_ADDR]) + "\n"
+   for Count in range(6):
+      if Fields["EN_RXADDR"] & (1 << Count):
          Result += ">>> "
       else:
          Result += "    "
-      if AutoAckEnabled & (1 << Count):
+      if Fields["EN_AA"] & (1 << Count):
          Result += "* "
       else:
          Result += "  "
-      RxAddress = ReadRegister(RF24L01_RX_ADDR_P0 + Count, 5)[1:]
-      Result += "RF24L01 RECEIVE ADDRESS PIPELINE [" + str(Count) + "]: " + str(RxAddress[:AddressWidth])
-      RxBytes = ReadRegister(RF24L01_RX_PW_P0 + Count, 1)[1]
-      Result += " [" + str(RxBytes) + " RXb]\n"
-   for Count in range(2, 6):
-      if RxEnabled & (1 << Count):
-         Result += ">>> "
-      else:
-         Result += "    "
-      if AutoAckEnabled & (1 << Count):
-         Result += "* "
-      else:
-         Result += "  "
-      Response = ReadRegister(RF24L01_RX_ADDR_P0 + Count, 1)
-      ThisAddress = RxAddress
-      ThisAddress[0] = Response[1]
-      Result += "RF24L01 RECEIVE ADDRESS PIPELINE [" + str(Count) + "]: " + str(ThisAddress[:AddressWidth])
-      RxBytes = ReadRegister(RF24L01_RX_PW_P0 + Count, 1)[1]
-      Result += " [" + str(RxBytes) + " RXb]\n"
+      Result += "RF24L01 RECEIVE ADDRESS PIPELINE [" + str(Count) + "]: " + str(Fields["RX_ADDR_P" + str(Count)])
+      Result += " [" + str(Fields["RX_PW_P" + str(Count)]) + " RXb]\n"
 
    return Result
 
@@ -472,43 +2244,39 @@ def DisplayAddresses():
 #/***************************************************************/
 #/* Convert the RF24L01 configured Radio configuration to text. */
 #/***************************************************************/
-def DisplayRfChannel():
+def DisplayRfChannel(Snapshot = None):
+   if Snapshot is None:
+      Snapshot = RegisterSnapshot()
+   Fields = Snapshot.Fields
    Result = "RF CHANNEL: "
-   RfSetup = ReadRegister(RF24L01_RF_SETUP, 1)[1]
-   RfChannel = ReadRegister(RF24L01_RF_CH, 1)[1]
-   CarrierDetect = ReadRegister(RF24L01_CD, 1)[1]
-   if RfSetup & RF24L01_RF_SETUP_2MBPS:
+   if Fields["RF_250KBPS"]:
+      Result += "250Kbps "
+      Rf = 2400 + 1 * Fields["RF_CH"]
+   elif Fields["RF_2MBPS"]:
       Result += "2Mbps "
-      Rf = 2400 + 2 * RfChannel
+      Rf = 2400 + 2 * Fields["RF_CH"]
    else:
       Result += "1Mbps "
-      Rf = 2400 + 1 * RfChannel
+      Rf = 2400 + 1 * Fields["RF_CH"]
    Result += str(Rf) + "MHz "
-   if RfSetup & RF24L01_RF_SETUP_0DBM:
+   if Fields["RF_PWR"] == RF24L01_RF_SETUP_0DBM:
       Result += "0dBm "
-   elif RfSetup & RF24L01_RF_SETUP_10DBM:
+   elif Fields["RF_PWR"] == RF24L01_RF_SETUP_10DBM:
       Result += "10dBm "
-   elif RfSetup & RF24L01_RF_SETUP_12DBM:
+   elif Fields["RF_PWR"] == RF24L01_RF_SETUP_12DBM:
       Result += "12dBm "
    else:
-      Result += "0dBm "
-   if CarrierDetect == 0:
+      Result += "18dBm "
+   if Fields["CD"] == 0:
       Result += " !!! NO CARRIER DETECT !!!"
    else:
       Result += " *** CARRIER DETECT ***"
    Result += "\n"
 
-   DataPacketCounts = ReadRegister(RF24L01_OBSERVE_TX, 1)[1]
-   DataPacketsLost = ((DataPacketCounts & RF24L01_OBSERVE_TX_PLOS_CNT) >> 4)
-   DataPacketsResent = (DataPacketCounts & RF24L01_OBSERVE_TX_ARC_CNT)
-   Result += "Data Packets Lost: " + str(DataPacketsLost) + "\n"
-   Result += "Data Packets Resent: " + str(DataPacketsResent) + "\n"
+   Result += "Data Packets Lost: " + str(Fields["PLOS_CNT"]) + "\n"
+   Result += "Data Packets Resent: " + str(Fields["ARC_CNT"]) + "\n"
 
-   AutoRetransmit = ReadRegister(RF24L01_SETUP_RETR, 1)[1]
-   AutoRetransmitDelay = (250 * ((AutoRetransmit & RF24L01_SETUP_RETR_ARD) >> 4)) + 86
-   AutoRetransmitCount = (AutoRetransmit & RF24L01_SETUP_RETR_ARC)
-   Result += "Auto Retransmit Delay: " + str(AutoRetransmitDelay) + "uS\n"
-   Result += "Auto Retransmit Count: " + str(AutoRetransmitCount) + "\n"
+   Result += "Auto Retransmit Delay: " + str(Fields["ARD"]) + "uS\n"
+   Result += "Auto Retransmit Count: " + str(Fields["ARC"]) + "\n"
 
    return Result
-
@@ -20,12 +20,40 @@
 #/* V1.00 - 2019-08-28 - Jason Birch                                         */
 #/* ------------------------------------------------------------------------ */
 #/* Library for SPI communication on the Raspberry Pi using Python.          */
+#/*                                                                          */
+#/* Three SPI backends are available, selected when calling SpiInit():       */
+#/* SPI_BACKEND_SPIDEV - Hardware SPI through the Linux spidev driver, a     */
+#/*                      whole transaction is sent in a single xfer call.    */
+#/* SPI_BACKEND_GPIO   - Bit banged SPI on the GPIO pins, for boards which   */
+#/*                      can not use the hardware SPI pins.                  */
+#/* SPI_BACKEND_SIM    - Simulated SPI, transactions are passed to a Python  */
+#/*                      function registered with SpiSetSimulator(), such as */
+#/*                      an RF24Sim device. Used automatically when RPi.GPIO */
+#/*                      is not installed and SimGPIO stands in for it.      */
+#/*                                                                          */
+#/* Each SpiBus instance holds the pins, backend and clock of one bus. The   */
+#/* Spi functions drive DefaultBus, on the standard SPI0 pins.               */
 #/****************************************************************************/
 
 
 
+import os
 import time
-import RPi.GPIO
+import threading
+
+# RPi.GPIO is only available on a Raspberry Pi, elsewhere GPIO is simulated.
+try:
+   import RPi.GPIO
+   SPI_GPIO_SIMULATED = False
+except ImportError:
+   import SimGPIO as RPi
+   SPI_GPIO_SIMULATED = True
+
+# Hardware SPI is optional, fall back to bit banged GPIO when not installed.
+try:
+   import spidev
+except ImportError:
+   spidev = None
 
 
 
@@ -37,18 +65,333 @@ GPIO_SPI_SCK = 11
 
 # Number of bits per word for SPI.
 SPI_WORD_BITS = 8
-SPI_CLOCK_PERIOD = 0.000001
+# Default bit banged SPI clock rate, RF24L01 supports up to 8MHz.
+SPI_CLOCK_HZ = 500000
+# Time spent calibrating the bit banged SPI busy wait delay.
+SPI_CALIBRATE_SECONDS = 0.05
+SPI_CALIBRATE_LOOPS = 64
+
+# Available SPI backends.
+SPI_BACKEND_AUTO = -1
+SPI_BACKEND_GPIO = 0
+SPI_BACKEND_SPIDEV = 1
+SPI_BACKEND_SIM = 2
+
+SPI_BACKEND_NAMES = {
+   SPI_BACKEND_GPIO : "GPIO",
+   SPI_BACKEND_SPIDEV : "SPIDEV",
+   SPI_BACKEND_SIM : "SIM",
+}
+
+# Hardware SPI interface to use.
+SPI_BUS = 0
+SPI_DEVICE = 0
+# Hardware SPI interface speed, RF24L01 supports up to 8MHz.
+SPI_BUS_SPEED = 8000000
+# Hardware SPI mode.
+SPI_BUS_MODE = 0
+
+# Value returned by the simulated backend when no simulator is registered.
+SPI_SIM_IDLE_WORD = 0x00
+
+
+
+# Highest resolution timer available.
+SpiTimer = getattr(time, "perf_counter", time.time)
+
+# MOSI levels for each bit of each byte value, most significant bit first.
+SpiBitTable = []
+for ThisWord in range(1 << SPI_WORD_BITS):
+   SpiBitTable.append(tuple((ThisWord >> Bit) & 1 for Bit in range(SPI_WORD_BITS - 1, -1, -1)))
+SpiBitTable = tuple(SpiBitTable)
+
+# Busy wait loop iterations per second, measured by SpiCalibrate().
+SpiLoopsPerSecond = 0
+
+
+
+#/***************************************************************/
+#/* Measure the speed of the busy wait loop used for the bit    */
+#/* banged SPI clock, called once when the GPIO backend starts. */
+#/***************************************************************/
+def SpiCalibrate():
+   global SpiLoopsPerSecond
+
+   # Time short loops, the same shape as the half clock delay.
+   Delay = range(SPI_CALIBRATE_LOOPS)
+   Repeats = 16
+   Elapsed = 0.0
+   while Elapsed < SPI_CALIBRATE_SECONDS:
+      Repeats *= 2
+      StartTime = SpiTimer()
+      for Repeat in range(Repeats):
+         for Count in Delay:
+            pass
+      Elapsed = SpiTimer() - StartTime
+   SpiLoopsPerSecond = Repeats * SPI_CALIBRATE_LOOPS / Elapsed
+   return SpiLoopsPerSecond
+
+
+
+#/********************************************************/
+#/* Busy wait for the specified time, more accurate than */
+#/* time.sleep() for periods of a few microseconds.      */
+#/********************************************************/
+def SpiBusyWait(Seconds):
+   EndTime = SpiTimer() + Seconds
+   while SpiTimer() < EndTime:
+      pass
 
 
 
-#/************************/
-#/* Initialise SPI GPIO. */
-#/************************/
-def SpiInit():
-   RPi.GPIO.setup(GPIO_SPI_MISO, RPi.GPIO.IN, pull_up_down=RPi.GPIO.PUD_UP)
-   RPi.GPIO.setup(GPIO_SPI_CE, RPi.GPIO.OUT, initial=1)
-   RPi.GPIO.setup(GPIO_SPI_MOSI, RPi.GPIO.OUT, initial=0)
-   RPi.GPIO.setup(GPIO_SPI_SCK, RPi.GPIO.OUT, initial=0)
+#/****************************************************************************/
+#/* One SPI bus, its pins, backend and clock. Several devices may share a    */
+#/* bus, each with its own chip select driven by the caller, Lock serialises */
+#/* their transactions. Ce is the hardware chip select pin, unused by the    */
+#/* spidev backend, which is set up as a GPIO output held high.              */
+#/****************************************************************************/
+class SpiBus(object):
+   def __init__(self, Ce = GPIO_SPI_CE, Mosi = GPIO_SPI_MOSI, Miso = GPIO_SPI_MISO, Sck = GPIO_SPI_SCK, Bus = SPI_BUS, Device = SPI_DEVICE):
+      self.Ce = Ce
+      self.Mosi = Mosi
+      self.Miso = Miso
+      self.Sck = Sck
+      self.Bus = Bus
+      self.Device = Device
+      # Currently selected backend.
+      self.Backend = SPI_BACKEND_GPIO
+      # Hardware SPI device when using the spidev backend.
+      self.SpiDevice = None
+      # Function receiving each transaction when using the simulated backend.
+      self.Simulator = None
+      # Requested bit banged SPI clock rate.
+      self.ClockHz = SPI_CLOCK_HZ
+      # Busy wait iterations for half an SPI clock period.
+      self.HalfClockDelay = range(0)
+      # Bits transferred and time taken by the bit banged SPI, for the achieved clock rate.
+      self.GpioBitCount = 0
+      self.GpioSeconds = 0.0
+      # Serialises the transactions of the devices on the bus.
+      self.Lock = threading.RLock()
+
+
+   #/***********************/
+   #/* Initialise the bus. */
+   #/***********************/
+   def Init(self, Backend = SPI_BACKEND_GPIO, ClockHz = None):
+      if Backend == SPI_BACKEND_AUTO:
+         Backend = self.AutoBackend()
+
+      self.Close()
+      self.Backend = Backend
+      if self.Backend == SPI_BACKEND_SPIDEV:
+         if spidev is None:
+            raise RuntimeError("spidev module not installed, SPI_BACKEND_SPIDEV unavailable.")
+         # The RF24L01 CE line is wired to the SPI CE0 pin and its CSN is driven
+         # separately on a GPIO pin, so the hardware chip select is not used.
+         self.SpiDevice = spidev.SpiDev()
+         self.SpiDevice.open(self.Bus, self.Device)
+         if ClockHz is None:
+            ClockHz = SPI_BUS_SPEED
+         self.SpiDevice.max_speed_hz = ClockHz
+         self.SpiDevice.mode = SPI_BUS_MODE
+         self.SpiDevice.bits_per_word = SPI_WORD_BITS
+         self.SpiDevice.lsbfirst = False
+         self.SpiDevice.no_cs = True
+         RPi.GPIO.setup(self.Ce, RPi.GPIO.OUT, initial=1)
+      elif self.Backend == SPI_BACKEND_GPIO:
+         RPi.GPIO.setup(self.Miso, RPi.GPIO.IN, pull_up_down=RPi.GPIO.PUD_UP)
+         RPi.GPIO.setup(self.Ce, RPi.GPIO.OUT, initial=1)
+         RPi.GPIO.setup(self.Mosi, RPi.GPIO.OUT, initial=0)
+         RPi.GPIO.setup(self.Sck, RPi.GPIO.OUT, initial=0)
+         if SpiLoopsPerSecond == 0:
+            SpiCalibrate()
+         if ClockHz is None:
+            ClockHz = self.ClockHz
+         self.SetClock(ClockHz)
+      elif self.Backend != SPI_BACKEND_SIM:
+         raise ValueError("Unknown SPI backend: " + str(Backend))
+
+
+   #/****************************************************************/
+   #/* Choose hardware SPI when available, otherwise bit bang GPIO, */
+   #/* or the simulated backend when GPIO is simulated.             */
+   #/****************************************************************/
+   def AutoBackend(self):
+      if SPI_GPIO_SIMULATED:
+         Backend = SPI_BACKEND_SIM
+      elif spidev is not None and os.path.exists("/dev/spidev{:d}.{:d}".format(self.Bus, self.Device)):
+         Backend = SPI_BACKEND_SPIDEV
+      else:
+         Backend = SPI_BACKEND_GPIO
+      return Backend
+
+
+   #/****************************************************/
+   #/* Release the hardware SPI device, if one is open. */
+   #/****************************************************/
+   def Close(self):
+      if self.SpiDevice is not None:
+         self.SpiDevice.close()
+         self.SpiDevice = None
+
+
+   #/************************************************************/
+   #/* Register the function receiving transactions in the SIM  */
+   #/* backend. The function is passed a list of data words and */
+   #/* must return a list of the same length.                   */
+   #/************************************************************/
+   def SetSimulator(self, Simulator):
+      self.Simulator = Simulator
+
+
+   #/******************************************************/
+   #/* Return the name of the currently selected backend. */
+   #/******************************************************/
+   def GetBackendName(self):
+      return SPI_BACKEND_NAMES.get(self.Backend, "UNKNOWN")
+
+
+   #/***********************************************************/
+   #/* Send and receive a complete transaction on the SPI bus, */
+   #/* chip select is controlled by the caller.                */
+   #/***********************************************************/
+   def Transfer(self, DataWords):
+      if self.Backend == SPI_BACKEND_SPIDEV:
+         Response = self.SpiDevice.xfer2(list(DataWords))
+      elif self.Backend == SPI_BACKEND_SIM:
+         if self.Simulator is None:
+            Response = [SPI_SIM_IDLE_WORD] * len(DataWords)
+         else:
+            Response = list(self.Simulator(DataWords))
+      else:
+         Response = self.GpioTransfer(DataWords)
+      return Response
+
+
+   #/***********************************************************/
+   #/* Set the bit banged SPI clock rate in Hz. The rate is an */
+   #/* upper limit, the GPIO call time is not included in the  */
+   #/* delay, use GetClockRate() for the rate achieved.        */
+   #/***********************************************************/
+   def SetClock(self, ClockHz):
+      if self.SpiDevice is not None:
+         self.SpiDevice.max_speed_hz = ClockHz
+         return
+      if SpiLoopsPerSecond == 0:
+         SpiCalibrate()
+      self.ClockHz = ClockHz
+      self.HalfClockDelay = range(int(SpiLoopsPerSecond / (2.0 * ClockHz)))
+      self.ResetClockRate()
+
+
+   #/*****************************************************************/
+   #/* Return the bit banged SPI clock rate in Hz achieved since the */
+   #/* clock was set or the measurement was reset.                   */
+   #/*****************************************************************/
+   def GetClockRate(self):
+      if self.GpioSeconds == 0:
+         ClockRate = 0.0
+      else:
+         ClockRate = self.GpioBitCount / self.GpioSeconds
+      return ClockRate
+
+
+   #/***********************************************************/
+   #/* Restart the measurement of the achieved SPI clock rate. */
+   #/***********************************************************/
+   def ResetClockRate(self):
+      self.GpioBitCount = 0
+      self.GpioSeconds = 0.0
+
+
+   #/****************************************************************/
+   #/* Send and receive a buffer of data words by bit banging GPIO. */
+   #/****************************************************************/
+   def GpioTransfer(self, DataWords):
+      # Local references avoid global and attribute lookups per bit.
+      Output = RPi.GPIO.output
+      Input = RPi.GPIO.input
+      Mosi = self.Mosi
+      Miso = self.Miso
+      Sck = self.Sck
+      BitTable = SpiBitTable
+      Delay = self.HalfClockDelay
+
+      Response = []
+      StartTime = SpiTimer()
+      for ThisWord in DataWords:
+         ReceiveDataWord = 0
+         for MosiBit in BitTable[ThisWord]:
+            Output(Mosi, MosiBit)
+            for Count in Delay:
+               pass
+            Output(Sck, 1)
+            ReceiveDataWord = (ReceiveDataWord << 1) | Input(Miso)
+            for Count in Delay:
+               pass
+            Output(Sck, 0)
+         Response.append(ReceiveDataWord)
+      self.GpioSeconds += SpiTimer() - StartTime
+      self.GpioBitCount += len(Response) * SPI_WORD_BITS
+
+      return Response
+
+
+
+# The bus driven by the module level functions.
+DefaultBus = SpiBus()
+
+
+
+#/*******************************************/
+#/* Initialise SPI GPIO of the default bus. */
+#/*******************************************/
+def SpiInit(Backend = SPI_BACKEND_GPIO, ClockHz = None):
+   DefaultBus.Init(Backend, ClockHz)
+
+
+
+#/****************************************************************/
+#/* Choose hardware SPI when available, otherwise bit bang GPIO. */
+#/****************************************************************/
+def SpiAutoBackend():
+   return DefaultBus.AutoBackend()
+
+
+
+#/****************************************************/
+#/* Release the hardware SPI device, if one is open. */
+#/****************************************************/
+def SpiClose():
+   DefaultBus.Close()
+
+
+
+#/********************************************************************/
+#/* Register the function receiving transactions in the SIM backend. */
+#/* The function is passed a list of data words and must return a    */
+#/* list of the same length.                                         */
+#/********************************************************************/
+def SpiSetSimulator(Simulator):
+   DefaultBus.SetSimulator(Simulator)
+
+
+
+#/******************************************************/
+#/* Return the name of the currently selected backend. */
+#/******************************************************/
+def SpiGetBackendName():
+   return DefaultBus.GetBackendName()
+
+
+
+#/***********************************************************/
+#/* Send and receive a complete transaction on the SPI bus, */
+#/* chip select is controlled by the caller.                */
+#/***********************************************************/
+def SpiTransfer(DataWords):
+   return DefaultBus.Transfer(DataWords)
 
 
 
@@ -56,24 +399,31 @@ def SpiInit():
 #/* Send and receive a data word on the SPI bus. */
 #/************************************************/
 def SpiSendReceiveWord(DataWord):
-   ReceiveDataWord = 0
+   return DefaultBus.Transfer([DataWord])[0]
+
+
+
+#/***********************************************************/
+#/* Set the bit banged SPI clock rate in Hz. The rate is an */
+#/* upper limit, the GPIO call time is not included in the  */
+#/* delay, use SpiGetClockRate() for the rate achieved.     */
+#/***********************************************************/
+def SpiSetClock(ClockHz):
+   DefaultBus.SetClock(ClockHz)
 
-   BitMask = (1 << (SPI_WORD_BITS - 1))
-   for Count in range(SPI_WORD_BITS):
-      if (DataWord & BitMask) == 0:
-         RPi.GPIO.output(GPIO_SPI_MOSI, 0)
-      else:
-         RPi.GPIO.output(GPIO_SPI_MOSI, 1)
-      BitMask = BitMask / 2
 
-      RPi.GPIO.output(GPIO_SPI_SCK, 1)
-      time.sleep(SPI_CLOCK_PERIOD)
 
-      SpiReadBit = RPi.GPIO.input(GPIO_SPI_MISO)
-      ReceiveDataWord = ReceiveDataWord * 2 + SpiReadBit
+#/*****************************************************************/
+#/* Return the bit banged SPI clock rate in Hz achieved since the */
+#/* clock was set or the measurement was reset.                   */
+#/*****************************************************************/
+def SpiGetClockRate():
+   return DefaultBus.GetClockRate()
 
-      RPi.GPIO.output(GPIO_SPI_SCK, 0)
-      time.sleep(SPI_CLOCK_PERIOD)
 
-   return ReceiveDataWord
 
+#/***********************************************************/
+#/* Restart the measurement of the achieved SPI clock rate. */
+#/***********************************************************/
+def SpiResetClockRate():
+   DefaultBus.ResetClockRate()
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+# RPiSPI_Benchmark - Compare SPI Backend Transaction Rates
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/****************************************************************************/
+#/* RPiSPI_Benchmark - Compare SPI Backend Transaction Rates.                */
+#/* ------------------------------------------------------------------------ */
+#/* V1.00 - 2019-08-28 - Jason Birch                                         */
+#/* ------------------------------------------------------------------------ */
+#/* Measure RF24L01 SPI transactions per second for each SPI backend.        */
+#/* Typical transactions are used, a NOP status read, a single byte          */
+#/* register read and a full 32 byte payload write.                          */
+#/*                                                                          */
+#/* Usage: RPiSPI_Benchmark.py [GPIO] [SPIDEV] [SIM]                         */
+#/****************************************************************************/
+
+
+
+import sys
+import time
+# RPi.GPIO is only available on a Raspberry Pi, elsewhere GPIO is simulated.
+try:
+   import RPi.GPIO
+except ImportError:
+   import SimGPIO as RPi
+import RPiSPI
+import RPiRF24L01
+
+
+
+# Time to spend measuring each transaction type on each backend.
+BENCHMARK_SECONDS = 2.0
+
+# Transactions to measure.
+BENCHMARK_TRANSACTIONS = [
+   [ "NOP", [RPiRF24L01.RF24L01_NOP] ],
+   [ "R_REGISTER x1", [(RPiRF24L01.RF24L01_R_REGISTER | RPiRF24L01.RF24L01_RF_CH), 0x00] ],
+   [ "W_TX_PAYLOAD x32", [RPiRF24L01.RF24L01_W_TX_PAYLOAD] + [0x55] * 32 ],
+]
+
+
+
+#/******************************************************************/
+#/* Measure the transaction rate of a command on the current       */
+#/* backend, returns transactions per second and bytes per second. */
+#/******************************************************************/
+def MeasureTransaction(Command):
+   Count = 0
+   StartTime = time.time()
+   EndTime = StartTime + BENCHMARK_SECONDS
+   Now = StartTime
+   while Now < EndTime:
+      RPiRF24L01.SendCommand(Command)
+      Count += 1
+      Now = time.time()
+   Elapsed = Now - StartTime
+   return [Count / Elapsed, Count * len(Command) / Elapsed]
+
+
+
+#  /*******************************************/
+# /* Configure Raspberry Pi GPIO interfaces. */
+#/*******************************************/
+RPi.GPIO.setwarnings(False)
+RPi.GPIO.setmode(RPi.GPIO.BCM)
+
+Backends = []
+for Name in sys.argv[1:]:
+   for Backend in RPiSPI.SPI_BACKEND_NAMES:
+      if RPiSPI.SPI_BACKEND_NAMES[Backend] == Name.upper():
+         Backends.append(Backend)
+if len(Backends) == 0:
+   Backends = [RPiSPI.SPI_BACKEND_GPIO, RPiSPI.SPI_BACKEND_SIM]
+   if RPiSPI.SpiAutoBackend() == RPiSPI.SPI_BACKEND_SPIDEV:
+      Backends.insert(0, RPiSPI.SPI_BACKEND_SPIDEV)
+
+print("{:8s} {:18s} {:>12s} {:>12s}".format("BACKEND", "TRANSACTION", "TRANS/SEC", "BYTES/SEC"))
+for Backend in Backends:
+   RPiRF24L01.Init(Backend)
+   for Transaction in BENCHMARK_TRANSACTIONS:
+      Result = MeasureTransaction(Transaction[1])
+      print("{:8s} {:18s} {:12.1f} {:12.1f}".format(RPiSPI.SpiGetBackendName(), Transaction[0], Result[0], Result[1]))
+   if Backend == RPiSPI.SPI_BACKEND_GPIO:
+      print("{:8s} SCK requested {:d}Hz, achieved {:.0f}Hz".format(RPiSPI.SpiGetBackendName(), RPiSPI.DefaultBus.ClockHz, RPiSPI.SpiGetClockRate()))
+RPiSPI.SpiClose()
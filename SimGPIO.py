@@ -0,0 +1,177 @@
+# SimGPIO - Simulated Raspberry Pi GPIO in Python
+# Copyright (C) 2019 Jason Birch
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#/*****************************************************************************/
+#/* SimGPIO - Simulated Raspberry Pi GPIO in Python.                          */
+#/* ------------------------------------------------------------------------  */
+#/* V1.00 - 2019-08-28 - Jason Birch                                          */
+#/* ------------------------------------------------------------------------  */
+#/* Stands in for the RPi.GPIO module when not running on a Raspberry Pi,     */
+#/* the modules using GPIO import it as RPi, so RPi.GPIO resolves to this     */
+#/* module. Only the calls used by this project are provided.                 */
+#/*                                                                           */
+#/* Simulated devices drive input pins with SetInput(), which runs the edge   */
+#/* callbacks registered with add_event_detect() on a single callback         */
+#/* thread as RPi.GPIO does, and follow output pins with AddOutputListener(). */
+#/*****************************************************************************/
+
+
+
+import sys
+import threading
+import collections
+
+
+
+# RPi.GPIO constant values.
+BOARD = 10
+BCM = 11
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+RISING = 31
+FALLING = 32
+BOTH = 33
+
+# The modules using GPIO refer to RPi.GPIO, imported as RPi this module is its own GPIO.
+GPIO = sys.modules[__name__]
+
+
+
+# Level of each pin.
+PinLevel = {}
+# Input pins driven by a simulated device, pull ups do not change them.
+DrivenPins = set()
+# Functions passed (Pin, Level) when an output pin changes level.
+OutputListeners = collections.defaultdict(list)
+# Edge detection of each input pin, [Edge, Callback].
+EdgeDetect = {}
+# Edge callbacks waiting to run on the callback thread.
+CallbackQueue = collections.deque()
+CallbackCondition = threading.Condition()
+CallbackThread = None
+
+
+
+#/***********************************************************/
+#/* RPi.GPIO interface, these calls have no effect on pins. */
+#/***********************************************************/
+def setwarnings(Flag):
+   pass
+
+
+def setmode(Mode):
+   pass
+
+
+def cleanup(*Pins):
+   pass
+
+
+
+#/****************************************************************/
+#/* Set up a pin, an output takes its initial level and an       */
+#/* input not driven by a simulated device takes its pull level. */
+#/****************************************************************/
+def setup(Pin, Mode, initial = LOW, pull_up_down = PUD_OFF):
+   if Mode == OUT:
+      output(Pin, initial)
+   elif Pin not in DrivenPins:
+      PinLevel[Pin] = int(pull_up_down == PUD_UP)
+
+
+
+#/*******************************************************/
+#/* Set the level of an output pin, and tell listeners. */
+#/*******************************************************/
+def output(Pin, Level):
+   Level = int(bool(Level))
+   if PinLevel.get(Pin) != Level:
+      PinLevel[Pin] = Level
+      for Listener in OutputListeners[Pin]:
+         Listener(Pin, Level)
+
+
+
+#/******************************/
+#/* Return the level of a pin. */
+#/******************************/
+def input(Pin):
+   return PinLevel.get(Pin, LOW)
+
+
+
+#/**************************************************************/
+#/* Call the callback from the callback thread on each edge of */
+#/* the input pin, RISING, FALLING or BOTH.                    */
+#/**************************************************************/
+def add_event_detect(Pin, Edge, callback = None, bouncetime = None):
+   global CallbackThread
+
+   EdgeDetect[Pin] = [Edge, callback]
+   with CallbackCondition:
+      if CallbackThread is None:
+         CallbackThread = threading.Thread(target = RunCallbacks)
+         CallbackThread.daemon = True
+         CallbackThread.start()
+
+
+def remove_event_detect(Pin):
+   EdgeDetect.pop(Pin, None)
+
+
+
+#/*****************************************************************/
+#/* Drive an input pin from a simulated device, queueing the edge */
+#/* callback of the pin when the level change matches its edge.   */
+#/*****************************************************************/
+def SetInput(Pin, Level):
+   Level = int(bool(Level))
+   DrivenPins.add(Pin)
+   if PinLevel.get(Pin) != Level:
+      PinLevel[Pin] = Level
+      Detect = EdgeDetect.get(Pin)
+      if Detect is not None and Detect[1] is not None:
+         if Detect[0] == BOTH or Detect[0] == (RISING if Level else FALLING):
+            with CallbackCondition:
+               CallbackQueue.append([Detect[1], Pin])
+               CallbackCondition.notify()
+
+
+
+#/*****************************************************************/
+#/* Register a function passed (Pin, Level) on each change of the */
+#/* level of an output pin, for simulated devices.                */
+#/*****************************************************************/
+def AddOutputListener(Pin, Listener):
+   OutputListeners[Pin].append(Listener)
+
+
+
+#/**************************************************************/
+#/* Run the edge callbacks one at a time, in the order queued. */
+#/**************************************************************/
+def RunCallbacks():
+   while True:
+      with CallbackCondition:
+         while len(CallbackQueue) == 0:
+            CallbackCondition.wait()
+         Callback = CallbackQueue.popleft()
+      Callback[0](Callback[1])